@@ -0,0 +1,106 @@
+"""Admission control for the consultation image endpoints.
+
+Image uploads (PUT and POST) are admitted against a per-worker budget of
+in-flight requests and bytes, plus a cap on concurrent requests per
+consultation. Downloads and thumbnails are not admission controlled.
+Anything over budget is rejected immediately, before its body is read,
+with 503 (worker saturated) or 429 (one consultation is hogging uploads)
+and a Retry-After header. Lead and other API traffic never waits behind
+an upload storm.
+"""
+import re
+from collections import defaultdict
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+IMAGE_PATH_RE = re.compile(r"^/api/consultations/([^/]+)/images(?:/|$)")
+# Combined consultation + images submissions count against the global budget
+# only; there is no consultation id yet.
+SUBMIT_PATH = "/api/consultations/submit"
+ADMITTED_METHODS = ("PUT", "POST")
+
+
+class UploadAdmission:
+    def __init__(
+        self,
+        *,
+        max_requests: int = 32,
+        max_bytes: int = 32 * 1024 * 1024,
+        per_consultation: int = 4,
+        default_request_bytes: int = 2 * 1024 * 1024,
+    ):
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.per_consultation = per_consultation
+        self.default_request_bytes = default_request_bytes
+        self.requests = 0
+        self.bytes = 0
+        self.by_consultation: Dict[str, int] = defaultdict(int)
+        self.rejected = {429: 0, 503: 0}
+
+    def try_acquire(self, consultation_id: Optional[str], nbytes: int) -> Optional[int]:
+        """Reserve capacity; returns None on success or the rejection status."""
+        if self.requests >= self.max_requests or (self.requests and self.bytes + nbytes > self.max_bytes):
+            status = 503
+        elif consultation_id is not None and self.by_consultation[consultation_id] >= self.per_consultation:
+            status = 429
+        else:
+            self.requests += 1
+            self.bytes += nbytes
+            if consultation_id is not None:
+                self.by_consultation[consultation_id] += 1
+            return None
+        self.rejected[status] += 1
+        return status
+
+    def release(self, consultation_id: Optional[str], nbytes: int) -> None:
+        self.requests -= 1
+        self.bytes -= nbytes
+        if consultation_id is None:
+            return
+        self.by_consultation[consultation_id] -= 1
+        if self.by_consultation[consultation_id] <= 0:
+            del self.by_consultation[consultation_id]
+
+
+class UploadAdmissionMiddleware:
+    def __init__(self, app: ASGIApp, admission: UploadAdmission, retry_after: int = 1):
+        self.app = app
+        self.admission = admission
+        self.retry_after = retry_after
+
+    def _request_bytes(self, scope: Scope) -> int:
+        length = Headers(scope=scope).get("content-length")
+        if length and length.isdigit():
+            return int(length)
+        # Unknown length (chunked body): charge the per-image maximum.
+        return self.admission.default_request_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ADMITTED_METHODS:
+            await self.app(scope, receive, send)
+            return
+        if scope["path"] == SUBMIT_PATH:
+            consultation_id = None
+        else:
+            match = IMAGE_PATH_RE.match(scope["path"])
+            if match is None:
+                await self.app(scope, receive, send)
+                return
+            consultation_id = match.group(1)
+
+        nbytes = self._request_bytes(scope)
+        status = self.admission.try_acquire(consultation_id, nbytes)
+        if status is not None:
+            detail = "Upload capacity exceeded" if status == 503 else "Too many concurrent uploads for this consultation"
+            response = JSONResponse({"detail": detail}, status_code=status, headers={"Retry-After": str(self.retry_after)})
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.admission.release(consultation_id, nbytes)
@@ -0,0 +1,175 @@
+"""Pre-aggregated counters for lead and consultation dashboards.
+
+Every bucket is one document in `analytics_rollups`:
+
+    {"_id": "leads:source:landing_form", "kind": "leads", "dim": "source",
+     "key": "landing_form", "count": 42}
+
+Write paths `$inc` the affected buckets, so reading stats costs one pass
+over the buckets instead of a scan of `leads`/`consultations`.
+`rebuild_rollups` recomputes everything from the source collections and
+their archives (see archive.py) for backfills or after drift (e.g. a
+failed best-effort increment):
+
+    cd backend && python -m analytics_rollups
+"""
+import asyncio
+import os
+from typing import Dict, Iterable, List, Tuple
+
+from pymongo import UpdateOne
+
+import archive
+
+
+ROLLUPS = "analytics_rollups"
+
+Bucket = Tuple[str, str, str]  # (kind, dim, key)
+
+
+def _day(created_at) -> str:
+    return str(created_at)[:10]
+
+
+def lead_buckets(lead: dict) -> List[Bucket]:
+    return [
+        ("leads", "day", _day(lead.get("created_at"))),
+        ("leads", "source", lead.get("source") or "unknown"),
+        ("leads", "status", lead.get("status") or "new"),
+    ]
+
+
+def consultation_buckets(consultation: dict) -> List[Bucket]:
+    buckets = [
+        ("consultations", "day", _day(consultation.get("created_at"))),
+        ("consultations", "mode", consultation.get("mode") or "unknown"),
+    ]
+    for s in consultation.get("sports") or []:
+        buckets.append(("consultations", "sport", s.get("sport") or "unknown"))
+    return buckets
+
+
+def _inc_ops(buckets: Iterable[Bucket], delta: int) -> List[UpdateOne]:
+    return [
+        UpdateOne(
+            {"_id": f"{kind}:{dim}:{key}"},
+            {"$inc": {"count": delta}, "$setOnInsert": {"kind": kind, "dim": dim, "key": key}},
+            upsert=True,
+        )
+        for kind, dim, key in buckets
+    ]
+
+
+async def _apply(db, ops: List[UpdateOne]) -> None:
+    if ops:
+        await db[ROLLUPS].bulk_write(ops, ordered=False)
+
+
+async def record_lead_created(db, lead: dict) -> None:
+    await _apply(db, _inc_ops(lead_buckets(lead), 1))
+
+
+async def record_lead_deleted(db, lead: dict) -> None:
+    await _apply(db, _inc_ops(lead_buckets(lead), -1))
+
+
+async def record_lead_status_change(db, old_status: str, new_status: str) -> None:
+    if old_status == new_status:
+        return
+    await _apply(
+        db,
+        _inc_ops([("leads", "status", old_status)], -1) + _inc_ops([("leads", "status", new_status)], 1),
+    )
+
+
+async def record_consultation_created(db, consultation: dict) -> None:
+    await _apply(db, _inc_ops(consultation_buckets(consultation), 1))
+
+
+async def read_stats(db) -> Dict[str, Dict[str, Dict[str, int]]]:
+    stats: Dict[str, Dict[str, Dict[str, int]]] = {"leads": {}, "consultations": {}}
+    async for b in db[ROLLUPS].find({"count": {"$gt": 0}}, {"_id": 0}):
+        stats.setdefault(b["kind"], {}).setdefault(b["dim"], {})[b["key"]] = b["count"]
+    return stats
+
+
+# (source collection, kind, dim, pipeline stages producing {_id: key, count})
+_REBUILD_GROUPS = [
+    ("leads", "leads", "day", [{"$group": {"_id": {"$substrBytes": ["$created_at", 0, 10]}, "count": {"$sum": 1}}}]),
+    ("leads", "leads", "source", [{"$group": {"_id": {"$ifNull": ["$source", "unknown"]}, "count": {"$sum": 1}}}]),
+    ("leads", "leads", "status", [{"$group": {"_id": {"$ifNull": ["$status", "new"]}, "count": {"$sum": 1}}}]),
+    ("consultations", "consultations", "day", [{"$group": {"_id": {"$substrBytes": ["$created_at", 0, 10]}, "count": {"$sum": 1}}}]),
+    ("consultations", "consultations", "mode", [{"$group": {"_id": {"$ifNull": ["$mode", "unknown"]}, "count": {"$sum": 1}}}]),
+    (
+        "consultations",
+        "consultations",
+        "sport",
+        [
+            {"$unwind": "$sports"},
+            {"$group": {"_id": {"$ifNull": ["$sports.sport", "unknown"]}, "count": {"$sum": 1}}},
+        ],
+    ),
+]
+
+
+_ARCHIVED = [("leads", lead_buckets), ("consultations", consultation_buckets)]
+
+
+async def _count_archived(db, counts: Dict[Bucket, int]) -> None:
+    # Archived records can't be aggregated server-side (they are compressed
+    # batches), so their buckets are counted here. A record that also has a
+    # hot copy (archival interrupted before the delete, or a lead reopened)
+    # was already counted by the aggregation.
+    for collection, to_buckets in _ARCHIVED:
+        seen = set()
+        async for docs in archive.iter_archived(db, collection):
+            ids = [doc.get("id") for doc in docs]
+            seen.update(await db[collection].distinct("id", {"id": {"$in": ids}}))
+            for doc in docs:
+                if doc.get("id") in seen:
+                    continue
+                seen.add(doc.get("id"))
+                for bucket in to_buckets(doc):
+                    counts[bucket] = counts.get(bucket, 0) + 1
+
+
+async def rebuild_rollups(db) -> int:
+    """Recompute all buckets from source and archive collections; returns the bucket count."""
+    counts: Dict[Bucket, int] = {}
+    for collection, kind, dim, stages in _REBUILD_GROUPS:
+        async for row in db[collection].aggregate(stages):
+            bucket = (kind, dim, str(row["_id"]))
+            counts[bucket] = counts.get(bucket, 0) + row["count"]
+    await _count_archived(db, counts)
+
+    seen: List[str] = []
+    ops: List[UpdateOne] = []
+    for (kind, dim, key), count in counts.items():
+        bucket_id = f"{kind}:{dim}:{key}"
+        seen.append(bucket_id)
+        ops.append(
+            UpdateOne(
+                {"_id": bucket_id},
+                {"$set": {"kind": kind, "dim": dim, "key": key, "count": count}},
+                upsert=True,
+            )
+        )
+    await _apply(db, ops)
+    await db[ROLLUPS].delete_many({"_id": {"$nin": seen}})
+    return len(seen)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pathlib import Path
+
+    load_dotenv(Path(__file__).parent / ".env")
+
+    async def _main():
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        n = await rebuild_rollups(client[os.environ["DB_NAME"]])
+        print(f"Rebuilt {n} rollup buckets")
+        client.close()
+
+    asyncio.run(_main())
@@ -0,0 +1,212 @@
+"""Hot/cold tiering: move old records out of the hot collections.
+
+Closed leads, consultations and status checks older than a configurable
+age are moved in batches into `<collection>_archive`. Each archive
+document holds one batch, BSON-encoded and compressed (zstd when
+`zstandard` is installed, zlib otherwise), plus the list of record ids it
+contains (indexed) so single records can still be looked up:
+
+    {"_id": <batch hash>, "ids": [...], "count": 500, "codec": "zstd",
+     "first": <oldest timestamp>, "last": <newest timestamp>,
+     "raw_bytes": 412345, "data": <compressed bytes>, "archived_at": ...}
+
+A batch is written before its records are deleted from the hot collection,
+and its `_id` is derived from the ids it holds, so an interrupted run can
+simply be repeated. Derived search fields are dropped on the way out.
+
+Consultation images are not put into batches: their chunks would overflow
+a batch document. By default they stay hot (and downloadable) after their
+consultation is archived. With `--expire-images` an archived
+consultation's image metadata, chunks and thumbnails are deleted instead,
+before the consultation leaves the hot collection, so a repeated run
+finishes an interrupted one.
+
+Run it from cron (ages in days, per collection):
+
+    cd backend && python -m archive --days leads=180 --days status_checks=30
+"""
+import asyncio
+import hashlib
+import os
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional
+
+import bson
+
+import image_store
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+
+ARCHIVE_SUFFIX = "_archive"
+BATCH_SIZE = 500
+
+# collection -> (age field, extra filter for records that are done with)
+TIERS: Dict[str, tuple] = {
+    "leads": ("created_at", {"status": "closed"}),
+    "consultations": ("created_at", {}),
+    "status_checks": ("timestamp", {}),
+}
+
+DEFAULT_AGE_DAYS = {"leads": 180, "consultations": 365, "status_checks": 30}
+
+# Derived on write; cheap to rebuild, so not worth archiving.
+DROP_FIELDS = ("_id", "search_prefixes")
+
+
+def _compress(data: bytes) -> tuple:
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this archive batch")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def archive_name(collection: str) -> str:
+    return collection + ARCHIVE_SUFFIX
+
+
+async def _expire_images(db, consultation_ids: List[str]) -> int:
+    """Delete the images of these consultations; returns how many."""
+    metas = await db.consultation_images.find(
+        {"consultation_id": {"$in": consultation_ids}}, {"_id": 0, "id": 1}
+    ).to_list(None)
+    image_ids = [meta["id"] for meta in metas]
+    if not image_ids:
+        return 0
+    # Metadata last, so an interrupted run finds the images again.
+    await db[image_store.CHUNKS].delete_many({"image_id": {"$in": image_ids}})
+    await db[image_store.THUMBNAILS].delete_many({"image_id": {"$in": image_ids}})
+    await db.consultation_images.delete_many({"id": {"$in": image_ids}})
+    return len(image_ids)
+
+
+async def archive_collection(
+    db, collection: str, older_than: datetime, batch_size: int = BATCH_SIZE, expire_images: bool = False
+) -> int:
+    """Move finished records older than `older_than`; returns how many moved.
+
+    With `expire_images`, archived consultations lose their images.
+    """
+    field, extra = TIERS[collection]
+    query = {**extra, "id": {"$exists": True}, field: {"$lt": older_than.isoformat()}}
+    moved = 0
+    while True:
+        docs = await db[collection].find(query).sort(field, 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            return moved
+        for doc in docs:
+            for name in DROP_FIELDS:
+                doc.pop(name, None)
+        ids = [doc["id"] for doc in docs]
+        raw = bson.encode({"docs": docs})
+        codec, data = _compress(raw)
+        await db[archive_name(collection)].replace_one(
+            {"_id": hashlib.sha1("\n".join(ids).encode()).hexdigest()},
+            {
+                "ids": ids,
+                "count": len(docs),
+                "first": docs[0].get(field),
+                "last": docs[-1].get(field),
+                "codec": codec,
+                "raw_bytes": len(raw),
+                "data": data,
+                "archived_at": datetime.now(timezone.utc).isoformat(),
+            },
+            upsert=True,
+        )
+        if expire_images and collection == "consultations":
+            await _expire_images(db, ids)
+        # Re-check the filter so a record changed since it was read (e.g. a
+        # lead reopened) stays hot; reads prefer the hot copy.
+        res = await db[collection].delete_many({**query, "id": {"$in": ids}})
+        moved += res.deleted_count
+        if len(docs) < batch_size:
+            return moved
+
+
+def _batch_docs(batch: dict) -> List[dict]:
+    return bson.decode(_decompress(batch["codec"], bytes(batch["data"])))["docs"]
+
+
+async def find_archived(db, collection: str, record_id: str) -> Optional[dict]:
+    batch = await db[archive_name(collection)].find_one({"ids": record_id}, {"codec": 1, "data": 1})
+    if batch is None:
+        return None
+    for doc in _batch_docs(batch):
+        if doc.get("id") == record_id:
+            return doc
+    return None
+
+
+async def iter_archived(db, collection: str) -> AsyncIterator[List[dict]]:
+    """Yield the records of `collection`'s archive, one batch at a time."""
+    async for batch in db[archive_name(collection)].find({}, {"codec": 1, "data": 1}):
+        yield _batch_docs(batch)
+
+
+async def ensure_archive_indexes(db) -> None:
+    await asyncio.gather(*[db[archive_name(c)].create_index("ids") for c in TIERS])
+
+
+async def run_archival(
+    db, age_days: Dict[str, int], batch_size: int = BATCH_SIZE, expire_images: bool = False
+) -> Dict[str, int]:
+    now = datetime.now(timezone.utc)
+    return {
+        collection: await archive_collection(
+            db, collection, now - timedelta(days=days), batch_size, expire_images
+        )
+        for collection, days in age_days.items()
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pathlib import Path
+
+    load_dotenv(Path(__file__).parent / ".env")
+
+    parser = argparse.ArgumentParser(description="Archive old leads, consultations and status checks")
+    parser.add_argument(
+        "--days", action="append", default=[], metavar="COLLECTION=DAYS",
+        help=f"age after which records are archived (defaults: {DEFAULT_AGE_DAYS})",
+    )
+    parser.add_argument("--only", nargs="+", choices=sorted(TIERS), help="archive only these collections")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument(
+        "--expire-images", action="store_true",
+        help="delete the images of archived consultations (kept and still served by default)",
+    )
+    args = parser.parse_args()
+
+    age_days = dict(DEFAULT_AGE_DAYS)
+    for item in args.days:
+        name, _, days = item.partition("=")
+        if name not in TIERS:
+            parser.error(f"unknown collection {name!r}")
+        age_days[name] = int(days)
+    if args.only:
+        age_days = {name: age_days[name] for name in args.only}
+
+    async def _main():
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        db = client[os.environ["DB_NAME"]]
+        await ensure_archive_indexes(db)
+        for collection, n in (await run_archival(db, age_days, args.batch_size, args.expire_images)).items():
+            print(f"Archived {n} {collection}")
+        client.close()
+
+    asyncio.run(_main())
@@ -0,0 +1,58 @@
+"""Bytes saved and CPU cost per response for a 100-lead `GET /api/leads` page.
+
+Offline: the page is synthesized in the shape `list_leads` returns.
+
+    cd backend && python -m benchmarks.bench_compression --leads 100 --iterations 200
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+
+from compression import _Brotli, _Gzip, _Zstd, available_encodings
+
+
+def lead_page(n: int) -> bytes:
+    leads = [
+        {
+            "id": str(uuid.uuid4()),
+            "name": f"Contact {i}",
+            "company": f"Sports Arena {i} Pvt Ltd",
+            "email": f"contact{i}@arena{i}.com",
+            "phone": f"+91-98{i:08d}",
+            "need": "Planning a multi-sport facility with padel and pickleball courts; need help with layout, lighting and vendor selection.",
+            "source": "landing_form",
+            "status": "new",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        for i in range(n)
+    ]
+    return json.dumps(leads).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--leads", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--gzip-level", type=int, default=6)
+    parser.add_argument("--brotli-quality", type=int, default=4)
+    parser.add_argument("--zstd-level", type=int, default=3)
+    args = parser.parse_args()
+
+    body = lead_page(args.leads)
+    levels = {"gzip": args.gzip_level, "br": args.brotli_quality, "zstd": args.zstd_level}
+    encoders = {"gzip": _Gzip, "br": _Brotli, "zstd": _Zstd}
+
+    print(f"identity: {len(body)} bytes")
+    for name in available_encodings():
+        start = time.process_time()
+        for _ in range(args.iterations):
+            out = encoders[name](levels[name]).finish(body)
+        cpu_us = (time.process_time() - start) / args.iterations * 1e6
+        saved = 100 * (1 - len(out) / len(body))
+        print(f"{name:5s} level {levels[name]:<2d} {len(out):7d} bytes  {saved:5.1f}% saved  {cpu_us:7.0f} us CPU/response")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Emails/sec and thread usage: `asyncio.to_thread(resend.Emails.send)` vs `ResendTransport`.
+
+Runs offline: the provider is simulated with a fixed per-request latency.
+
+    cd backend && python -m benchmarks.bench_email --emails 500 --latency 0.05
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import httpx
+
+from email_transport import ResendTransport
+
+
+PARAMS = {
+    "from": "hello@rewind-ventures.com",
+    "to": ["hello@rewind-ventures.com"],
+    "subject": "bench",
+    "html": "<p>bench</p>",
+}
+
+
+class ThreadSampler:
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._task = None
+
+    async def _run(self):
+        while True:
+            self.peak = max(self.peak, threading.active_count())
+            await asyncio.sleep(0.005)
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+
+async def bench_to_thread(n: int, latency: float) -> tuple:
+    def blocking_send(params):
+        time.sleep(latency)
+        return {"id": "x"}
+
+    with ThreadSampler() as sampler:
+        start = time.perf_counter()
+        await asyncio.gather(*[asyncio.to_thread(blocking_send, PARAMS) for _ in range(n)])
+        elapsed = time.perf_counter() - start
+    return elapsed, sampler.peak
+
+
+async def bench_transport(n: int, latency: float, concurrency: int) -> tuple:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json={"id": "x"})
+
+    transport = ResendTransport(
+        "re_bench",
+        max_concurrency=concurrency,
+        max_connections=concurrency,
+        transport=httpx.MockTransport(handler),
+    )
+    with ThreadSampler() as sampler:
+        start = time.perf_counter()
+        await asyncio.gather(*[transport.send(PARAMS) for _ in range(n)])
+        elapsed = time.perf_counter() - start
+    await transport.aclose()
+    return elapsed, sampler.peak
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--emails", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    # The transport runs first: default-executor threads outlive the to_thread run.
+    print(f"baseline threads: {threading.active_count()}")
+    for name, coro in (
+        ("ResendTransport", bench_transport(args.emails, args.latency, args.concurrency)),
+        ("to_thread(resend.Emails.send)", bench_to_thread(args.emails, args.latency)),
+    ):
+        elapsed, peak_threads = await coro
+        print(f"{name:32s} {args.emails / elapsed:8.1f} emails/s  peak threads: {peak_threads}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+"""Tail latency of create_lead and complete_consultation_image_upload under
+injected Mongo and Resend faults (see benchmarks/faults.py).
+
+Fully offline: the app runs in-process against mongomock-motor (a dev-only
+dependency: `pip install mongomock-motor`) wrapped in `FaultyDatabase`, and
+a local Resend stand-in. Each profile drives both endpoints concurrently
+and reports latency percentiles, 5xx responses and client timeouts.
+
+    cd backend && python -m benchmarks.bench_faults --requests 200 --concurrency 20
+
+Requests are run through httpx's ASGI transport, so a client timeout also
+cancels the handler (a real server would keep running it).
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+import httpx
+
+os.environ.setdefault("MONGO_URL", "mongodb://stand-in")
+os.environ.setdefault("DB_NAME", "bench_faults")
+os.environ.setdefault("SEARCH_BACKEND", "memory")
+os.environ.setdefault("LOG_LEVEL", "critical")
+
+from benchmarks.bench_leads import LEAD  # noqa: E402
+from benchmarks.bench_upload import CONSULTATION  # noqa: E402
+from benchmarks.faults import PROFILES, FaultyDatabase, resend_stand_in  # noqa: E402
+
+
+def _load_app(no_digest: bool):
+    try:
+        import mongomock_motor
+    except ImportError:
+        sys.exit("bench_faults needs mongomock-motor: pip install mongomock-motor")
+    import motor.motor_asyncio
+
+    if no_digest:
+        os.environ["NOTIFY_DIGEST_RATE_PER_MIN"] = str(10 ** 9)
+    stand_in = mongomock_motor.AsyncMongoMockClient()
+    stand_in.close = lambda: None
+    motor.motor_asyncio.AsyncIOMotorClient = lambda *args, **kwargs: stand_in
+
+    import server
+
+    return server
+
+
+def route_reads(router, handles: dict) -> None:
+    """Point `router` (server.read_router) at `handles`, keyed like its own."""
+    router._handles = handles
+    router.primary = handles[("primary", -1)]
+
+
+async def prepare_images(c: httpx.AsyncClient, n: int, size: int) -> list:
+    """One single-image consultation per complete call, uploaded fault-free."""
+    data = os.urandom(size)
+    paths = []
+    for _ in range(n):
+        cid = (await c.post("/api/consultations", json=CONSULTATION)).json()["id"]
+        r = await c.post(f"/api/consultations/{cid}/images/init", json={"filename": "site.jpg", "size": size, "content_type": "image/jpeg"})
+        iid = r.json()["image_id"]
+        await c.put(f"/api/consultations/{cid}/images/{iid}", content=data)
+        paths.append(f"/api/consultations/{cid}/images/{iid}/complete")
+    return paths
+
+
+async def drive(c: httpx.AsyncClient, calls: list, concurrency: int, client_timeout: float) -> dict:
+    latencies, errors, timeouts = [], 0, 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(call):
+        nonlocal errors, timeouts
+        async with sem:
+            start = time.perf_counter()
+            try:
+                r = await asyncio.wait_for(call(), timeout=client_timeout)
+            except asyncio.TimeoutError:
+                timeouts += 1
+                latencies.append(client_timeout)
+                return
+            latencies.append(time.perf_counter() - start)
+            if r.status_code >= 500:
+                errors += 1
+
+    await asyncio.gather(*[one(call) for call in calls])
+    return {"latencies": latencies, "errors": errors, "timeouts": timeouts}
+
+
+def fmt(name: str, result: dict) -> str:
+    xs = sorted(result["latencies"])
+    q = statistics.quantiles(xs, n=100, method="inclusive")
+    return (
+        f"  {name:9} p50 {q[49] * 1000:8.1f}  p95 {q[94] * 1000:8.1f}  p99 {q[98] * 1000:8.1f}"
+        f"  max {xs[-1] * 1000:8.1f} ms   5xx {result['errors']:4}  timeouts {result['timeouts']:4}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200, help="per endpoint and profile")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--client-timeout", type=float, default=15.0)
+    parser.add_argument("--image-kb", type=int, default=200)
+    parser.add_argument("--profiles", nargs="+", choices=[p.name for p in PROFILES])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-digest", action="store_true", help="send every lead email inline (no digest batching)")
+    args = parser.parse_args()
+
+    server = _load_app(args.no_digest)
+    rng = random.Random(args.seed)
+    await server.app.router.startup()
+    real_db = server.db
+    # Routed reads bypass server.db; their handles get the same faults.
+    real_handles = dict(server.read_router._handles)
+    transport = httpx.ASGITransport(app=server.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as c:
+        for profile in PROFILES:
+            if args.profiles and profile.name not in args.profiles:
+                continue
+            server.db, server.email_transport = real_db, resend_stand_in(profile.email, rng)
+            route_reads(server.read_router, real_handles)
+            complete_paths = await prepare_images(c, args.requests, args.image_kb * 1024)
+            faulty = FaultyDatabase(real_db, profile.mongo, rng)
+            server.db = faulty
+            route_reads(server.read_router, {key: faulty.wrap(h) for key, h in real_handles.items()})
+
+            leads, completes = await asyncio.gather(
+                drive(c, [lambda: c.post("/api/leads", json=LEAD)] * args.requests, args.concurrency, args.client_timeout),
+                drive(c, [lambda p=p: c.post(p) for p in complete_paths], args.concurrency, args.client_timeout),
+            )
+            # Let digest batches and in-flight sends settle before the next profile.
+            await server.notification_batcher.flush()
+            await server.email_transport.aclose()
+
+            print(
+                f"{profile.name}: mongo calls {faulty.calls}, injected errors {faulty.injected_errors}, "
+                f"timeouts {faulty.injected_timeouts}; resend breaker {server.email_transport.breaker.state}"
+            )
+            print(fmt("lead", leads))
+            print(fmt("complete", completes))
+
+    server.db = real_db
+    route_reads(server.read_router, real_handles)
+    server.email_transport = None
+    await server.app.router.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
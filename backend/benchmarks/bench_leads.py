@@ -0,0 +1,101 @@
+"""Lead-creation throughput for 1 vs N workers of serve.py.
+
+Needs a reachable MongoDB (MONGO_URL/DB_NAME from backend/.env). Emails go
+to the in-memory fake transport so only the API and Mongo are measured.
+
+    cd backend && python -m benchmarks.bench_leads --requests 2000 --workers 1 4
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+LEAD = {
+    "name": "Bench",
+    "company": "Bench Co",
+    "email": "bench@example.com",
+    "need": "Throughput benchmark",
+    "source": "benchmark",
+}
+
+
+async def wait_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as c:
+        while time.monotonic() < deadline:
+            try:
+                if (await c.get(f"{base_url}/api/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+async def fire(base_url: str, total: int, concurrency: int) -> float:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    sem = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as c:
+        async def one():
+            async with sem:
+                r = await c.post("/api/leads", json=LEAD)
+                r.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(total)])
+        return time.perf_counter() - start
+
+
+@contextlib.asynccontextmanager
+async def serve_process(workers: int, port: int, env: dict = None):
+    """Run serve.py in a subprocess (fake email transport) and yield its base URL."""
+    env = {
+        **os.environ,
+        "EMAIL_TRANSPORT": "fake",
+        "NOTIFY_DIGEST_RATE_PER_MIN": "1000000000",
+        **(env or {}),
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "serve.py", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await wait_ready(base_url)
+        yield base_url
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+async def run(workers: int, port: int, total: int, concurrency: int) -> float:
+    async with serve_process(workers, port) as base_url:
+        await fire(base_url, min(200, total), concurrency)  # warm-up
+        return total / await fire(base_url, total, concurrency)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    for workers in args.workers:
+        rps = await run(workers, args.port, args.requests, args.concurrency)
+        print(f"workers={workers:<3d} {rps:8.1f} leads/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""Per-call cost of logging on the request path (the calling thread).
+
+Compares the old setup (`basicConfig`: text StreamHandler written inline)
+with the queued JSON setup from structured_logging.py, for a plain
+`logger.info` and a `logger.exception` with a traceback. The "slow sink"
+rows add 1 ms per write to model a backed-up stderr pipe or log driver.
+
+Offline; no server or database needed.
+
+    cd backend && python -m benchmarks.bench_logging --calls 2000
+"""
+import argparse
+import logging
+import logging.handlers
+import os
+import queue
+import time
+
+from structured_logging import TEXT_FORMAT, ErrorSampler, JsonFormatter, _LoopSafeQueueHandler
+
+
+class SlowStream:
+    def __init__(self, stream, delay: float):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, s):
+        time.sleep(self.delay)
+        return self.stream.write(s)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def inline_handler(stream) -> tuple:
+    h = logging.StreamHandler(stream)
+    h.setFormatter(logging.Formatter(TEXT_FORMAT))
+    return h, None
+
+
+def queued_handler(stream) -> tuple:
+    sink = logging.StreamHandler(stream)
+    sink.setFormatter(JsonFormatter())
+    q = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(q, sink)
+    listener.start()
+    h = _LoopSafeQueueHandler(q)
+    # Sampling disabled so both setups emit every record.
+    h.addFilter(ErrorSampler(burst=10 ** 9))
+    return h, listener
+
+
+def measure(make_handler, stream, calls: int, kind: str) -> float:
+    logger = logging.getLogger(f"bench.{kind}.{id(stream)}.{make_handler.__name__}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler, listener = make_handler(stream)
+    logger.addHandler(handler)
+
+    start = time.perf_counter()
+    for i in range(calls):
+        if kind == "info":
+            logger.info("Lead created %s for %s", i, "Sports Arena Pvt Ltd")
+        else:
+            try:
+                raise RuntimeError("Resend API returned 503")
+            except RuntimeError as e:
+                logger.exception("Failed sending lead email notification: %s", str(e))
+    elapsed = time.perf_counter() - start
+
+    if listener is not None:
+        listener.stop()
+    logger.removeHandler(handler)
+    return elapsed / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--slow-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull:
+        sinks = [("devnull", devnull, args.calls), ("slow sink", SlowStream(devnull, args.slow_ms / 1000), 200)]
+        print(f"{'sink':10} {'call':10} {'inline text':>14} {'queued json':>14}")
+        for sink_name, stream, calls in sinks:
+            for kind in ("info", "exception"):
+                inline = measure(inline_handler, stream, calls, kind)
+                queued = measure(queued_handler, stream, calls, kind)
+                print(f"{sink_name:10} {kind:10} {inline:11.1f} us {queued:11.1f} us")
+
+
+if __name__ == "__main__":
+    main()
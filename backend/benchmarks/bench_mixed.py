@@ -0,0 +1,103 @@
+"""Lead latency during an image upload storm, with and without admission control.
+
+Needs a reachable MongoDB (MONGO_URL/DB_NAME from backend/.env).
+
+    cd backend && python -m benchmarks.bench_mixed --uploaders 64 --leads 300
+
+No results are checked in: the numbers depend on the MongoDB deployment,
+so record them from a run against it when tuning the UPLOAD_MAX_* limits.
+Rejected uploads are expected with admission on (eight uploaders share
+each consultation, twice the default per-consultation cap).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+from benchmarks.bench_leads import LEAD, serve_process
+from benchmarks.bench_upload import CONSULTATION
+
+
+async def upload_storm(base_url: str, uploaders: int, data: bytes, stop: asyncio.Event) -> dict:
+    counts = {"ok": 0, "rejected": 0}
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as c:
+        consultations = []
+        for _ in range(max(1, uploaders // 8)):
+            r = await c.post("/api/consultations", json=CONSULTATION)
+            consultations.append(r.json()["id"])
+
+        async def uploader(n: int):
+            consultation_id = consultations[n % len(consultations)]
+            while not stop.is_set():
+                # Image init is admission controlled too, so it can be rejected.
+                r = await c.post(
+                    f"/api/consultations/{consultation_id}/images/init",
+                    json={"filename": "bench.jpg", "size": len(data), "content_type": "image/jpeg"},
+                )
+                if r.status_code not in (429, 503):
+                    r.raise_for_status()
+                    image_id = r.json()["image_id"]
+                    r = await c.put(f"/api/consultations/{consultation_id}/images/{image_id}", content=data)
+                if r.status_code in (429, 503):
+                    counts["rejected"] += 1
+                    await asyncio.sleep(float(r.headers.get("retry-after", "1")) / 10)
+                else:
+                    counts["ok"] += 1
+
+        await asyncio.gather(*[uploader(n) for n in range(uploaders)])
+    return counts
+
+
+async def lead_latencies(base_url: str, total: int, concurrency: int) -> list:
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as c:
+        async def one():
+            async with sem:
+                start = time.perf_counter()
+                (await c.post("/api/leads", json=LEAD)).raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*[one() for _ in range(total)])
+    return latencies
+
+
+async def scenario(port: int, admission: bool, args, data: bytes) -> None:
+    env = {"UPLOAD_ADMISSION": "1" if admission else "0"}
+    async with serve_process(1, port, env) as base_url:
+        baseline = await lead_latencies(base_url, args.leads, args.lead_concurrency)
+        stop = asyncio.Event()
+        storm = asyncio.create_task(upload_storm(base_url, args.uploaders, data, stop))
+        await asyncio.sleep(1.0)
+        loaded = await lead_latencies(base_url, args.leads, args.lead_concurrency)
+        stop.set()
+        counts = await storm
+
+    def fmt(xs):
+        q = statistics.quantiles(xs, n=100, method="inclusive")
+        return f"p50 {q[49] * 1000:6.1f} ms  p99 {q[98] * 1000:6.1f} ms"
+
+    label = "admission on " if admission else "admission off"
+    print(f"{label} idle:  {fmt(baseline)}")
+    print(f"{label} storm: {fmt(loaded)}  uploads ok={counts['ok']} rejected={counts['rejected']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploaders", type=int, default=64)
+    parser.add_argument("--size-kb", type=int, default=1900)
+    parser.add_argument("--leads", type=int, default=300)
+    parser.add_argument("--lead-concurrency", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8768)
+    args = parser.parse_args()
+
+    data = os.urandom(args.size_kb * 1024)
+    for admission in (False, True):
+        await scenario(args.port, admission, args, data)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""Lead submissions while the dashboard polls, with reads on the primary vs routed.
+
+Needs a local replica set; MONGO_URL points at it (DB_NAME from backend/.env):
+
+    mkdir -p /tmp/rs/0 /tmp/rs/1 /tmp/rs/2
+    for i in 0 1 2; do
+      mongod --replSet rs0 --port 2701$i --dbpath /tmp/rs/$i --bind_ip 127.0.0.1 \\
+        --fork --logpath /tmp/rs/$i.log
+    done
+    mongosh --port 27010 --eval 'rs.initiate({_id: "rs0", members: [
+      {_id: 0, host: "127.0.0.1:27010"}, {_id: 1, host: "127.0.0.1:27011"},
+      {_id: 2, host: "127.0.0.1:27012"}]})'
+
+    cd backend && MONGO_URL="mongodb://127.0.0.1:27010/?replicaSet=rs0" \\
+        python -m benchmarks.bench_reads --pollers 32 --leads 300
+
+Each scenario runs one worker, so /api/admin/read-routing covers all of its
+reads; the run fails if upload state checks were ever served by a secondary.
+"""
+import argparse
+import asyncio
+import statistics
+
+import httpx
+
+from benchmarks.bench_leads import serve_process
+from benchmarks.bench_mixed import lead_latencies
+from benchmarks.bench_upload import CONSULTATION, init_image
+
+
+# Every default route pinned to the primary: what the API did before routing.
+ALL_PRIMARY = ",".join(
+    f"{route}=primary"
+    for route in ("leads", "consultations", "search", "stats", "status", "images", "upload_state")
+)
+
+POLLED = ["/api/leads", "/api/consultations", "/api/status", "/api/stats"]
+
+
+async def dashboard(base_url: str, pollers: int, stop: asyncio.Event) -> int:
+    polls = 0
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as c:
+        async def poller(n: int):
+            nonlocal polls
+            while not stop.is_set():
+                (await c.get(POLLED[n % len(POLLED)])).raise_for_status()
+                polls += 1
+
+        await asyncio.gather(*[poller(n) for n in range(pollers)])
+    return polls
+
+
+async def uploads(base_url: str, count: int) -> None:
+    # Exercises the upload state checks, which must stay on the primary.
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as c:
+        consultation_id = (await c.post("/api/consultations", json=CONSULTATION)).json()["id"]
+        for _ in range(count):
+            image_id = await init_image(c, consultation_id, 1024)
+            await c.put(f"/api/consultations/{consultation_id}/images/{image_id}", content=b"x" * 1024)
+            await c.get(f"/api/consultations/{consultation_id}/images/{image_id}")
+
+
+ADMIN_TOKEN = "bench-reads"
+
+
+async def scenario(port: int, label: str, read_preferences: str, args) -> None:
+    env = {"READ_PREFERENCES": read_preferences, "PROFILING_TOKEN": ADMIN_TOKEN}
+    async with serve_process(1, port, env) as base_url:
+        baseline = await lead_latencies(base_url, args.leads, args.lead_concurrency)
+        stop = asyncio.Event()
+        polling = asyncio.create_task(dashboard(base_url, args.pollers, stop))
+        await asyncio.sleep(1.0)
+        loaded, _ = await asyncio.gather(
+            lead_latencies(base_url, args.leads, args.lead_concurrency),
+            uploads(base_url, args.uploads),
+        )
+        stop.set()
+        polls = await polling
+        async with httpx.AsyncClient(base_url=base_url) as c:
+            metrics = (await c.get("/api/admin/read-routing", headers={"X-Profile-Token": ADMIN_TOKEN})).json()
+
+    def fmt(xs):
+        q = statistics.quantiles(xs, n=100, method="inclusive")
+        return f"p50 {q[49] * 1000:6.1f} ms  p99 {q[98] * 1000:6.1f} ms"
+
+    print(f"{label} idle:    {fmt(baseline)}")
+    print(f"{label} polling: {fmt(loaded)}  polls={polls}")
+    print(f"{label} reads:   {metrics['totals']}  servers={metrics['servers']}")
+    upload_state = metrics["reads"].get("upload_state", {})
+    if any(role != "primary" for role in upload_state):
+        raise SystemExit(f"upload state reads left the primary: {upload_state}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pollers", type=int, default=32)
+    parser.add_argument("--leads", type=int, default=300)
+    parser.add_argument("--lead-concurrency", type=int, default=4)
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8771)
+    args = parser.parse_args()
+
+    await scenario(args.port, "all primary", ALL_PRIMARY, args)
+    await scenario(args.port, "routed     ", "", args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+"""Search latency against the <50 ms target on 1M leads.
+
+    cd backend && python -m benchmarks.bench_search --leads 1000000
+    cd backend && MONGO_URL=mongodb://127.0.0.1:27017 \\
+        python -m benchmarks.bench_search --backend mongo --leads 1000000
+
+`memory` builds a `MemorySearch` index over synthetic leads in-process; hit
+documents are looked up in a dict instead of Mongo, so the numbers cover
+ranking and paging only. `mongo` loads the same leads into a scratch
+database (DB_NAME, default `bench_search`, dropped first) and times
+`MongoTextSearch` end to end.
+
+Queries are run per class (a rare company word, a common word in `need`,
+a company prefix) and reported as p50/p99 for the first page of 25.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timezone
+
+import search
+
+
+COMMON_NEED = "padel courts lighting layout vendor"
+
+
+def make_leads(n: int, rng: random.Random):
+    # A few thousand distinct company words, so a company word matches
+    # hundreds of leads while a `need` word matches most of them.
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 9))) for _ in range(3000)]
+    now = datetime.now(timezone.utc).isoformat()
+    for _ in range(n):
+        doc = {
+            "id": str(uuid.uuid4()),
+            "company": f"{rng.choice(words).title()} {rng.choice(words).title()} Sports",
+            "name": f"{rng.choice(words).title()} {rng.choice(words).title()}",
+            "need": " ".join(rng.sample(COMMON_NEED.split(), 3) + rng.sample(words, 5)),
+            "created_at": now,
+        }
+        doc.update(search.search_fields("leads", doc))
+        yield doc
+
+
+def queries(leads: list, rng: random.Random, per_class: int) -> dict:
+    sample = rng.sample(leads, per_class)
+    return {
+        "company word": [d["company"].split()[0] for d in sample],
+        "common need word": [rng.choice(COMMON_NEED.split()) for _ in range(per_class)],
+        "company prefix": [d["company"].split()[1][:4] for d in sample],
+    }
+
+
+class _Found:
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def to_list(self, length):
+        return self._docs
+
+
+class DictDatabase:
+    """Just the `find({"id": {"$in": ids}})` lookups `MemorySearch` makes."""
+
+    def __init__(self, docs: dict):
+        self._docs = docs
+
+    def __getitem__(self, name):
+        docs = self._docs
+
+        class Leads:
+            def find(self, query, projection=None):
+                return _Found([docs[i] for i in query["id"]["$in"] if i in docs])
+
+        return Leads()
+
+
+async def timed(backend, qs: dict, limit: int) -> None:
+    for label, terms in qs.items():
+        samples = []
+        for q in terms:
+            start = time.perf_counter()
+            await backend.search("leads", q, 0, limit + 1)
+            samples.append(time.perf_counter() - start)
+        p = statistics.quantiles(samples, n=100, method="inclusive")
+        print(f"  {label:17} p50 {p[49] * 1000:8.1f} ms  p99 {p[98] * 1000:8.1f} ms")
+
+
+async def run_memory(leads: list, qs: dict, limit: int) -> None:
+    by_id = {d["id"]: d for d in leads}
+    backend = search.MemorySearch(DictDatabase(by_id), refresh_interval=None)
+    start = time.perf_counter()
+    for doc in leads:
+        backend.add("leads", doc)
+    print(f"memory: indexed {len(leads)} leads in {time.perf_counter() - start:.1f} s")
+    await timed(backend, qs, limit)
+
+
+async def run_mongo(leads: list, qs: dict, limit: int) -> None:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("DB_NAME", "bench_search")]
+    try:
+        await db.leads.drop()
+        start = time.perf_counter()
+        for i in range(0, len(leads), 10000):
+            await db.leads.insert_many([dict(d) for d in leads[i:i + 10000]], ordered=False)
+        backend = search.MongoTextSearch(db)
+        await backend.load()
+        print(f"mongo: loaded and indexed {len(leads)} leads in {time.perf_counter() - start:.1f} s")
+        await timed(backend, qs, limit)
+    finally:
+        client.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["memory", "mongo"], default="memory")
+    parser.add_argument("--leads", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=50, help="per query class")
+    parser.add_argument("--limit", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    leads = list(make_leads(args.leads, rng))
+    qs = queries(leads, rng, args.queries)
+    if args.backend == "memory":
+        await run_memory(leads, qs, args.limit)
+    else:
+        await run_mongo(leads, qs, args.limit)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
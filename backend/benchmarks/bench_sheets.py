@@ -0,0 +1,105 @@
+"""Per-row Apps Script calls (what the frontend does) vs batched sheets_sync.
+
+Offline: the Apps Script is the in-process stand-in from sheets_stand_in.py
+(with per-call latency and throttling) and Mongo is mongomock-motor, a
+dev-only dependency (`pip install mongomock-motor`).
+
+    cd backend && python -m benchmarks.bench_sheets --leads 400 --consultations 100 --throttle-rate 0.1
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from benchmarks.sheets_stand_in import create_app
+from sheets_sync import SheetsSync, SheetsSyncError
+
+
+URL = "http://sheets/exec"
+
+
+def _docs(kind: str, n: int) -> list:
+    start = datetime.now(timezone.utc)
+    docs = []
+    for i in range(n):
+        doc = {
+            "id": str(uuid.uuid4()),
+            "name": f"Contact {i}",
+            "email": f"c{i}@example.com",
+            "company": f"Arena {i}",
+            "created_at": (start + timedelta(milliseconds=i)).isoformat(),
+        }
+        if kind == "leads":
+            doc.update(need="Padel courts", source="landing_form")
+        else:
+            doc.update(details="d", mode="single", sports=[{"sport": "padel", "courts": 2}],
+                       facility_name="F", google_maps_url="https://maps", source="consultation_form")
+        docs.append(doc)
+    return docs
+
+
+async def per_row(docs_by_sheet: dict, latency: float, throttle_rate: float, concurrency: int) -> tuple:
+    app = create_app(latency, throttle_rate)
+    sem = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app)) as c:
+        async def one(sheet, doc):
+            async with sem:
+                # The browser uses no-cors and never sees a refusal: no retry.
+                await c.post(URL, json={"sheet": sheet, "timestamp": doc["created_at"], **doc})
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one(sheet, d) for sheet, docs in docs_by_sheet.items() for d in docs])
+        elapsed = time.perf_counter() - start
+    landed = sum(len(rows) for rows in app.state.sheets.values())
+    return elapsed, app.state.stats["calls"], landed
+
+
+async def batched(db, latency: float, throttle_rate: float, batch_size: int, total: int) -> tuple:
+    app = create_app(latency, throttle_rate)
+    sync = SheetsSync(db, URL, interval=0, batch_size=batch_size, backfill=True,
+                      transport=httpx.ASGITransport(app=app))
+    start = time.perf_counter()
+    while sum(sync.appended.values()) < total:
+        try:
+            await sync.sync_once()
+        except SheetsSyncError:
+            pass  # run() would back off; here we just go again
+    elapsed = time.perf_counter() - start
+    await sync.stop()
+    landed = sum(len(rows) for rows in app.state.sheets.values())
+    return elapsed, app.state.stats["calls"], landed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--leads", type=int, default=400)
+    parser.add_argument("--consultations", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per Apps Script call")
+    parser.add_argument("--throttle-rate", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent browsers (per-row mode)")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    try:
+        import mongomock_motor
+    except ImportError:
+        sys.exit("bench_sheets needs mongomock-motor: pip install mongomock-motor")
+
+    docs = {"leads": _docs("leads", args.leads), "consultations": _docs("consultations", args.consultations)}
+    total = args.leads + args.consultations
+    db = mongomock_motor.AsyncMongoMockClient()["bench_sheets"]
+    for kind, items in docs.items():
+        await db[kind].insert_many([dict(d) for d in items])
+
+    elapsed, calls, landed = await per_row(docs, args.latency, args.throttle_rate, args.concurrency)
+    print(f"per-row  {total} rows: {calls:5} calls  {landed:5} rows landed  {elapsed:6.1f}s")
+    elapsed, calls, landed = await batched(db, args.latency, args.throttle_rate, args.batch_size, total)
+    print(f"batched  {total} rows: {calls:5} calls  {landed:5} rows landed  {elapsed:6.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+"""Cold-start report: `-X importtime` summary and time-to-first-response.
+
+    cd backend && python -m benchmarks.bench_startup --top 15 --runs 5
+    cd backend && python -m benchmarks.bench_startup --baseline d9dd8d7
+
+Import time is measured for `import server` in a fresh interpreter. Time to
+first response spawns `serve.py --workers 1` and polls `GET /api/` until it
+answers, so it covers interpreter start, imports and startup hooks.
+`--baseline REV` runs the same measurements on a git worktree of REV first
+(d9dd8d7 is the tree before integrations were deferred).
+
+What `import server` defers is Motor, the email transport (httpx, resend),
+the lead feed, Pillow and the Sheets sync. pymongo and bson still load with
+it: the deadline, read routing and profiling middleware are built on them,
+and the startup hook needs them for Motor before the first response anyway.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _env() -> dict:
+    return {
+        **os.environ,
+        "MONGO_URL": os.environ.get("MONGO_URL", "mongodb://localhost:27017"),
+        "DB_NAME": os.environ.get("DB_NAME", "bench"),
+    }
+
+
+def _importtime(backend_dir: Path) -> str:
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=backend_dir,
+        env=_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return res.stderr
+
+
+def importtime(backend_dir: Path, top: int, runs: int) -> None:
+    # The first run also writes bytecode caches (a fresh worktree has none).
+    _importtime(backend_dir)
+    totals = []
+    for _ in range(runs):
+        # Lines look like: "import time:   self [us] | cumulative | imported package"
+        cumulative = {}
+        by_package = defaultdict(int)
+        for line in _importtime(backend_dir).splitlines():
+            if not line.startswith("import time:") or "imported package" in line:
+                continue
+            self_us, cum_us, name = line[len("import time:"):].split("|")
+            name = name.strip()
+            cumulative[name] = int(cum_us)
+            by_package[name.split(".")[0]] += int(self_us)
+        totals.append(cumulative.get("server", 0))
+
+    print(f"import server: median {statistics.median(totals) / 1000:.1f} ms cumulative over {runs} runs")
+    print(f"\ntop {top} top-level packages by self time (last run):")
+    for pkg, us in sorted(by_package.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"  {us / 1000:8.1f} ms  {pkg}")
+
+
+def time_to_first_response(backend_dir: Path, port: int) -> float:
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", "1", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir,
+        env=_env(),
+    )
+    try:
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/api/", timeout=0.5).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.HTTPError:
+                pass
+            if proc.poll() is not None:
+                raise RuntimeError("server exited before responding")
+            time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--baseline", help="git revision to measure first, for comparison")
+    args = parser.parse_args()
+
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as tmp:
+            worktree = Path(tmp) / "baseline"
+            subprocess.run(["git", "worktree", "add", "--detach", str(worktree), args.baseline], cwd=BACKEND_DIR, check=True)
+            try:
+                print(f"== baseline {args.baseline}")
+                report(worktree / "backend", args)
+            finally:
+                subprocess.run(["git", "worktree", "remove", "--force", str(worktree)], cwd=BACKEND_DIR, check=True)
+        print("\n== working tree")
+    report(BACKEND_DIR, args)
+
+
+def report(backend_dir: Path, args) -> None:
+    importtime(backend_dir, args.top, args.runs)
+    try:
+        samples = [time_to_first_response(backend_dir, args.port) for _ in range(args.runs)]
+    except RuntimeError as e:
+        # Trees before the deferred startup need a reachable MONGO_URL.
+        print(f"\ntime to first response: {e}")
+        return
+    print(f"\ntime to first response: median {statistics.median(samples) * 1000:.0f} ms over {args.runs} runs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Image ingest MB/s on one worker: multipart chunks vs raw streamed PUT.
+
+Needs a reachable MongoDB (MONGO_URL/DB_NAME from backend/.env).
+
+    cd backend && python -m benchmarks.bench_upload --images 40 --size-kb 1900 --concurrency 8
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from benchmarks.bench_leads import serve_process
+
+
+CONSULTATION = {
+    "name": "Bench",
+    "email": "bench@example.com",
+    "company": "Bench Co",
+    "details": "Upload benchmark",
+    "mode": "single",
+    "sports": [{"sport": "padel", "courts": 2}],
+    "facility_name": "Bench Arena",
+    "google_maps_url": "https://maps.google.com/?q=bench",
+}
+
+
+async def init_image(c: httpx.AsyncClient, consultation_id: str, size: int) -> str:
+    r = await c.post(
+        f"/api/consultations/{consultation_id}/images/init",
+        json={"filename": "bench.jpg", "size": size, "content_type": "image/jpeg"},
+    )
+    r.raise_for_status()
+    return r.json()["image_id"]
+
+
+async def upload_multipart(c, consultation_id: str, image_id: str, data: bytes, chunk_size: int) -> None:
+    parts = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+    for i, part in enumerate(parts):
+        r = await c.post(
+            f"/api/consultations/{consultation_id}/images/{image_id}/chunk",
+            files={"chunk": ("blob", part, "application/octet-stream")},
+            data={"index": str(i), "total": str(len(parts))},
+        )
+        r.raise_for_status()
+
+
+async def upload_raw(c, consultation_id: str, image_id: str, data: bytes, chunk_size: int) -> None:
+    r = await c.put(
+        f"/api/consultations/{consultation_id}/images/{image_id}",
+        content=data,
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    r.raise_for_status()
+
+
+async def measure(base_url: str, upload, images: int, data: bytes, chunk_size: int, concurrency: int) -> float:
+    # One uploader per consultation, each sending its images one at a time,
+    # so the default per-consultation admission cap is never hit.
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as c:
+        work = []
+        for n in range(concurrency):
+            r = await c.post("/api/consultations", json=CONSULTATION)
+            r.raise_for_status()
+            consultation_id = r.json()["id"]
+            count = len(range(n, images, concurrency))
+            work.append((consultation_id, [await init_image(c, consultation_id, len(data)) for _ in range(count)]))
+
+        async def uploader(consultation_id, image_ids):
+            for image_id in image_ids:
+                await upload(c, consultation_id, image_id, data, chunk_size)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[uploader(*w) for w in work])
+        elapsed = time.perf_counter() - start
+    return images * len(data) / elapsed / (1024 * 1024)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=40)
+    parser.add_argument("--size-kb", type=int, default=1900)
+    parser.add_argument("--chunk-kb", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    data = os.urandom(args.size_kb * 1024)
+    chunk_size = args.chunk_kb * 1024
+    env = {"RAW_UPLOAD_CHUNK_BYTES": str(chunk_size)}
+    async with serve_process(1, args.port, env) as base_url:
+        for name, upload in (("multipart chunks", upload_multipart), ("raw PUT", upload_raw)):
+            mbps = await measure(base_url, upload, args.images, data, chunk_size, args.concurrency)
+            print(f"{name:17s} {mbps:7.1f} MB/s per worker")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
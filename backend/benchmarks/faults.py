@@ -0,0 +1,198 @@
+"""Latency and fault injection for Mongo and the Resend API.
+
+`FaultyDatabase` wraps a Motor-style database handle: every collection
+operation (and the first batch of every cursor) first waits for a delay
+drawn from the profile, then may fail with `AutoReconnect`, or with
+`NetworkTimeout` once the delay exceeds the client timeout; `wrap` applies
+the same faults to other handles on the database (the read router's).
+`resend_stand_in` returns a real `ResendTransport` (so its semaphore,
+timeouts and circuit breaker are exercised) talking to a local handler with
+the same kind of latency, 5xx responses and stalls.
+
+Delays are lognormal around `median` (`sigma` sets the tail) plus an
+occasional `stall`, which models a stepped-down primary or a provider that
+stops answering.
+"""
+import asyncio
+import math
+import random
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+import httpx
+from pymongo.errors import AutoReconnect, NetworkTimeout
+
+from email_transport import ResendTransport
+
+
+@dataclass
+class Fault:
+    median: float = 0.0
+    sigma: float = 0.0
+    error_rate: float = 0.0
+    stall_rate: float = 0.0
+    stall: float = 0.0
+    # Client-side timeout; a delay longer than this fails after `timeout`.
+    timeout: Optional[float] = None
+
+    def draw(self, rng: random.Random) -> Tuple[float, bool]:
+        """(seconds to wait, whether the call times out)."""
+        delay = self.median * math.exp(self.sigma * rng.gauss(0, 1)) if self.sigma else self.median
+        if self.stall_rate and rng.random() < self.stall_rate:
+            delay += self.stall
+        if self.timeout is not None and delay > self.timeout:
+            return self.timeout, True
+        return delay, False
+
+    def fails(self, rng: random.Random) -> bool:
+        return bool(self.error_rate) and rng.random() < self.error_rate
+
+
+@dataclass
+class FaultProfile:
+    name: str
+    mongo: Fault = field(default_factory=Fault)
+    email: Fault = field(default_factory=Fault)
+
+
+# Local stand-ins are near-instant, so the baseline adds typical network
+# round-trips: ~2 ms to Mongo and ~150 ms to Resend.
+_MONGO_OK = Fault(median=0.002, sigma=0.3)
+_RESEND_OK = Fault(median=0.15, sigma=0.3, timeout=10.0)
+
+PROFILES = [
+    FaultProfile("baseline", _MONGO_OK, _RESEND_OK),
+    # Primary under pressure: long-tailed latency and a few multi-second stalls.
+    FaultProfile("slow_mongo", Fault(median=0.02, sigma=1.0, stall_rate=0.01, stall=3.0), _RESEND_OK),
+    # Elections / dropped connections.
+    FaultProfile("flaky_mongo", Fault(median=0.002, sigma=0.3, error_rate=0.05), _RESEND_OK),
+    # Resend accepts connections but stops answering; requests run into the timeout.
+    FaultProfile("stalling_resend", _MONGO_OK, Fault(median=0.15, sigma=0.3, stall_rate=0.3, stall=30.0, timeout=10.0)),
+    # Resend answering 5xx.
+    FaultProfile("failing_resend", _MONGO_OK, Fault(median=0.15, sigma=0.3, error_rate=0.5, timeout=10.0)),
+]
+
+
+# Collection methods that are one round-trip each.
+_COLLECTION_OPS = {
+    "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "find_one", "find_one_and_update",
+    "find_one_and_delete", "count_documents", "distinct", "bulk_write",
+}
+_CURSOR_OPS = {"find", "aggregate"}
+
+
+class FaultyDatabase:
+    def __init__(self, db, fault: Fault, rng: Optional[random.Random] = None):
+        self._db = db
+        self.fault = fault
+        self.rng = rng or random.Random()
+        self.calls = 0
+        self.injected_errors = 0
+        self.injected_timeouts = 0
+
+    def __getitem__(self, name: str) -> "FaultyCollection":
+        return FaultyCollection(self._db[name], self)
+
+    def __getattr__(self, name: str) -> "FaultyCollection":
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def wrap(self, db) -> "FaultyHandle":
+        """`db`, another handle on the same database (e.g. one with a different
+        read preference), drawing its faults from and counted by this one."""
+        return FaultyHandle(db, self)
+
+    async def inject(self) -> None:
+        self.calls += 1
+        delay, timed_out = self.fault.draw(self.rng)
+        if delay:
+            await asyncio.sleep(delay)
+        if timed_out:
+            self.injected_timeouts += 1
+            raise NetworkTimeout("injected: operation exceeded client timeout")
+        if self.fault.fails(self.rng):
+            self.injected_errors += 1
+            raise AutoReconnect("injected: connection to primary lost")
+
+
+class FaultyHandle:
+    def __init__(self, db, faults: FaultyDatabase):
+        self._db = db
+        self._faults = faults
+
+    def __getitem__(self, name: str) -> "FaultyCollection":
+        return FaultyCollection(self._db[name], self._faults)
+
+    def __getattr__(self, name: str) -> "FaultyCollection":
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+class FaultyCollection:
+    def __init__(self, collection, db: FaultyDatabase):
+        self._collection = collection
+        self._db = db
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._collection, name)
+        if name in _COLLECTION_OPS:
+            async def op(*args, **kwargs):
+                await self._db.inject()
+                return await attr(*args, **kwargs)
+            return op
+        if name in _CURSOR_OPS:
+            return lambda *args, **kwargs: FaultyCursor(attr(*args, **kwargs), self._db)
+        return attr
+
+
+class FaultyCursor:
+    def __init__(self, cursor, db: FaultyDatabase):
+        self._cursor = cursor
+        self._db = db
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._cursor, name)
+        if name in ("sort", "limit", "skip", "batch_size", "max_time_ms"):
+            def chain(*args, **kwargs):
+                self._cursor = attr(*args, **kwargs)
+                return self
+            return chain
+        return attr
+
+    async def to_list(self, length=None):
+        await self._db.inject()
+        return await self._cursor.to_list(length)
+
+    async def __aiter__(self):
+        await self._db.inject()
+        async for doc in self._cursor:
+            yield doc
+
+
+def resend_stand_in(fault: Fault, rng: Optional[random.Random] = None, **kwargs) -> ResendTransport:
+    rng = rng or random.Random()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        delay, timed_out = fault.draw(rng)
+        # MockTransport doesn't enforce the client's timeout; do it here so
+        # per-request timeouts (e.g. capped by a deadline) behave as over a socket.
+        read_timeout = request.extensions.get("timeout", {}).get("read")
+        if read_timeout is not None and delay > read_timeout:
+            delay, timed_out = read_timeout, True
+        await asyncio.sleep(delay)
+        if timed_out:
+            raise httpx.ReadTimeout("injected: provider did not answer", request=request)
+        if fault.fails(rng):
+            return httpx.Response(503, json={"message": "injected: service unavailable"})
+        return httpx.Response(200, json={"id": "stand-in"})
+
+    return ResendTransport(
+        "re_stand_in",
+        timeout=fault.timeout or 10.0,
+        http2=False,
+        transport=httpx.MockTransport(handler),
+        **kwargs,
+    )
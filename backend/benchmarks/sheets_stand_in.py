@@ -0,0 +1,67 @@
+"""Local stand-in for the Google Apps Script web app.
+
+Accepts both the per-row payload the frontend sends and the batched
+`{"sheet", "batch_id", "rows"}` payload from sheets_sync.py, with the same
+JSON answers as the script in GOOGLE_SHEETS_SETUP.md. Each call takes
+`latency` seconds, and a fraction `throttle_rate` of calls is refused the
+way Apps Script refuses over-quota calls.
+
+    cd backend && python -m benchmarks.sheets_stand_in --port 8790 --throttle-rate 0.1
+    SHEETS_SYNC_URL=http://127.0.0.1:8790/exec python -m sheets_sync --once
+"""
+import argparse
+import asyncio
+import random
+from typing import Dict, List
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+def create_app(latency: float = 0.0, throttle_rate: float = 0.0, seed: int = 1) -> Starlette:
+    rng = random.Random(seed)
+    sheets: Dict[str, List[list]] = {"leads": [], "consultations": []}
+    last_batch: Dict[str, str] = {}
+    stats = {"calls": 0, "throttled": 0, "duplicates": 0}
+
+    async def exec_(request: Request):
+        stats["calls"] += 1
+        if latency:
+            await asyncio.sleep(latency)
+        if throttle_rate and rng.random() < throttle_rate:
+            stats["throttled"] += 1
+            return JSONResponse({"success": False, "error": "Service invoked too many times in a short time"})
+        data = await request.json()
+        sheet = sheets.get(data.get("sheet") or "leads")
+        if sheet is None:
+            return JSONResponse({"success": False, "error": "Sheet not found: " + str(data.get("sheet"))})
+        if isinstance(data.get("rows"), list):
+            if data.get("batch_id") and last_batch.get(data["sheet"]) == data["batch_id"]:
+                stats["duplicates"] += 1
+                return JSONResponse({"success": True, "duplicate": True})
+            sheet.extend(data["rows"])
+            last_batch[data["sheet"]] = data.get("batch_id")
+            return JSONResponse({"success": True, "appended": len(data["rows"])})
+        sheet.append([data.get("timestamp"), data.get("name"), data.get("email")])
+        return JSONResponse({"success": True})
+
+    async def rows(request: Request):
+        return JSONResponse({"sheets": {k: len(v) for k, v in sheets.items()}, **stats})
+
+    app = Starlette(routes=[Route("/exec", exec_, methods=["POST"]), Route("/rows", rows)])
+    app.state.sheets = sheets
+    app.state.stats = stats
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--latency", type=float, default=0.8)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.throttle_rate), host="127.0.0.1", port=args.port)
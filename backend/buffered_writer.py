@@ -0,0 +1,129 @@
+"""Group-commit writer for high-volume inserts (status check heartbeats).
+
+Documents are queued and a single background task flushes them with
+`insert_many(ordered=False)` every `flush_interval` seconds or as soon as
+`max_batch` documents are waiting. Callers either return once their
+document is queued (`wait_for_commit=False`) or once the batch holding it
+has been written (`wait_for_commit=True`).
+
+The queue is bounded: when it is full `submit` waits up to
+`enqueue_timeout` for room and then raises `WriterOverloaded`, so the API
+can shed load instead of buffering without limit.
+"""
+import asyncio
+import logging
+import time
+from typing import List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+
+logger = logging.getLogger(__name__)
+
+
+class WriterOverloaded(Exception):
+    """The write queue stayed full for longer than `enqueue_timeout`."""
+
+
+class BufferedWriter:
+    def __init__(
+        self,
+        collection,
+        *,
+        max_batch: int = 500,
+        flush_interval: float = 0.05,
+        max_queue: int = 10000,
+        enqueue_timeout: float = 0.5,
+        wait_for_commit: bool = False,
+    ):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.wait_for_commit = wait_for_commit
+        self._queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self._task: Optional[asyncio.Task] = None
+        # Dequeued but not yet written, and the write in progress; both are
+        # finished by `stop` so shutdown never drops acknowledged documents.
+        self._collecting: List[Tuple[dict, Optional[asyncio.Future]]] = []
+        self._inflight: Optional[asyncio.Future] = None
+        self.batches = 0
+        self.written = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, doc: dict) -> None:
+        fut = asyncio.get_running_loop().create_future() if self.wait_for_commit else None
+        try:
+            await asyncio.wait_for(self._queue.put((doc, fut)), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            raise WriterOverloaded("write queue is full")
+        if fut is not None:
+            await fut
+
+    async def _next_batch(self) -> List[Tuple[dict, Optional[asyncio.Future]]]:
+        batch = self._collecting
+        batch.append(await self._queue.get())
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        self._collecting = []
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            self._inflight = asyncio.ensure_future(self._write(batch))
+            # Shielded so cancelling the flusher never aborts a write midway.
+            await asyncio.shield(self._inflight)
+
+    async def _write(self, batch: List[Tuple[dict, Optional[asyncio.Future]]]) -> None:
+        failed = {}
+        try:
+            await self.collection.insert_many([doc for doc, _ in batch], ordered=False)
+        except BulkWriteError as e:
+            # Unordered: everything except the reported indexes was written.
+            for err in e.details.get("writeErrors", []):
+                failed[err["index"]] = e
+            logger.error("Buffered insert_many had %d write errors", len(failed))
+        except Exception as e:
+            failed = {i: e for i in range(len(batch))}
+            logger.exception("Buffered insert_many failed: %s", str(e))
+
+        self.batches += 1
+        self.written += len(batch) - len(failed)
+        for i, (_, fut) in enumerate(batch):
+            if fut is None or fut.done():
+                continue
+            if i in failed:
+                fut.set_exception(failed[i])
+            else:
+                fut.set_result(None)
+
+    async def stop(self) -> None:
+        """Stop the flusher and write whatever is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inflight is not None and not self._inflight.done():
+            await self._inflight
+        batch, self._collecting = self._collecting, []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+            if len(batch) >= self.max_batch:
+                await self._write(batch)
+                batch = []
+        if batch:
+            await self._write(batch)
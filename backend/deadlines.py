@@ -0,0 +1,98 @@
+"""Per-request deadlines.
+
+`DeadlineMiddleware` gives every request a time budget (per route, see
+`routes`) and propagates it:
+
+* to Mongo through pymongo's client-side operation timeout
+  (`pymongo.timeout`): every Motor call made while handling the request
+  gets `maxTimeMS` and socket timeouts from the time left, so the server
+  stops working on it too;
+* to anything else through `remaining()`; the email transport caps its
+  HTTP timeout with it.
+
+If the handler is still running `grace` seconds after the deadline it is
+cancelled. Either way the client gets a fast 504 instead of a hung
+connection, unless the response had already started.
+"""
+import asyncio
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import Iterable, List, Optional, Pattern, Tuple
+
+import pymongo
+from pymongo.errors import PyMongoError
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+logger = logging.getLogger(__name__)
+
+_deadline_var: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request, or None when it has no deadline."""
+    deadline = _deadline_var.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class DeadlineMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        default: Optional[float] = 10.0,
+        routes: Iterable[Tuple[str, str, Optional[float]]] = (),
+        grace: float = 0.25,
+    ):
+        self.app = app
+        self.default = default
+        # (method or "*", path regex, timeout or None for no deadline); first match wins.
+        self.routes: List[Tuple[str, Pattern, Optional[float]]] = [
+            (method, re.compile(pattern), timeout) for method, pattern, timeout in routes
+        ]
+        self.grace = grace
+
+    def timeout_for(self, method: str, path: str) -> Optional[float]:
+        for route_method, pattern, timeout in self.routes:
+            if route_method in ("*", method) and pattern.match(path):
+                return timeout
+        return self.default
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timeout = self.timeout_for(scope["method"], scope["path"])
+        if not timeout:
+            await self.app(scope, receive, send)
+            return
+
+        started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        token = _deadline_var.set(time.monotonic() + timeout)
+        try:
+            with pymongo.timeout(timeout):
+                await asyncio.wait_for(self.app(scope, receive, send_wrapper), timeout + self.grace)
+        except asyncio.TimeoutError:
+            logger.warning("Request cancelled after %.1fs deadline: %s %s", timeout, scope["method"], scope["path"])
+            if not started:
+                await self._deadline_response(scope, receive, send)
+        except PyMongoError as e:
+            if not e.timeout or started:
+                raise
+            logger.warning("Mongo operation hit the %.1fs request deadline: %s %s", timeout, scope["method"], scope["path"])
+            await self._deadline_response(scope, receive, send)
+        finally:
+            _deadline_var.reset(token)
+
+    async def _deadline_response(self, scope: Scope, receive: Receive, send: Send) -> None:
+        response = JSONResponse({"detail": "Request deadline exceeded"}, status_code=504)
+        await response(scope, receive, send)
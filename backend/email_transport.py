@@ -0,0 +1,207 @@
+"""Async email transports used by `send_notification_email`.
+
+`ResendTransport` talks to the Resend REST API over a single shared
+`httpx.AsyncClient` (keep-alive, HTTP/2 when `h2` is installed) instead of
+running the blocking `resend` SDK in the default thread pool.
+`FakeEmailTransport` keeps messages in memory for tests and local runs.
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional
+
+import httpx
+
+import deadlines
+
+
+logger = logging.getLogger(__name__)
+
+RESEND_API_URL = "https://api.resend.com"
+
+
+class EmailTransportError(Exception):
+    """Raised when a transport fails to hand a message to the provider."""
+
+
+class CircuitOpenError(EmailTransportError):
+    """Raised without touching the network while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open -> closed.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    rejects calls for `reset_timeout` seconds, then lets a single trial call
+    through. A successful trial closes it again; a failed one re-opens it.
+    A trial that ends without a verdict is handed back with `release`.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._trial_in_flight or self._failures >= self.failure_threshold:
+            self._opened_at = self._clock()
+        self._trial_in_flight = False
+
+    def release(self) -> None:
+        """End a trial call without recording success or failure."""
+        self._trial_in_flight = False
+
+
+class EmailTransport:
+    """Interface: `send` takes Resend-style params and returns the provider response."""
+
+    async def send(self, params: dict) -> dict:
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        return None
+
+
+class ResendTransport(EmailTransport):
+    def __init__(
+        self,
+        api_key: str,
+        *,
+        base_url: str = RESEND_API_URL,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        max_concurrency: int = 10,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        http2: bool = True,
+        breaker: Optional[CircuitBreaker] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self._api_key = api_key
+        self._base_url = base_url
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._http2 = http2 and _h2_available()
+        self._transport = transport
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.breaker = breaker or CircuitBreaker()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created on first use so the client binds to the running event loop.
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self._base_url,
+                headers={"Authorization": f"Bearer {self._api_key}"},
+                limits=self._limits,
+                timeout=self._timeout,
+                http2=self._http2,
+                transport=self._transport,
+            )
+        return self._client
+
+    async def send(self, params: dict) -> dict:
+        # Never wait past the current request's deadline (see deadlines.py).
+        timeout = self._timeout
+        remaining = deadlines.remaining()
+        if remaining is not None:
+            if remaining <= 0:
+                raise EmailTransportError("Request deadline exceeded before sending email")
+            if remaining < self._timeout.read:
+                timeout = httpx.Timeout(remaining, connect=min(self._timeout.connect, remaining))
+
+        trial = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            raise CircuitOpenError("Resend circuit breaker is open")
+        try:
+            return await self._post(params, timeout)
+        finally:
+            # A no-op after a verdict; after a deadline timeout or cancellation
+            # it lets the next call make the trial instead of leaving the
+            # breaker stuck half-open.
+            if trial:
+                self.breaker.release()
+
+    async def _post(self, params: dict, timeout: httpx.Timeout) -> dict:
+        async with self._semaphore:
+            try:
+                res = await self._get_client().post("/emails", json=params, timeout=timeout)
+            except httpx.TimeoutException as e:
+                # Cut short by our own deadline: says nothing about Resend's health.
+                if timeout is self._timeout:
+                    self.breaker.record_failure()
+                raise EmailTransportError(f"Resend request timed out: {e!r}") from e
+            except httpx.HTTPError as e:
+                self.breaker.record_failure()
+                raise EmailTransportError(f"Resend request failed: {e!r}") from e
+
+        if res.status_code == 429 or res.status_code >= 500:
+            self.breaker.record_failure()
+            raise EmailTransportError(f"Resend returned {res.status_code}: {res.text}")
+
+        # 4xx means the message itself is bad, not that Resend is unhealthy.
+        self.breaker.record_success()
+        if res.status_code >= 400:
+            raise EmailTransportError(f"Resend rejected email ({res.status_code}): {res.text}")
+        return res.json()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class FakeEmailTransport(EmailTransport):
+    """In-memory transport: records every message, optionally after a delay."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.sent: List[dict] = []
+
+    async def send(self, params: dict) -> dict:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(params)
+        return {"id": f"fake-{len(self.sent)}"}
+
+
+def _h2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
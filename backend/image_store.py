@@ -0,0 +1,165 @@
+"""Reading consultation images back out of `consultation_image_chunks`.
+
+Images are stored as ordered chunks. Downloads stream them with a single
+cursor sorted by `index`, so at most one cursor batch is in memory at a
+time. Byte ranges are served by first reading the (small) per-chunk sizes
+and then fetching only the chunks that overlap the range.
+"""
+import io
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+
+CHUNKS = "consultation_image_chunks"
+THUMBNAILS = "consultation_image_thumbnails"
+
+# Chunks are up to a few hundred KB; a small batch keeps memory flat.
+STREAM_BATCH_SIZE = 4
+
+
+def _chunk_doc(consultation_id: str, image_id: str, index: int, total: int, data: bytes) -> dict:
+    return {
+        "image_id": image_id,
+        "consultation_id": consultation_id,
+        "index": index,
+        "total": total,
+        "data": data,
+        "size": len(data),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+async def put_chunk(db, consultation_id: str, image_id: str, index: int, total: int, data: bytes) -> bool:
+    """Store one chunk; returns False when that index was already stored.
+
+    Upserting on (image_id, index) makes retried chunks idempotent.
+    """
+    chunk_doc = _chunk_doc(consultation_id, image_id, index, total, data)
+    res = await db[CHUNKS].update_one(
+        {"image_id": image_id, "index": index}, {"$setOnInsert": chunk_doc}, upsert=True
+    )
+    return res.upserted_id is not None
+
+
+async def replace_chunk(db, consultation_id: str, image_id: str, index: int, total: int, data: bytes) -> int:
+    """Store one chunk, overwriting that index; returns the change in stored bytes.
+
+    Used by re-sendable byte ranges, where the last write of an index wins,
+    so the caller can keep the image's `received_bytes` equal to its chunks.
+    """
+    chunk_doc = _chunk_doc(consultation_id, image_id, index, total, data)
+    previous = await db[CHUNKS].find_one_and_update(
+        {"image_id": image_id, "index": index},
+        {"$set": chunk_doc},
+        projection={"_id": 0, "size": 1},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE,
+    )
+    return len(data) - (int(previous.get("size", 0)) if previous else 0)
+
+
+def split_chunks(consultation_id: str, image_id: str, data: bytes, chunk_bytes: int) -> List[dict]:
+    """Chunk documents for a whole image held in memory, ready for insert_many."""
+    pieces = [data[i:i + chunk_bytes] for i in range(0, len(data), chunk_bytes)]
+    return [_chunk_doc(consultation_id, image_id, i, len(pieces), p) for i, p in enumerate(pieces)]
+
+
+async def chunk_sizes(db, image_id: str) -> List[Tuple[int, int]]:
+    """(index, size) for each chunk, ignoring duplicate uploads of an index."""
+    seen = set()
+    sizes = []
+    async for c in db[CHUNKS].find({"image_id": image_id}, {"_id": 0, "index": 1, "size": 1}).sort("index", 1):
+        if c["index"] in seen:
+            continue
+        seen.add(c["index"])
+        sizes.append((c["index"], c.get("size", 0)))
+    return sizes
+
+
+async def image_size(db, meta: dict) -> int:
+    if meta.get("received_bytes") is not None:
+        return int(meta["received_bytes"])
+    return sum(size for _, size in await chunk_sizes(db, meta["id"]))
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range into inclusive (start, end).
+
+    Returns None when the header is absent or not a single byte range (the
+    caller then serves the full body) and raises ValueError when the range
+    cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_s, _, end_s = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_s == "":
+            # Suffix range: the last N bytes.
+            length = int(end_s)
+            if length <= 0:
+                raise ValueError("empty suffix range")
+            return max(size - length, 0), size - 1
+        start = int(start_s)
+        end = int(end_s) if end_s else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise ValueError("unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+async def iter_image_bytes(
+    db, image_id: str, start: int = 0, end: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """Yield the bytes of an image, optionally limited to [start, end]."""
+    query: dict = {"image_id": image_id}
+    offset = 0
+    if start > 0 or end is not None:
+        # Map the byte range onto chunk indexes so only those chunks are read.
+        first = last = None
+        pos = 0
+        for index, size in await chunk_sizes(db, image_id):
+            if first is None and pos + size > start:
+                first, offset = index, pos
+            if end is not None and pos <= end:
+                last = index
+            pos += size
+        if first is None:
+            return
+        query["index"] = {"$gte": first} if last is None else {"$gte": first, "$lte": last}
+
+    pos = offset
+    last_index = None
+    cursor = db[CHUNKS].find(query, {"_id": 0, "index": 1, "data": 1}).sort("index", 1).batch_size(STREAM_BATCH_SIZE)
+    async for c in cursor:
+        if c["index"] == last_index:
+            continue
+        last_index = c["index"]
+        data = bytes(c.get("data", b""))
+        lo = max(start - pos, 0)
+        hi = len(data) if end is None else min(end - pos + 1, len(data))
+        pos += len(data)
+        if hi > lo:
+            yield data[lo:hi]
+        if end is not None and pos > end:
+            break
+
+
+async def read_image(db, image_id: str) -> bytes:
+    return b"".join([part async for part in iter_image_bytes(db, image_id)])
+
+
+def make_thumbnail(data: bytes, max_px: int) -> Tuple[bytes, str]:
+    # Pillow is only needed here; import it on first use.
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as im:
+        im = ImageOps.exif_transpose(im)
+        im.thumbnail((max_px, max_px))
+        if im.mode not in ("RGB", "L"):
+            im = im.convert("RGB")
+        out = io.BytesIO()
+        im.save(out, format="JPEG", quality=80, optimize=True)
+    return out.getvalue(), "image/jpeg"
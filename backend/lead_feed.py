@@ -0,0 +1,261 @@
+"""Fan-out of lead changes to Server-Sent Events clients.
+
+One `LeadFeed` per process watches `leads` and pushes every insert, update
+and delete to all subscribers, so N open admin tabs cost one watcher rather
+than N pollers of `GET /api/leads`.
+
+The watcher uses a Mongo change stream and resumes from its last token
+after transient errors. Delete events only carry the document's `_id`, so
+leads are stored with `_id` equal to their `id`; for older leads the feed
+learns the mapping from a one-off scan and from the events it sees.
+
+A standalone mongod has no change streams; the feed then falls back to
+polling `created_at`/`updated_at`, and picks up deletes from the
+`lead_tombstones` collection that the delete endpoint writes to
+(`record_delete`), so every worker's feed sees them. Each poll re-reads an
+`overlap` window behind the newest change it has seen, since timestamps are
+set before the write commits, and skips events it already published.
+
+Every event carries an id. Recent events are kept in a replay buffer so a
+client reconnecting with `Last-Event-ID` gets what it missed; if its id has
+already left the buffer it receives a `reset` event and should refetch.
+Polling event ids are built from the change itself (op, timestamp and lead
+id), so they mean the same thing in every worker.
+"""
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from datetime import timedelta
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+
+logger = logging.getLogger(__name__)
+
+# Server error codes meaning "change streams are not available here".
+_NO_CHANGE_STREAMS = {40573, 40324}
+
+TOMBSTONES = "lead_tombstones"
+# Tombstones only need to outlive the polling interval; a TTL index on
+# `expire_at` removes them.
+TOMBSTONE_TTL = timedelta(days=1)
+
+CHANGE_PIPELINE = [{"$match": {
+    "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+    # Marking a lead as copied to Google Sheets (sheets_sync.py) is not a change.
+    "updateDescription.updatedFields.sheets_synced": {"$exists": False},
+}}]
+
+
+# Internal fields that are not part of a lead as the API returns it.
+HIDDEN_FIELDS = ("_id", "search_prefixes", "sheets_synced")
+PROJECTION = {field: 0 for field in HIDDEN_FIELDS}
+
+
+async def record_delete(tombstones, lead_id: str) -> None:
+    """Leave a tombstone for polling feeds in every worker."""
+    now = datetime.now(timezone.utc)
+    await tombstones.insert_one({"id": lead_id, "deleted_at": now.isoformat(), "expire_at": now + TOMBSTONE_TTL})
+
+
+class _Subscriber:
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.lagged = False
+
+
+class LeadFeed:
+    def __init__(
+        self,
+        collection,
+        tombstones=None,
+        *,
+        poll_interval: float = 2.0,
+        replay_size: int = 500,
+        queue_size: int = 100,
+        heartbeat: float = 15.0,
+        overlap: float = 60.0,
+        batch_size: int = 500,
+    ):
+        self.collection = collection
+        self.tombstones = tombstones
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.overlap = overlap
+        self.batch_size = batch_size
+        self.mode: Optional[str] = None  # "change_stream" | "polling"
+        self._replay: Deque[Tuple[str, str]] = deque(maxlen=replay_size)
+        self._subscribers: Set[_Subscriber] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._resume_token: Optional[dict] = None
+        # `_id` -> lead id for leads whose `_id` is not their id.
+        self._legacy_ids: Optional[Dict[Any, str]] = None
+
+    # -- publishing -----------------------------------------------------
+
+    def _publish(self, event_id: str, payload: dict) -> None:
+        data = json.dumps(payload, default=str)
+        self._replay.append((event_id, data))
+        for sub in list(self._subscribers):
+            try:
+                sub.queue.put_nowait((event_id, data))
+            except asyncio.QueueFull:
+                # Slow consumer: cut it loose rather than buffer without bound.
+                sub.lagged = True
+                self._subscribers.discard(sub)
+
+    # -- watching -------------------------------------------------------
+
+    def ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._watch_change_stream()
+            except OperationFailure as e:
+                if e.code in _NO_CHANGE_STREAMS:
+                    logger.info("Change streams unavailable; lead feed falling back to polling")
+                    await self._poll()
+                    return
+                logger.exception("Lead change stream failed; resuming: %s", str(e))
+            except PyMongoError as e:
+                logger.exception("Lead change stream failed; resuming: %s", str(e))
+            await asyncio.sleep(1.0)
+
+    async def _load_legacy_ids(self) -> None:
+        # Leads created before `_id` == `id`; new ones are learned from events.
+        self._legacy_ids = {}
+        async for doc in self.collection.find({"_id": {"$type": "objectId"}}, {"_id": 1, "id": 1}):
+            self._legacy_ids[doc["_id"]] = doc.get("id")
+
+    def _lead_id(self, key, doc: dict) -> Optional[str]:
+        if doc.get("id") is not None:
+            if key is not None and key != doc["id"]:
+                self._legacy_ids[key] = doc["id"]
+            return doc["id"]
+        if isinstance(key, str):
+            return key
+        return self._legacy_ids.get(key)
+
+    async def _watch_change_stream(self) -> None:
+        async with self.collection.watch(
+            CHANGE_PIPELINE,
+            full_document="updateLookup",
+            resume_after=self._resume_token,
+        ) as stream:
+            if self._legacy_ids is None:
+                await self._load_legacy_ids()
+            self.mode = "change_stream"
+            async for change in stream:
+                self._resume_token = change["_id"]
+                op = change["operationType"]
+                if op == "replace":
+                    op = "update"
+                key = (change.get("documentKey") or {}).get("_id")
+                doc = change.get("fullDocument") or {}
+                for field in HIDDEN_FIELDS:
+                    doc.pop(field, None)
+                lead_id = self._lead_id(key, doc)
+                if op == "delete":
+                    self._legacy_ids.pop(key, None)
+                self._publish(
+                    change["_id"]["_data"],
+                    {"op": op, "id": lead_id, "lead": None if op == "delete" else doc},
+                )
+
+    async def _changed(self, collection, field: str, since: str) -> List[dict]:
+        """Documents whose `field` is at or after `since`, oldest first.
+
+        Read in pages of `batch_size` so a burst larger than one page is
+        not cut off.
+        """
+        docs: List[dict] = []
+        query: dict = {field: {"$gte": since}}
+        while True:
+            page = await collection.find(query, PROJECTION).sort([(field, 1), ("id", 1)]).to_list(self.batch_size)
+            docs += page
+            if len(page) < self.batch_size:
+                return docs
+            last = page[-1]
+            query = {"$or": [{field: {"$gt": last[field]}}, {field: last[field], "id": {"$gt": last["id"]}}]}
+
+    async def _poll(self) -> None:
+        self.mode = "polling"
+        start = datetime.now(timezone.utc).isoformat()
+        polled = [(self.collection, "created_at", "insert"), (self.collection, "updated_at", "update")]
+        if self.tombstones is not None:
+            polled.append((self.tombstones, "deleted_at", "delete"))
+        newest = {field: start for _, field, _ in polled}
+        # Published event id -> timestamp, per field, within the overlap window.
+        seen: Dict[str, Dict[str, str]] = {field: {} for _, field, _ in polled}
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            for collection, field, op in polled:
+                floor = (datetime.fromisoformat(newest[field]) - timedelta(seconds=self.overlap)).isoformat()
+                for doc in await self._changed(collection, field, floor):
+                    changed_at = doc[field]
+                    event_id = f"{op}-{changed_at}-{doc['id']}"
+                    if event_id in seen[field]:
+                        continue
+                    seen[field][event_id] = changed_at
+                    newest[field] = max(newest[field], changed_at)
+                    lead = None if op == "delete" else doc
+                    self._publish(event_id, {"op": op, "id": doc["id"], "lead": lead})
+                seen[field] = {event_id: ts for event_id, ts in seen[field].items() if ts >= floor}
+
+    # -- consuming ------------------------------------------------------
+
+    async def events(self, last_event_id: Optional[str], is_disconnected) -> AsyncIterator[str]:
+        """Yield SSE-formatted frames until the client goes away."""
+        self.ensure_started()
+        sub = _Subscriber(self.queue_size)
+        # Subscribe and snapshot the replay buffer together so nothing is
+        # delivered twice or skipped between the two.
+        self._subscribers.add(sub)
+        replay = list(self._replay)
+        try:
+            yield "retry: 3000\n\n"
+            if last_event_id:
+                ids = [event_id for event_id, _ in replay]
+                if last_event_id in ids:
+                    for event_id, data in replay[ids.index(last_event_id) + 1:]:
+                        yield _frame(event_id, data)
+                else:
+                    yield _frame(None, json.dumps({"op": "reset"}), event="reset")
+
+            while not await is_disconnected():
+                if sub.lagged:
+                    yield _frame(None, json.dumps({"op": "reset"}), event="reset")
+                    return
+                try:
+                    event_id, data = await asyncio.wait_for(sub.queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _frame(event_id, data)
+        finally:
+            self._subscribers.discard(sub)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+def _frame(event_id: Optional[str], data: Any, event: str = "lead") -> str:
+    head = f"id: {event_id}\n" if event_id else ""
+    return f"{head}event: {event}\ndata: {data}\n\n"
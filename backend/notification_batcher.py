@@ -0,0 +1,111 @@
+"""Adaptive batching of internal notification emails.
+
+Below `rate_threshold` notifications per `rate_window` seconds every
+notification is sent immediately. Above it, notifications are queued and
+sent as a single digest after `window` seconds, or as soon as `max_batch`
+items are pending, so a burst costs a handful of provider calls instead of
+one per submission.
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, Set
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Notification:
+    subject: str
+    heading: str
+    rows: List[tuple]
+    reply_to: Optional[str] = None
+    footer: Optional[str] = None
+
+
+class DigestBatcher:
+    def __init__(
+        self,
+        send_one: Callable[[Notification], Awaitable],
+        send_digest: Callable[[List[Notification]], Awaitable],
+        *,
+        rate_threshold: int = 20,
+        rate_window: float = 60.0,
+        window: float = 60.0,
+        max_batch: int = 50,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._send_one = send_one
+        self._send_digest = send_digest
+        self.rate_threshold = rate_threshold
+        self.rate_window = rate_window
+        self.window = window
+        self.max_batch = max_batch
+        self._clock = clock
+        self._arrivals: deque = deque()
+        self._pending: List[Notification] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _arrival_rate(self) -> int:
+        now = self._clock()
+        self._arrivals.append(now)
+        while self._arrivals and now - self._arrivals[0] > self.rate_window:
+            self._arrivals.popleft()
+        return len(self._arrivals)
+
+    async def submit(self, notification: Notification):
+        rate = self._arrival_rate()
+        if not self._pending and rate <= self.rate_threshold:
+            return await self._send_one(notification)
+
+        self._pending.append(notification)
+        pending = len(self._pending)
+        if pending >= self.max_batch:
+            self._spawn_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._spawn_flush)
+        return {"queued": True, "pending": pending}
+
+    def _take_pending(self) -> List[Notification]:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, self._pending = self._pending, []
+        return items
+
+    def _spawn_flush(self) -> None:
+        # Detach the batch synchronously so later arrivals start a new one.
+        items = self._take_pending()
+        # The flush outlives the request that triggered it; start it in a
+        # fresh context so that request's deadline doesn't apply to it.
+        loop = asyncio.get_running_loop()
+        task = contextvars.Context().run(loop.create_task, self._send_logged(items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send_logged(self, items: List[Notification]) -> None:
+        try:
+            await self._send(items)
+        except Exception as e:
+            logger.exception("Failed sending notification digest: %s", str(e))
+
+    async def _send(self, items: List[Notification]) -> None:
+        if not items:
+            return
+        if len(items) == 1:
+            await self._send_one(items[0])
+        else:
+            await self._send_digest(items)
+
+    async def flush(self) -> None:
+        await self._send(self._take_pending())
+
+    async def aclose(self) -> None:
+        await self._send_logged(self._take_pending())
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,246 @@
+"""Opt-in per-request profiling and slow-request capture.
+
+A request is traced when it carries `X-Profile-Token` matching the
+configured token, when it is picked by `sample_rate`, or (spans only) when
+`slow_ms` is set and it turns out slower than that. A trace holds:
+
+* spans: Mongo commands (via a pymongo CommandListener, so every query,
+  cursor batch and write is covered without touching call sites) plus the
+  blocks wrapped in `span(...)` (email sends, attachment building,
+  thumbnail rendering);
+* for token/sampled requests, a cProfile of the request. cProfile sees the
+  whole thread, so work from other requests interleaved at awaits shows up
+  too; only one request is profiled at a time.
+
+Finished traces go into a bounded ring buffer (`ProfileStore`) exposed by
+the admin endpoints. When profiling is off the middleware and listener are
+not installed, and `span` costs one context variable lookup.
+"""
+import cProfile
+import io
+import pstats
+import random
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+
+from pymongo import monitoring
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from structured_logging import request_id_var
+
+
+MAX_SPANS = 500
+
+_trace_var: ContextVar[Optional["Trace"]] = ContextVar("profiling_trace", default=None)
+
+
+class Trace:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: List[tuple] = []
+        self.dropped = 0
+        self._pending: Dict[int, tuple] = {}
+
+    def add(self, name: str, start: float, duration: float, detail: Optional[str] = None) -> None:
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return
+        self.spans.append((name, (start - self.start) * 1000, duration * 1000, detail))
+
+    def summary(self) -> List[dict]:
+        totals: Dict[str, List[float]] = {}
+        for name, _, ms, _ in self.spans:
+            t = totals.setdefault(name, [0, 0.0])
+            t[0] += 1
+            t[1] += ms
+        return [
+            {"name": name, "count": count, "total_ms": round(ms, 3)}
+            for name, (count, ms) in sorted(totals.items(), key=lambda kv: -kv[1][1])
+        ]
+
+
+class _Span:
+    __slots__ = ("trace", "name", "detail", "t0")
+
+    def __init__(self, trace: Trace, name: str, detail: Optional[str]):
+        self.trace = trace
+        self.name = name
+        self.detail = detail
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, self.t0, time.perf_counter() - self.t0, self.detail)
+        return False
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, detail: Optional[str] = None):
+    """Time a block into the current trace; a no-op outside traced requests."""
+    trace = _trace_var.get()
+    if trace is None:
+        return _NOOP
+    return _Span(trace, name, detail)
+
+
+class MongoSpanListener(monitoring.CommandListener):
+    """Records Mongo commands issued while a traced request is running.
+
+    Motor runs pymongo on executor threads with the caller's context
+    copied, so the trace context variable is visible here.
+    """
+
+    def started(self, event):
+        trace = _trace_var.get()
+        if trace is not None:
+            collection = event.command.get(event.command_name)
+            trace._pending[event.request_id] = (
+                f"mongo.{event.command_name}",
+                time.perf_counter(),
+                collection if isinstance(collection, str) else None,
+            )
+
+    def _finish(self, event):
+        trace = _trace_var.get()
+        if trace is not None:
+            pending = trace._pending.pop(event.request_id, None)
+            if pending is not None:
+                name, t0, collection = pending
+                trace.add(name, t0, event.duration_micros / 1e6, collection)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+
+class ProfileStore:
+    def __init__(self, size: int = 50):
+        self._items: Deque[dict] = deque(maxlen=size)
+
+    def add(self, entry: dict) -> None:
+        self._items.append(entry)
+
+    def list(self) -> List[dict]:
+        return [
+            {k: v for k, v in e.items() if k not in ("spans", "_profiler")} for e in reversed(self._items)
+        ]
+
+    def get(self, profile_id: str, limit: int = 40) -> Optional[dict]:
+        for e in self._items:
+            if e["id"] == profile_id:
+                out = {k: v for k, v in e.items() if k != "_profiler"}
+                # Rendered on read, not on the request path.
+                out["profile"] = _render_stats(e["_profiler"], limit) if e.get("_profiler") else None
+                return out
+        return None
+
+
+def _render_stats(profiler: cProfile.Profile, limit: int) -> str:
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+_profiler_busy = False
+
+
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: ProfileStore,
+        *,
+        token: Optional[str] = None,
+        sample_rate: float = 0.0,
+        slow_ms: Optional[float] = None,
+        exclude_prefix: str = "/api/admin/",
+    ):
+        self.app = app
+        self.store = store
+        self.token = token.encode() if token else None
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.exclude_prefix = exclude_prefix
+
+    def _trigger(self, scope: Scope) -> Optional[str]:
+        if self.token is not None:
+            for key, value in scope["headers"]:
+                if key == b"x-profile-token" and value == self.token:
+                    return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        if self.slow_ms is not None:
+            return "slow"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_prefix):
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        global _profiler_busy
+        status = {"code": None}
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started_at = datetime.now(timezone.utc).isoformat()
+        trace = Trace()
+        token = _trace_var.set(trace)
+        profiler = None
+        if trigger != "slow" and not _profiler_busy:
+            _profiler_busy = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                _profiler_busy = False
+            _trace_var.reset(token)
+            duration_ms = (time.perf_counter() - trace.start) * 1000
+            if trigger != "slow" or duration_ms >= self.slow_ms:
+                self.store.add(
+                    {
+                        "id": uuid.uuid4().hex[:12],
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status["code"],
+                        "duration_ms": round(duration_ms, 3),
+                        "trigger": trigger,
+                        "request_id": request_id_var.get(),
+                        "started_at": started_at,
+                        "span_summary": trace.summary(),
+                        "spans": [
+                            {"name": n, "start_ms": round(s, 3), "duration_ms": round(d, 3), "detail": detail}
+                            for n, s, d, detail in trace.spans
+                        ],
+                        "spans_dropped": trace.dropped,
+                        "_profiler": profiler,
+                    }
+                )
@@ -0,0 +1,208 @@
+"""Per-endpoint read preferences and metrics on where reads are served.
+
+Every read goes through a named route (`leads`, `consultations`, ...). Each
+route maps to a read preference, e.g. `secondaryPreferred` with a maximum
+staleness for dashboard listings so polling is served by secondaries, and
+`primary` for upload state checks that must see the write they follow. On a
+standalone server or a replica set without secondaries every mode reads
+from the primary, so the defaults are safe everywhere.
+
+Routes are overridden with READ_PREFERENCES, a comma separated list of
+`route=mode[:max_staleness_seconds]`:
+
+    READ_PREFERENCES="leads=nearest:120,stats=primary"
+
+`ReadMetrics` is a command and server listener: it learns each server's
+role from monitoring and counts read commands per route by the role of the
+server that answered them. Motor runs commands in executor threads with the
+caller's context, so the route tagged by `ReadRouter.reading` (or `tagged`)
+is visible in the listener. The tag only lasts for the `with` block, so
+later reads in the same request are not attributed to it.
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from pymongo import monitoring
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+from pymongo.server_type import SERVER_TYPE
+
+
+_route_var: ContextVar[str] = ContextVar("read_route", default="other")
+
+MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# route -> mode. Listings and reports tolerate lag; upload state does not.
+# By-id reads that miss on a secondary are retried on the primary.
+DEFAULT_ROUTES = {
+    "leads": "secondaryPreferred",
+    "consultations": "secondaryPreferred",
+    "search": "secondaryPreferred",
+    "stats": "secondaryPreferred",
+    "status": "secondaryPreferred",
+    # Completed images never change.
+    "images": "secondaryPreferred",
+    "upload_state": "primary",
+}
+
+# Smallest maxStalenessSeconds MongoDB accepts.
+MIN_MAX_STALENESS = 90
+
+READ_COMMANDS = {"find", "getMore", "aggregate", "count", "distinct"}
+
+_ROLES = {
+    SERVER_TYPE.RSPrimary: "primary",
+    SERVER_TYPE.RSSecondary: "secondary",
+    SERVER_TYPE.Standalone: "standalone",
+    SERVER_TYPE.Mongos: "mongos",
+}
+
+
+def parse_routes(spec: Optional[str], max_staleness: int = MIN_MAX_STALENESS) -> Dict[str, Tuple[str, int]]:
+    """DEFAULT_ROUTES plus READ_PREFERENCES overrides, as route -> (mode, max staleness).
+
+    Secondary-capable modes without an explicit staleness get
+    `max_staleness`; -1 means no limit.
+    """
+    routes = {route: (mode, None) for route, mode in DEFAULT_ROUTES.items()}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        route, _, value = item.partition("=")
+        mode, _, staleness = value.strip().partition(":")
+        routes[route.strip()] = (mode, int(staleness) if staleness else None)
+
+    parsed = {}
+    for route, (mode, staleness) in routes.items():
+        if mode not in MODES:
+            raise ValueError(f"Unknown read preference {mode!r} for route {route!r}")
+        if mode == "primary":
+            staleness = -1
+        elif staleness is None:
+            staleness = max_staleness
+        if staleness != -1 and staleness < MIN_MAX_STALENESS:
+            raise ValueError(f"max staleness for route {route!r} must be -1 or at least {MIN_MAX_STALENESS}s")
+        parsed[route] = (mode, staleness)
+    return parsed
+
+
+@contextmanager
+def tagged(route: str) -> Iterator[None]:
+    """Attribute the reads made inside the block to `route` in the metrics."""
+    token = _route_var.set(route)
+    try:
+        yield
+    finally:
+        _route_var.reset(token)
+
+
+async def tagged_iter(route: str, parts: AsyncIterator) -> AsyncIterator:
+    """`parts`, with the reads made while producing each item tagged `route`.
+
+    For response bodies that are streamed after the handler has returned.
+    """
+    while True:
+        with tagged(route):
+            try:
+                part = await parts.__anext__()
+            except StopAsyncIteration:
+                return
+        yield part
+
+
+class ReadRouter:
+    def __init__(self, client, db_name: str, routes: Dict[str, Tuple[str, int]]):
+        self.routes = routes
+        self.primary = client[db_name]
+        # One handle per distinct preference; routes sharing one share it.
+        self._handles: Dict[Tuple[str, int], object] = {("primary", -1): self.primary}
+        for mode, staleness in routes.values():
+            if (mode, staleness) not in self._handles:
+                pref = MODES[mode](max_staleness=staleness)
+                self._handles[(mode, staleness)] = client.get_database(db_name, read_preference=pref)
+
+    def handle(self, route: str):
+        """Database handle for `route` (the primary for unknown routes)."""
+        pref = self.routes.get(route)
+        return self.primary if pref is None else self._handles[pref]
+
+    @contextmanager
+    def reading(self, route: str) -> Iterator[object]:
+        """`with router.reading(route) as db:` the handle for `route`, with
+        the reads made in the block tagged `route`."""
+        with tagged(route):
+            yield self.handle(route)
+
+    def describe(self) -> Dict[str, dict]:
+        return {
+            route: {"mode": mode, "max_staleness_seconds": None if staleness == -1 else staleness}
+            for route, (mode, staleness) in self.routes.items()
+        }
+
+
+class ReadMetrics(monitoring.CommandListener, monitoring.ServerListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._roles: Dict[tuple, str] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._errors: Dict[str, int] = {}
+
+    # -- server monitoring ---------------------------------------------
+
+    def opened(self, event) -> None:
+        pass
+
+    def description_changed(self, event) -> None:
+        with self._lock:
+            self._roles[event.server_address] = _ROLES.get(event.new_description.server_type, "unknown")
+
+    def closed(self, event) -> None:
+        with self._lock:
+            self._roles.pop(event.server_address, None)
+
+    # -- command monitoring --------------------------------------------
+
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        if event.command_name not in READ_COMMANDS:
+            return
+        route = _route_var.get()
+        with self._lock:
+            role = self._roles.get(event.connection_id, "unknown")
+            by_role = self._counts.setdefault(route, {})
+            by_role[role] = by_role.get(role, 0) + 1
+
+    def failed(self, event) -> None:
+        if event.command_name not in READ_COMMANDS:
+            return
+        route = _route_var.get()
+        with self._lock:
+            self._errors[route] = self._errors.get(route, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routes = {route: dict(by_role) for route, by_role in self._counts.items()}
+            errors = dict(self._errors)
+            servers: Dict[str, int] = {}
+            for role in self._roles.values():
+                servers[role] = servers.get(role, 0) + 1
+        totals: Dict[str, int] = {}
+        for by_role in routes.values():
+            for role, n in by_role.items():
+                totals[role] = totals.get(role, 0) + n
+        return {"servers": servers, "reads": routes, "totals": totals, "errors": errors}
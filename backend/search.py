@@ -0,0 +1,255 @@
+"""Full-text search over leads and consultations.
+
+Two interchangeable backends:
+
+* `MongoTextSearch` (default) uses a weighted text index per collection.
+* `MemorySearch` keeps an in-process inverted index, for local stand-ins
+  without text index support (SEARCH_BACKEND=memory). Each worker process
+  has its own index and tops it up from Mongo every `refresh_interval`
+  seconds, so documents created through another worker become searchable
+  within that interval; hits are re-read from Mongo, so deleted documents
+  drop out at once. A query costs time linear in the documents its words
+  match, so words common to most documents are slow on large collections
+  (see benchmarks/bench_search.py).
+
+Prefix matching on company/facility names works the same way in both: each
+document stores the edge n-grams of that name in `search_prefixes`, which is
+indexed like any other text field, so "rewi" finds "Rewind Ventures".
+Documents created before search existed are backfilled with:
+
+    cd backend && python -m search
+"""
+import asyncio
+import heapq
+import os
+import re
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+
+# Text-index weights per searchable field.
+FIELDS: Dict[str, Dict[str, int]] = {
+    "leads": {"company": 10, "name": 5, "need": 1, "search_prefixes": 3},
+    "consultations": {"facility_name": 10, "company": 5, "details": 1, "search_prefixes": 3},
+}
+PREFIX_SOURCE = {"leads": "company", "consultations": "facility_name"}
+
+MIN_PREFIX = 2
+MAX_PREFIX = 15
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def edge_ngrams(text: Optional[str]) -> str:
+    grams = []
+    for word in tokenize(text):
+        for n in range(MIN_PREFIX, min(len(word), MAX_PREFIX) + 1):
+            grams.append(word[:n])
+    return " ".join(grams)
+
+
+def search_fields(kind: str, doc: dict) -> dict:
+    """Derived fields to store alongside a new document."""
+    return {"search_prefixes": edge_ngrams(doc.get(PREFIX_SOURCE[kind]))}
+
+
+async def ensure_text_indexes(db) -> None:
+    for kind, weights in FIELDS.items():
+        await db[kind].create_index(
+            [(field, "text") for field in weights],
+            weights=weights,
+            name=f"{kind}_text",
+        )
+
+
+class MongoTextSearch:
+    def __init__(self, db):
+        self.db = db
+
+    async def search(self, kind: str, q: str, skip: int, limit: int) -> List[dict]:
+        return (
+            await self.db[kind]
+            .find({"$text": {"$search": q}}, {"_id": 0, "score": {"$meta": "textScore"}})
+            .sort([("score", {"$meta": "textScore"})])
+            .skip(skip)
+            .limit(limit)
+            .to_list(limit)
+        )
+
+    async def load(self) -> None:
+        await ensure_text_indexes(self.db)
+
+    def add(self, kind: str, doc: dict) -> None:
+        return None
+
+    def remove(self, kind: str, doc_id: str) -> None:
+        return None
+
+
+class InvertedIndex:
+    def __init__(self, weights: Dict[str, int]):
+        self.weights = weights
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._doc_terms: Dict[str, List[str]] = {}
+
+    def add(self, doc_id: str, doc: dict) -> None:
+        self.remove(doc_id)
+        scores: Dict[str, float] = defaultdict(float)
+        for field, weight in self.weights.items():
+            for term in tokenize(doc.get(field)):
+                scores[term] += weight
+        for term, score in scores.items():
+            self._postings[term][doc_id] = score
+        self._doc_terms[doc_id] = list(scores)
+
+    def remove(self, doc_id: str) -> None:
+        for term in self._doc_terms.pop(doc_id, []):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def scores(self, q: str) -> Dict[str, float]:
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(tokenize(q)):
+            for doc_id, score in self._postings.get(term, {}).items():
+                scores[doc_id] += score
+        return scores
+
+    def search(self, q: str, skip: int, limit: int) -> List[Tuple[str, float]]:
+        return top_hits(self.scores(q), skip + limit)[skip:]
+
+
+def _rank(hit: Tuple[str, float]) -> tuple:
+    return -hit[1], hit[0]
+
+
+def top_hits(scores: Dict[str, float], n: int) -> List[Tuple[str, float]]:
+    """The `n` best (doc id, score) pairs, best first; ties by id."""
+    # A heap instead of sorting every hit: common words match most documents.
+    return heapq.nsmallest(n, scores.items(), key=_rank)
+
+
+class MemorySearch:
+    def __init__(self, db, refresh_interval: Optional[float] = 5.0, overlap: float = 300.0, clock=time.monotonic):
+        self.db = db
+        self.indexes = {kind: InvertedIndex(weights) for kind, weights in FIELDS.items()}
+        self.refresh_interval = refresh_interval
+        # Re-read this far behind the newest indexed document: `created_at`
+        # is set before the insert commits, and reads may come from a
+        # lagging secondary. Indexed fields never change, so re-adding is
+        # harmless.
+        self.overlap = overlap
+        self._clock = clock
+        self._newest: Dict[str, str] = {kind: "" for kind in FIELDS}
+        self._refreshed_at: Optional[float] = None
+        self._refreshing = False
+
+    async def load(self) -> None:
+        await self.refresh()
+
+    async def refresh(self) -> None:
+        """Index documents created since the last refresh (all on the first)."""
+        if self._refreshing:
+            return
+        self._refreshing = True
+        try:
+            for kind, index in self.indexes.items():
+                query = {}
+                if self._newest[kind]:
+                    since = datetime.fromisoformat(self._newest[kind]) - timedelta(seconds=self.overlap)
+                    query = {"created_at": {"$gte": since.isoformat()}}
+                projection = {
+                    "_id": 0, "id": 1, "created_at": 1, PREFIX_SOURCE[kind]: 1, **{f: 1 for f in index.weights}
+                }
+                async for doc in self.db[kind].find(query, projection):
+                    index.add(doc["id"], {**doc, **search_fields(kind, doc)})
+                    self._newest[kind] = max(self._newest[kind], str(doc.get("created_at") or ""))
+            self._refreshed_at = self._clock()
+        finally:
+            self._refreshing = False
+
+    def _due(self) -> bool:
+        if self.refresh_interval is None:
+            return False
+        return self._refreshed_at is None or self._clock() - self._refreshed_at >= self.refresh_interval
+
+    def add(self, kind: str, doc: dict) -> None:
+        self.indexes[kind].add(doc["id"], doc)
+
+    def remove(self, kind: str, doc_id: str) -> None:
+        self.indexes[kind].remove(doc_id)
+
+    async def search(self, kind: str, q: str, skip: int, limit: int) -> List[dict]:
+        if self._due():
+            await self.refresh()
+        scores = self.indexes[kind].scores(q)
+        # Hits whose document has since been deleted or archived are dropped
+        # before paging, so pages stay full: widen the ranking until
+        # `skip + limit` live hits are known or it runs out.
+        want = skip + limit
+        hits: List[dict] = []
+        read = 0
+        n = want
+        while True:
+            ranked = top_hits(scores, n)
+            window = ranked[read:]
+            read = len(ranked)
+            if window:
+                ids = [doc_id for doc_id, _ in window]
+                docs = await self.db[kind].find({"id": {"$in": ids}}, {"_id": 0}).to_list(len(ids))
+                by_id = {d["id"]: d for d in docs}
+                hits += [{**by_id[doc_id], "score": score} for doc_id, score in window if doc_id in by_id]
+            if len(hits) >= want or read < n:
+                return hits[skip:want]
+            n = read + 2 * (want - len(hits))
+
+
+async def backfill_search_fields(db, batch_size: int = 1000) -> int:
+    """Add `search_prefixes` to documents created before search existed."""
+    updated = 0
+    for kind, source in PREFIX_SOURCE.items():
+        ops = []
+        async for doc in db[kind].find({"search_prefixes": {"$exists": False}}, {"_id": 1, source: 1}):
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": search_fields(kind, doc)}))
+            if len(ops) >= batch_size:
+                await db[kind].bulk_write(ops, ordered=False)
+                updated += len(ops)
+                ops = []
+        if ops:
+            await db[kind].bulk_write(ops, ordered=False)
+            updated += len(ops)
+    return updated
+
+
+def build_search_backend(name: str, db, refresh_interval: Optional[float] = 5.0):
+    if name == "memory":
+        return MemorySearch(db, refresh_interval=refresh_interval)
+    return MongoTextSearch(db)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pathlib import Path
+
+    load_dotenv(Path(__file__).parent / ".env")
+
+    async def _main():
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        db = client[os.environ["DB_NAME"]]
+        n = await backfill_search_fields(db)
+        await ensure_text_indexes(db)
+        print(f"Backfilled search fields on {n} documents")
+        client.close()
+
+    asyncio.run(_main())
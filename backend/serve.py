@@ -0,0 +1,69 @@
+"""Production entrypoint for the API.
+
+    cd backend && python serve.py --workers 4
+
+Runs `server:app` under uvicorn with one worker process per CPU by default,
+uvloop and httptools when installed, and tuned keep-alive/backlog. Each
+worker opens its own Mongo client and email transport at startup (see
+`connect_worker_clients` in server.py).
+
+X-Forwarded-For/-Proto are only trusted from the addresses in
+FORWARDED_ALLOW_IPS (default 127.0.0.1, a proxy on the same host); set it to
+the load balancer's address when it runs elsewhere.
+"""
+import argparse
+import importlib.util
+import os
+from pathlib import Path
+
+import uvicorn
+
+
+def _has(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def default_workers() -> int:
+    return int(os.environ.get("WEB_CONCURRENCY") or os.cpu_count() or 1)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the Rewind Ventures API")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--keep-alive", type=int, default=int(os.environ.get("KEEP_ALIVE_SECONDS", "75")))
+    parser.add_argument("--backlog", type=int, default=int(os.environ.get("BACKLOG", "2048")))
+    parser.add_argument("--log-level", default=os.environ.get("LOG_LEVEL", "info"))
+    parser.add_argument(
+        "--forwarded-allow-ips",
+        default=os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        help="comma separated proxy addresses whose X-Forwarded-* headers are trusted",
+    )
+    return parser.parse_args(argv)
+
+
+def uvicorn_options(args: argparse.Namespace) -> dict:
+    return dict(
+        app_dir=str(Path(__file__).parent),
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="uvloop" if _has("uvloop") else "asyncio",
+        http="httptools" if _has("httptools") else "h11",
+        # Longer than typical load-balancer idle timeouts (60s), so the
+        # proxy, not uvicorn, closes idle connections.
+        timeout_keep_alive=args.keep_alive,
+        backlog=args.backlog,
+        proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+        log_level=args.log_level,
+    )
+
+
+def main(argv=None) -> None:
+    uvicorn.run("server:app", **uvicorn_options(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
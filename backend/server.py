@@ -1,28 +1,80 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query, UploadFile, File, Form
-from dotenv import load_dotenv
+from fastapi import FastAPI, APIRouter, HTTPException, Query, UploadFile, File, Form, Request
+from fastapi.responses import Response, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import ReturnDocument
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Literal
+from typing import List, Optional, Literal, Union
 import uuid
 from datetime import datetime, timezone
 import asyncio
 import base64
-import resend
 
+from notification_batcher import DigestBatcher, Notification
+import analytics_rollups
+import archive
+import search
+import image_store
+import image_links
+import profiling
+import read_routing
+from buffered_writer import BufferedWriter, WriterOverloaded
+from compression import CompressionMiddleware
+from admission import UploadAdmission, UploadAdmissionMiddleware
+from structured_logging import CorrelationIdMiddleware, configure_logging
+from deadlines import DeadlineMiddleware
+
+# Optional integrations (Motor, the email transport/httpx, the lead feed) are
+# imported on first use to keep cold starts short; see benchmarks/bench_startup.py.
 
 
 ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+if (ROOT_DIR / '.env').exists():
+    from dotenv import load_dotenv
+    load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection. The client, and everything bound to it, is created per
+# worker in `connect_worker_clients` (startup) rather than at import time, so
+# nothing holding sockets or an event loop is inherited across a fork.
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+client = None
+db = None
+
+# Per-endpoint read preferences (see read_routing.py): listings are served by
+# secondaries when there are any, upload state always by the primary.
+# READ_MAX_STALENESS_SECONDS applies to routes without their own limit.
+READ_ROUTES = read_routing.parse_routes(
+    os.environ.get("READ_PREFERENCES"),
+    max_staleness=int(os.environ.get("READ_MAX_STALENESS_SECONDS", "90")),
+)
+read_router: Optional[read_routing.ReadRouter] = None
+read_metrics = read_routing.ReadMetrics() if os.environ.get("READ_METRICS", "1") == "1" else None
+
+# Full-text search: "mongo" (text indexes) or "memory" (in-process inverted
+# index per worker, refreshed from Mongo every SEARCH_MEMORY_REFRESH_SECONDS)
+search_backend = None
+
+# Status check writes: "direct" (insert_one per request), "buffered" (ack once
+# queued) or "group_commit" (ack once the batch is written).
+STATUS_WRITE_MODE = os.environ.get("STATUS_WRITE_MODE", "direct")
+status_writer: Optional[BufferedWriter] = None
+
+# Opt-in request profiling (see profiling.py). Requests are traced when they
+# send X-Profile-Token, are sampled, or (spans only) run slower than
+# PROFILE_SLOW_MS; results are kept in a ring buffer under /api/admin/profiles.
+# PROFILING_TOKEN is also the admin token for the other /api/admin endpoints.
+PROFILING = os.environ.get("PROFILING", "0") == "1"
+PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN")
+profile_store = profiling.ProfileStore(int(os.environ.get("PROFILE_BUFFER_SIZE", "50")))
+
+# Batched Google Sheets sync (see sheets_sync.py); one worker holds the lease.
+sheets_sync = None
+
+# One shared watcher per process feeds every /api/leads/stream client;
+# created when the first client subscribes.
+lead_feed = None
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -30,8 +82,38 @@ app = FastAPI()
 # Resend email configuration
 RESEND_API_KEY = os.environ.get("RESEND_API_KEY")
 SENDER_EMAIL = os.environ.get("SENDER_EMAIL", "hello@rewind-ventures.com")
-if RESEND_API_KEY:
-    resend.api_key = RESEND_API_KEY
+EMAIL_TRANSPORT = os.environ.get("EMAIL_TRANSPORT", "resend")  # "resend" | "fake"
+
+
+def _build_email_transport():
+    from email_transport import CircuitBreaker, FakeEmailTransport, ResendTransport
+
+    if EMAIL_TRANSPORT == "fake":
+        return FakeEmailTransport()
+    if not RESEND_API_KEY:
+        return None
+    return ResendTransport(
+        RESEND_API_KEY,
+        max_connections=int(os.environ.get("RESEND_MAX_CONNECTIONS", "20")),
+        max_concurrency=int(os.environ.get("RESEND_MAX_CONCURRENCY", "10")),
+        timeout=float(os.environ.get("RESEND_TIMEOUT_SECONDS", "10")),
+        http2=os.environ.get("RESEND_HTTP2", "1") == "1",
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.environ.get("RESEND_BREAKER_THRESHOLD", "5")),
+            reset_timeout=float(os.environ.get("RESEND_BREAKER_RESET_SECONDS", "30")),
+        ),
+    )
+
+
+# Built on first send, inside the worker that uses it.
+email_transport = None
+
+
+def _get_email_transport():
+    global email_transport
+    if email_transport is None:
+        email_transport = _build_email_transport()
+    return email_transport
 
 
 def _safe_email(s: Optional[str]) -> str:
@@ -57,7 +139,8 @@ async def send_notification_email(
     reply_to: Optional[str] = None,
     attachments: Optional[List[dict]] = None,
 ):
-    if not RESEND_API_KEY:
+    transport = _get_email_transport()
+    if transport is None:
         logger.warning("RESEND_API_KEY not set; skipping email send")
         return {"skipped": True, "reason": "missing_api_key"}
 
@@ -72,7 +155,54 @@ async def send_notification_email(
     if attachments:
         params["attachments"] = attachments
 
-    return await asyncio.to_thread(resend.Emails.send, params)
+    with profiling.span("email.send"):
+        return await transport.send(params)
+
+
+def _render_notification(n: Notification, heading_tag: str = "h2") -> str:
+    html = (
+        f"<{heading_tag} style='margin:0 0 10px'>{n.heading}</{heading_tag}>"
+        + _render_kv_table(n.rows)
+    )
+    if n.footer:
+        html += f"<p style='color:#6b7280;margin-top:12px'>{n.footer}</p>"
+    return html
+
+
+async def _send_single_notification(n: Notification):
+    return await send_notification_email(
+        to_email="hello@rewind-ventures.com",
+        subject=n.subject,
+        html="<div style='font-family:Arial,sans-serif'>" + _render_notification(n) + "</div>",
+        reply_to=n.reply_to,
+    )
+
+
+async def _send_digest_notification(items: List[Notification]):
+    html = (
+        "<div style='font-family:Arial,sans-serif'>"
+        f"<h2 style='margin:0 0 10px'>{len(items)} new website notifications</h2>"
+        + "".join(
+            "<div style='margin-top:18px'>" + _render_notification(n, heading_tag="h3") + "</div>"
+            for n in items
+        )
+        + "</div>"
+    )
+    return await send_notification_email(
+        to_email="hello@rewind-ventures.com",
+        subject=f"Website digest — {len(items)} new notifications",
+        html=html,
+    )
+
+
+# Sends immediately at low volume, coalesces into digests during bursts.
+notification_batcher = DigestBatcher(
+    _send_single_notification,
+    _send_digest_notification,
+    rate_threshold=int(os.environ.get("NOTIFY_DIGEST_RATE_PER_MIN", "20")),
+    window=float(os.environ.get("NOTIFY_DIGEST_WINDOW_SECONDS", "60")),
+    max_batch=int(os.environ.get("NOTIFY_DIGEST_MAX_BATCH", "50")),
+)
 
 
 
@@ -198,6 +328,65 @@ async def _build_image_attachments_for_consultation(
     return attachments
 
 
+# Above EMAIL_LINK_THRESHOLD_BYTES of images, notification emails carry
+# signed download links and small inline thumbnails instead of the images.
+EMAIL_IMAGE_DELIVERY = os.environ.get("EMAIL_IMAGE_DELIVERY", "auto")  # "auto" | "attach" | "link"
+EMAIL_LINK_THRESHOLD_BYTES = int(os.environ.get("EMAIL_LINK_THRESHOLD_BYTES", str(5 * 1024 * 1024)))
+# Absolute URL the backend is reachable at, used to build the links.
+PUBLIC_BASE_URL = os.environ.get("PUBLIC_BASE_URL", "").rstrip("/")
+
+
+def _use_image_links(total_bytes: int) -> bool:
+    if EMAIL_IMAGE_DELIVERY == "attach":
+        return False
+    if EMAIL_IMAGE_DELIVERY == "auto" and total_bytes <= EMAIL_LINK_THRESHOLD_BYTES:
+        return False
+    if not PUBLIC_BASE_URL:
+        logger.warning("PUBLIC_BASE_URL not set; attaching images instead of linking them")
+        return False
+    if image_link_signer is None:
+        logger.warning("IMAGE_LINK_SECRET not set; attaching images instead of linking them")
+        return False
+    return True
+
+
+async def _build_image_links_for_consultation(
+    consultation_id: str, images: List[dict], data_by_id: Optional[dict] = None
+) -> tuple:
+    # Returns (html, attachments): a table of signed links, with thumbnails
+    # attached inline (Content-ID) so they show without loading remote images.
+    rows = []
+    attachments: List[dict] = []
+    for img in images:
+        image_id = img["id"]
+        url = PUBLIC_BASE_URL + image_link_signer.sign(f"/api/consultations/{consultation_id}/images/{image_id}")
+        name = img.get("filename") or image_id
+        size_kb = int(img.get("received_bytes") or img.get("size") or 0) // 1024
+        preview = ""
+        try:
+            thumb = await _get_thumbnail(image_id, (data_by_id or {}).get(image_id))
+            content_id = f"thumb-{image_id}"
+            attachments.append(
+                {
+                    "filename": f"thumb-{image_id}.jpg",
+                    "content": base64.b64encode(bytes(thumb["data"])).decode("utf-8"),
+                    "content_type": thumb["content_type"],
+                    "content_id": content_id,
+                }
+            )
+            preview = f"<img src='cid:{content_id}' alt='' style='max-width:160px;border-radius:4px'>"
+        except Exception as e:
+            logger.warning("No email thumbnail for image %s: %s", image_id, str(e))
+        rows.append((f"<a href='{url}'>{preview or name}</a>", f"<a href='{url}'>{name}</a> ({size_kb} KB)"))
+
+    days = max(image_link_signer.ttl // 86400, 1)
+    html = _render_kv_table(rows) + (
+        f"<p style='color:#6b7280;margin-top:12px'>Download links expire in {days} day(s); "
+        "the images remain stored in the system.</p>"
+    )
+    return html, attachments
+
+
 class ConsultationImageInit(BaseModel):
     filename: str
     size: int
@@ -206,6 +395,30 @@ class ConsultationImageInit(BaseModel):
 class ConsultationImageInitResponse(BaseModel):
     image_id: str
 
+class ConsultationSummary(Consultation):
+    image_count: int = 0
+    images_complete: int = 0
+    image_bytes: int = 0
+    upload_status: Literal["none", "uploading", "complete"] = "none"
+
+class ConsultationPage(BaseModel):
+    items: List[ConsultationSummary]
+    next_cursor: Optional[str] = None
+
+
+# Search
+class LeadSearchHit(Lead):
+    score: float = 0.0
+
+class ConsultationSearchHit(Consultation):
+    score: float = 0.0
+
+class SearchPage(BaseModel):
+    kind: Literal["leads", "consultations"]
+    items: List[Union[LeadSearchHit, ConsultationSearchHit]]
+    page: int
+    has_more: bool
+
 
 
 
@@ -216,32 +429,35 @@ async def create_lead(input: LeadCreate):
 
     doc = lead.model_dump()
     doc["created_at"] = doc["created_at"].isoformat()
+    doc.update(search.search_fields("leads", doc))
 
-    await db.leads.update_one({"id": doc["id"]}, {"$setOnInsert": doc}, upsert=True)
+    # `_id` is the lead id so change stream delete events (which carry only
+    # the key) identify the lead; see lead_feed.py.
+    res = await db.leads.update_one({"id": doc["id"]}, {"$setOnInsert": {**doc, "_id": doc["id"]}}, upsert=True)
+
+    if res.upserted_id is not None:
+        search_backend.add("leads", doc)
+        try:
+            await analytics_rollups.record_lead_created(db, doc)
+        except Exception as e:
+            logger.exception("Failed updating lead rollups: %s", str(e))
 
     # Email notification (Send Message form)
     try:
-        subject = f"New website message — {lead.company}"
-        html = (
-            "<div style='font-family:Arial,sans-serif'>"
-            "<h2 style='margin:0 0 10px'>New website enquiry</h2>"
-            + _render_kv_table(
-                [
+        await notification_batcher.submit(
+            Notification(
+                subject=f"New website message — {lead.company}",
+                heading="New website enquiry",
+                rows=[
                     ("Name", lead.name),
                     ("Email", lead.email),
                     ("Company", lead.company),
                     ("Message", lead.need),
                     ("Source", lead.source),
                     ("Created", doc["created_at"]),
-                ]
+                ],
+                reply_to=_safe_email(lead.email),
             )
-            + "</div>"
-        )
-        await send_notification_email(
-            to_email="hello@rewind-ventures.com",
-            subject=subject,
-            html=html,
-            reply_to=_safe_email(lead.email),
         )
     except Exception as e:
         logger.exception("Failed sending lead email notification: %s", str(e))
@@ -249,43 +465,53 @@ async def create_lead(input: LeadCreate):
     return lead
 
 
+async def _store_consultation(doc: dict) -> None:
+    doc.update(search.search_fields("consultations", doc))
+    await db.consultations.insert_one(doc)
+    search_backend.add("consultations", doc)
+
+    try:
+        await analytics_rollups.record_consultation_created(db, doc)
+    except Exception as e:
+        logger.exception("Failed updating consultation rollups: %s", str(e))
+
+
+def _consultation_notification(obj: Consultation, created_at: str, footer: Optional[str] = None) -> Notification:
+    sports_line = ", ".join([f"{s.sport}: {s.courts}" for s in obj.sports])
+    return Notification(
+        subject=f"New consultation request — {obj.facility_name}",
+        heading="New consultation request",
+        rows=[
+            ("Name", obj.name),
+            ("Email", obj.email),
+            ("Company", obj.company),
+            ("Facility", obj.facility_name),
+            ("Mode", obj.mode),
+            ("Sports", sports_line),
+            ("Area (sq.ft)", str(obj.area_sqft) if obj.area_sqft else ""),
+            ("Maps", f"<a href='{obj.google_maps_url}'>Open in Google Maps</a>"),
+            ("Details", obj.details),
+            ("Created", created_at),
+        ],
+        reply_to=_safe_email(obj.email),
+        footer=footer,
+    )
+
+
 @api_router.post("/consultations", response_model=Consultation)
 async def create_consultation(input: ConsultationCreate):
     obj = Consultation(**input.model_dump())
     doc = obj.model_dump()
     doc["created_at"] = doc["created_at"].isoformat()
-    await db.consultations.insert_one(doc)
+    await _store_consultation(doc)
 
     # Email notification (Book a consultation form) - best-effort.
     # Attachments are added AFTER image upload completes (see complete endpoint).
     try:
-        subject = f"New consultation request — {obj.facility_name}"
-        sports_line = ", ".join([f"{s.sport}: {s.courts}" for s in obj.sports])
-        html = (
-            "<div style='font-family:Arial,sans-serif'>"
-            "<h2 style='margin:0 0 10px'>New consultation request</h2>"
-            + _render_kv_table(
-                [
-                    ("Name", obj.name),
-                    ("Email", obj.email),
-                    ("Company", obj.company),
-                    ("Facility", obj.facility_name),
-                    ("Mode", obj.mode),
-                    ("Sports", sports_line),
-                    ("Area (sq.ft)", str(obj.area_sqft) if obj.area_sqft else ""),
-                    ("Maps", f"<a href='{obj.google_maps_url}'>Open in Google Maps</a>"),
-                    ("Details", obj.details),
-                    ("Created", doc["created_at"]),
-                ]
+        await notification_batcher.submit(
+            _consultation_notification(
+                obj, doc["created_at"], footer="Images will follow in a second email once upload completes."
             )
-            + "<p style='color:#6b7280;margin-top:12px'>Images will follow in a second email once upload completes.</p>"
-            + "</div>"
-        )
-        await send_notification_email(
-            to_email="hello@rewind-ventures.com",
-            subject=subject,
-            html=html,
-            reply_to=_safe_email(obj.email),
         )
     except Exception as e:
         logger.exception("Failed sending consultation email notification: %s", str(e))
@@ -302,7 +528,8 @@ async def init_consultation_image(consultation_id: str, input: ConsultationImage
     if input.size > 2 * 1024 * 1024:
         raise HTTPException(status_code=400, detail="Image exceeds 2MB limit")
     # ensure consultation exists
-    exists = await db.consultations.find_one({"id": consultation_id}, {"_id": 0, "id": 1})
+    with read_router.reading("upload_state") as reads:
+        exists = await reads.consultations.find_one({"id": consultation_id}, {"_id": 0, "id": 1})
     if not exists:
         raise HTTPException(status_code=404, detail="Consultation not found")
 
@@ -329,9 +556,10 @@ async def upload_consultation_image_chunk(
     index: int = Form(...),
     total: int = Form(...),
 ):
-    meta = await db.consultation_images.find_one(
-        {"id": image_id, "consultation_id": consultation_id}, {"_id": 0}
-    )
+    with read_router.reading("upload_state") as reads:
+        meta = await reads.consultation_images.find_one(
+            {"id": image_id, "consultation_id": consultation_id}, {"_id": 0}
+        )
     if not meta:
         raise HTTPException(status_code=404, detail="Image upload not initialized")
 
@@ -340,30 +568,107 @@ async def upload_consultation_image_chunk(
         raise HTTPException(status_code=400, detail="Empty chunk")
 
     # Store chunk in mongo (simple MVP). For production, use object storage.
-    chunk_doc = {
-        "image_id": image_id,
-        "consultation_id": consultation_id,
-        "index": int(index),
-        "total": int(total),
-        "data": data,
-        "size": len(data),
-        "created_at": datetime.now(timezone.utc).isoformat(),
-    }
-    await db.consultation_image_chunks.insert_one(chunk_doc)
+    inserted = await image_store.put_chunk(db, consultation_id, image_id, int(index), int(total), data)
 
-    await db.consultation_images.update_one(
-        {"id": image_id},
-        {"$addToSet": {"chunks": int(index)}, "$set": {"total": int(total)}},
-    )
+    update = {"$addToSet": {"chunks": int(index)}, "$set": {"total": int(total)}}
+    if inserted:
+        update["$inc"] = {"received_bytes": len(data)}
+    await db.consultation_images.update_one({"id": image_id}, update)
 
     return {"ok": True}
 
 
+MAX_IMAGE_BYTES = 2 * 1024 * 1024
+RAW_UPLOAD_CHUNK_BYTES = int(os.environ.get("RAW_UPLOAD_CHUNK_BYTES", str(256 * 1024)))
+
+
+def _parse_content_range(header: str) -> tuple:
+    # "bytes <start>-<end>/<size>"
+    try:
+        unit, _, spec = header.strip().partition(" ")
+        span, _, size = spec.partition("/")
+        start, _, end = span.partition("-")
+        start, end, size = int(start), int(end), int(size)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Range")
+    if unit != "bytes" or start > end or end >= size:
+        raise HTTPException(status_code=400, detail="Invalid Content-Range")
+    return start, end, size
+
+
+@api_router.put("/consultations/{consultation_id}/images/{image_id}")
+async def upload_consultation_image_raw(consultation_id: str, image_id: str, request: Request):
+    # Raw-body alternative to multipart chunks, cut into RAW_UPLOAD_CHUNK_BYTES
+    # chunks. Send the whole image in one request, or byte ranges with
+    # Content-Range (each range must start on a chunk boundary and cover
+    # whole chunks, except the one ending the image). The body is read and
+    # checked in full before anything is stored, and a re-sent range
+    # replaces what an earlier attempt stored.
+    with read_router.reading("upload_state") as reads:
+        meta = await reads.consultation_images.find_one(
+            {"id": image_id, "consultation_id": consultation_id}, {"_id": 0, "status": 1, "size": 1}
+        )
+    if not meta:
+        raise HTTPException(status_code=404, detail="Image upload not initialized")
+    if meta.get("status") == "complete":
+        raise HTTPException(status_code=409, detail="Image upload already complete")
+
+    chunk_bytes = RAW_UPLOAD_CHUNK_BYTES
+    content_range = request.headers.get("content-range")
+    if content_range:
+        start, end, size = _parse_content_range(content_range)
+        if size > MAX_IMAGE_BYTES:
+            raise HTTPException(status_code=413, detail="Image exceeds 2MB limit")
+        if meta.get("size") and size != int(meta["size"]):
+            raise HTTPException(status_code=400, detail="Content-Range size does not match the initialized size")
+        if start % chunk_bytes or (end + 1 < size and (end - start + 1) % chunk_bytes):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Content-Range must align to {chunk_bytes}-byte chunks",
+            )
+        limit = end - start + 1
+    else:
+        start, end, size = 0, None, None
+        limit = MAX_IMAGE_BYTES
+
+    body = bytearray()
+    async for part in request.stream():
+        body += part
+        if len(body) > limit:
+            if end is None:
+                raise HTTPException(status_code=413, detail="Image exceeds 2MB limit")
+            raise HTTPException(status_code=400, detail="Body length does not match Content-Range")
+    if not body:
+        raise HTTPException(status_code=400, detail="Empty body")
+    if end is not None and len(body) != limit:
+        raise HTTPException(status_code=400, detail="Body length does not match Content-Range")
+
+    # Chunk count is known up front only when Content-Range carries the size.
+    total = -(-(size if size is not None else len(body)) // chunk_bytes)
+    first = start // chunk_bytes
+    indexes: List[int] = []
+    stored_bytes = 0
+    for offset in range(0, len(body), chunk_bytes):
+        index = first + offset // chunk_bytes
+        stored_bytes += await image_store.replace_chunk(
+            db, consultation_id, image_id, index, total, bytes(body[offset:offset + chunk_bytes])
+        )
+        indexes.append(index)
+
+    update = {"$addToSet": {"chunks": {"$each": indexes}}, "$set": {"total": total}}
+    if stored_bytes:
+        update["$inc"] = {"received_bytes": stored_bytes}
+    await db.consultation_images.update_one({"id": image_id}, update)
+
+    return {"ok": True, "received": len(body), "chunks": len(indexes), "total": total}
+
+
 @api_router.post("/consultations/{consultation_id}/images/{image_id}/complete")
 async def complete_consultation_image_upload(consultation_id: str, image_id: str):
-    meta = await db.consultation_images.find_one(
-        {"id": image_id, "consultation_id": consultation_id}, {"_id": 0}
-    )
+    with read_router.reading("upload_state") as reads:
+        meta = await reads.consultation_images.find_one(
+            {"id": image_id, "consultation_id": consultation_id}, {"_id": 0}
+        )
     if not meta:
         raise HTTPException(status_code=404, detail="Image upload not initialized")
 
@@ -389,7 +694,26 @@ async def complete_consultation_image_upload(consultation_id: str, image_id: str
             {"consultation_id": consultation_id}, {"_id": 0}
         ).to_list(50)
         if images and all((img.get("status") == "complete") for img in images):
-            attachments = await _build_image_attachments_for_consultation(consultation_id)
+            total_bytes = sum(int(img.get("received_bytes") or img.get("size") or 0) for img in images)
+            if _use_image_links(total_bytes):
+                with profiling.span("email.attachments", "links"):
+                    links_html, thumbnails = await _build_image_links_for_consultation(consultation_id, images)
+                await send_notification_email(
+                    to_email="hello@rewind-ventures.com",
+                    subject=f"Consultation images — {consultation_id}",
+                    html=(
+                        "<div style='font-family:Arial,sans-serif'>"
+                        "<h3 style='margin:0 0 10px'>Site images</h3>"
+                        f"<p>Consultation ID: <b>{consultation_id}</b></p>"
+                        + links_html
+                        + "</div>"
+                    ),
+                    attachments=thumbnails or None,
+                )
+                return {"ok": True}
+
+            with profiling.span("email.attachments", "inline"):
+                attachments = await _build_image_attachments_for_consultation(consultation_id)
             if attachments is None:
                 # Fallback: too large for safe email size
                 await send_notification_email(
@@ -421,9 +745,433 @@ async def complete_consultation_image_upload(consultation_id: str, image_id: str
     return {"ok": True}
 
 
+INLINE_SUBMIT_MAX_IMAGES = int(os.environ.get("INLINE_SUBMIT_MAX_IMAGES", "6"))
+INLINE_SUBMIT_MAX_BYTES = int(os.environ.get("INLINE_SUBMIT_MAX_BYTES", str(12 * 1024 * 1024)))
+EMAIL_ATTACHMENT_MAX_BYTES = 18 * 1024 * 1024
+
+
+@api_router.post("/consultations/submit", response_model=Consultation)
+async def submit_consultation(request: Request):
+    # One-request alternative to create + init/chunk/complete per image, for
+    # small image sets: a multipart body with a `consultation` field (the
+    # ConsultationCreate JSON) and up to INLINE_SUBMIT_MAX_IMAGES `images`
+    # files. Everything is written in one batch per collection and a single
+    # email with the images attached is sent.
+    length = request.headers.get("content-length")
+    if not length or not length.isdigit():
+        raise HTTPException(status_code=411, detail="Content-Length required")
+    if int(length) > INLINE_SUBMIT_MAX_BYTES:
+        raise HTTPException(
+            status_code=413, detail="Request too large; upload images separately via /images/init"
+        )
+
+    form = await request.form(max_files=INLINE_SUBMIT_MAX_IMAGES, max_fields=10)
+    try:
+        raw = form.get("consultation")
+        if not isinstance(raw, str):
+            raise HTTPException(status_code=422, detail="Missing consultation field")
+        try:
+            input = ConsultationCreate.model_validate_json(raw)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+        obj = Consultation(**input.model_dump())
+        created_at = obj.created_at.isoformat()
+        images: List[dict] = []
+        for upload in form.getlist("images"):
+            if isinstance(upload, str):
+                continue
+            data = await upload.read()
+            if not data:
+                continue
+            if len(data) > MAX_IMAGE_BYTES:
+                raise HTTPException(status_code=400, detail="Image exceeds 2MB limit")
+            images.append(
+                {
+                    "id": str(uuid.uuid4()),
+                    "filename": upload.filename or "site-image.jpg",
+                    "content_type": upload.content_type,
+                    "data": data,
+                }
+            )
+    finally:
+        await form.close()
+
+    metas: List[dict] = []
+    chunk_docs: List[dict] = []
+    for img in images:
+        chunks = image_store.split_chunks(obj.id, img["id"], img["data"], RAW_UPLOAD_CHUNK_BYTES)
+        chunk_docs.extend(chunks)
+        metas.append(
+            {
+                "id": img["id"],
+                "consultation_id": obj.id,
+                "filename": img["filename"],
+                "size": len(img["data"]),
+                "content_type": img["content_type"],
+                "status": "complete",
+                "chunks": list(range(len(chunks))),
+                "total": len(chunks),
+                "received_bytes": len(img["data"]),
+                "created_at": created_at,
+                "completed_at": created_at,
+            }
+        )
+
+    # Image bytes and metadata first, so the consultation never points at
+    # images that are not there yet.
+    if chunk_docs:
+        await db[image_store.CHUNKS].insert_many(chunk_docs, ordered=False)
+        await db.consultation_images.insert_many(metas, ordered=False)
+    doc = obj.model_dump()
+    doc["created_at"] = created_at
+    if metas:
+        doc["image_ids"] = [m["id"] for m in metas]
+    await _store_consultation(doc)
+
+    try:
+        total_bytes = sum(len(img["data"]) for img in images)
+        links_html = ""
+        if images and _use_image_links(total_bytes):
+            with profiling.span("email.attachments", "links"):
+                links_html, attachments = await _build_image_links_for_consultation(
+                    obj.id, metas, {img["id"]: img["data"] for img in images}
+                )
+            footer = f"{len(images)} site images:"
+        elif total_bytes > EMAIL_ATTACHMENT_MAX_BYTES:
+            attachments = None
+            footer = f"{len(images)} site images were uploaded but are too large to attach; they are stored in the system."
+        else:
+            with profiling.span("email.attachments", "inline"):
+                attachments = [
+                    {
+                        "filename": img["filename"],
+                        "content": base64.b64encode(img["data"]).decode("utf-8"),
+                        "content_type": img["content_type"] or "application/octet-stream",
+                    }
+                    for img in images
+                ]
+            footer = f"{len(images)} site images attached." if images else None
+        n = _consultation_notification(obj, created_at, footer=footer)
+        await send_notification_email(
+            to_email="hello@rewind-ventures.com",
+            subject=n.subject,
+            html="<div style='font-family:Arial,sans-serif'>" + _render_notification(n) + links_html + "</div>",
+            reply_to=n.reply_to,
+            attachments=attachments or None,
+        )
+    except Exception as e:
+        logger.exception("Failed sending consultation email notification: %s", str(e))
+
+    return obj
+
+
+def _consultation_summary_pipeline(match: dict, limit: int) -> List[dict]:
+    # One round-trip: consultations joined with their image metadata (indexed on
+    # consultation_id). Byte totals come from the per-image `received_bytes`
+    # counter, falling back to the declared size, so chunks are never scanned.
+    return [
+        {"$match": match},
+        {"$sort": {"created_at": -1, "id": -1}},
+        {"$limit": limit},
+        {
+            "$lookup": {
+                "from": "consultation_images",
+                "localField": "id",
+                "foreignField": "consultation_id",
+                "as": "images",
+            }
+        },
+        {
+            "$addFields": {
+                "image_count": {"$size": "$images"},
+                "image_bytes": {
+                    "$sum": {
+                        "$map": {
+                            "input": "$images",
+                            "in": {"$ifNull": ["$$this.received_bytes", "$$this.size"]},
+                        }
+                    }
+                },
+                "images_complete": {
+                    "$size": {
+                        "$filter": {
+                            "input": "$images",
+                            "cond": {"$eq": ["$$this.status", "complete"]},
+                        }
+                    }
+                },
+            }
+        },
+        {"$project": {"_id": 0, "images": 0}},
+    ]
+
+
+def _summarize_consultation(doc: dict) -> dict:
+    if isinstance(doc.get("created_at"), str):
+        doc["created_at"] = datetime.fromisoformat(doc["created_at"])
+    count = doc.get("image_count", 0)
+    if count == 0:
+        doc["upload_status"] = "none"
+    elif doc.get("images_complete", 0) >= count:
+        doc["upload_status"] = "complete"
+    else:
+        doc["upload_status"] = "uploading"
+    return doc
+
+
+def _encode_cursor(created_at: str, doc_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at}|{doc_id}".encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, doc_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, doc_id
+
+
+def _iso_utc(dt: datetime) -> str:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).isoformat()
+
+
+@api_router.get("/consultations", response_model=ConsultationPage)
+async def list_consultations(
+    limit: int = Query(default=25, ge=1, le=100),
+    cursor: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    mode: Optional[Literal["single", "multi"]] = None,
+    sport: Optional[str] = None,
+):
+    match: dict = {}
+    created: dict = {}
+    if created_from:
+        created["$gte"] = _iso_utc(created_from)
+    if created_to:
+        created["$lt"] = _iso_utc(created_to)
+    if created:
+        match["created_at"] = created
+    if mode:
+        match["mode"] = mode
+    if sport:
+        match["sports.sport"] = sport
+    if cursor:
+        after_created, after_id = _decode_cursor(cursor)
+        match["$or"] = [
+            {"created_at": {"$lt": after_created}},
+            {"created_at": after_created, "id": {"$lt": after_id}},
+        ]
+
+    # Fetch one extra row to know whether another page exists.
+    with read_router.reading("consultations") as reads:
+        docs = await reads.consultations.aggregate(_consultation_summary_pipeline(match, limit + 1)).to_list(limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = _encode_cursor(last["created_at"], last["id"])
+
+    return {"items": [_summarize_consultation(d) for d in docs], "next_cursor": next_cursor}
+
+
+def _by_id_handles(route: str) -> list:
+    """Handles to try, in order, for a single record read by id on `route`.
+
+    A record created moments ago may not have reached a lagging secondary
+    yet, so a miss on a routed handle is retried on the primary.
+    """
+    reads = read_router.handle(route)
+    return [reads] if reads is read_router.primary else [reads, read_router.primary]
+
+
+async def _find_consultation(reads, consultation_id: str) -> Optional[dict]:
+    docs = await reads.consultations.aggregate(
+        _consultation_summary_pipeline({"id": consultation_id}, 1)
+    ).to_list(1)
+    if docs:
+        return docs[0]
+
+    # Old consultations are moved to the archive (see archive.py); their
+    # image metadata stays in consultation_images unless archival expired it.
+    doc = await archive.find_archived(reads, "consultations", consultation_id)
+    if doc is None:
+        return None
+    images = await reads.consultation_images.find(
+        {"consultation_id": consultation_id}, {"_id": 0, "status": 1, "size": 1, "received_bytes": 1}
+    ).to_list(1000)
+    doc["image_count"] = len(images)
+    doc["images_complete"] = sum(1 for img in images if img.get("status") == "complete")
+    doc["image_bytes"] = sum(int(img.get("received_bytes") or img.get("size") or 0) for img in images)
+    return doc
+
+
+@api_router.get("/consultations/{consultation_id}", response_model=ConsultationSummary)
+async def get_consultation(consultation_id: str):
+    with read_routing.tagged("consultations"):
+        for reads in _by_id_handles("consultations"):
+            doc = await _find_consultation(reads, consultation_id)
+            if doc is not None:
+                return _summarize_consultation(doc)
+    raise HTTPException(status_code=404, detail="Consultation not found")
+
+
+THUMBNAIL_MAX_PX = int(os.environ.get("THUMBNAIL_MAX_PX", "320"))
+
+# Signed links (see image_links.py). IMAGE_LINK_SECRET must be set, and the
+# same for every worker; without it emails attach images instead of linking.
+IMAGE_LINK_SECRET = os.environ.get("IMAGE_LINK_SECRET", "")
+image_link_signer = (
+    image_links.LinkSigner(
+        IMAGE_LINK_SECRET.encode(),
+        ttl=int(os.environ.get("IMAGE_LINK_TTL_SECONDS", str(14 * 24 * 3600))),
+    )
+    if IMAGE_LINK_SECRET
+    else None
+)
+# Image downloads without a valid signature are refused unless this is "0".
+IMAGE_DOWNLOADS_REQUIRE_SIGNATURE = os.environ.get("IMAGE_DOWNLOADS_REQUIRE_SIGNATURE", "1") == "1"
+# Customer site photos: only the browser may cache them, and only until the
+# link they were fetched with expires (see `_image_cache_control`).
+IMAGE_CACHE_CONTROL = os.environ.get("IMAGE_CACHE_CONTROL", "private")
+
+
+def _image_cache_control(request: Request) -> str:
+    if image_link_signer is None:
+        return f"{IMAGE_CACHE_CONTROL}, no-cache"
+    return f"{IMAGE_CACHE_CONTROL}, max-age={image_link_signer.max_age(request.query_params.get('expires'))}"
+
+
+def _check_image_link(request: Request) -> None:
+    expires = request.query_params.get("expires")
+    signature = request.query_params.get("signature")
+    if expires is None and signature is None and not IMAGE_DOWNLOADS_REQUIRE_SIGNATURE:
+        return
+    if image_link_signer is None or not image_link_signer.verify(request.url.path, expires, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired link")
+
+
+async def _get_complete_image_meta(consultation_id: str, image_id: str) -> tuple:
+    """The image's metadata and the handle to read its chunks from.
+
+    A secondary that has the image marked complete also has its chunks (they
+    are written first); one that lags behind a fresh upload is skipped by
+    retrying on the primary.
+    """
+    query = {"id": image_id, "consultation_id": consultation_id, "status": "complete"}
+    with read_router.reading("images") as reads:
+        meta = await reads.consultation_images.find_one(query, {"_id": 0, "chunks": 0})
+        if not meta and reads is not read_router.primary:
+            reads = read_router.primary
+            meta = await reads.consultation_images.find_one(query, {"_id": 0, "chunks": 0})
+    if not meta:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return meta, reads
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+@api_router.get("/consultations/{consultation_id}/images/{image_id}")
+async def download_consultation_image(consultation_id: str, image_id: str, request: Request):
+    _check_image_link(request)
+    meta, reads = await _get_complete_image_meta(consultation_id, image_id)
+
+    # Completed images never change, so the image id is a strong validator.
+    etag = f'"{image_id}"'
+    headers = {"ETag": etag, "Cache-Control": _image_cache_control(request), "Accept-Ranges": "bytes"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    with read_routing.tagged("images"):
+        size = await image_store.image_size(reads, meta)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range.strip() != etag:
+        range_header = None
+    try:
+        byte_range = image_store.parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    media_type = meta.get("content_type") or "application/octet-stream"
+    if byte_range is None:
+        return StreamingResponse(
+            read_routing.tagged_iter("images", image_store.iter_image_bytes(reads, image_id)),
+            media_type=media_type,
+            headers={**headers, "Content-Length": str(size)},
+        )
+
+    start, end = byte_range
+    return StreamingResponse(
+        read_routing.tagged_iter("images", image_store.iter_image_bytes(reads, image_id, start, end)),
+        status_code=206,
+        media_type=media_type,
+        headers={
+            **headers,
+            "Content-Range": f"bytes {start}-{end}/{size}",
+            "Content-Length": str(end - start + 1),
+        },
+    )
+
+
+@api_router.get("/consultations/{consultation_id}/images/{image_id}/thumbnail")
+async def download_consultation_image_thumbnail(consultation_id: str, image_id: str, request: Request):
+    _check_image_link(request)
+    _, reads = await _get_complete_image_meta(consultation_id, image_id)
+
+    etag = f'"{image_id}-thumb-{THUMBNAIL_MAX_PX}"'
+    headers = {"ETag": etag, "Cache-Control": _image_cache_control(request)}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        with read_routing.tagged("images"):
+            thumb = await _get_thumbnail(image_id, reads=reads)
+    except Exception as e:
+        logger.warning("Failed rendering thumbnail for image %s: %s", image_id, str(e))
+        raise HTTPException(status_code=415, detail="Image cannot be thumbnailed")
+
+    return Response(content=bytes(thumb["data"]), media_type=thumb["content_type"], headers=headers)
+
+
+async def _get_thumbnail(image_id: str, data: Optional[bytes] = None, reads=None) -> dict:
+    # Thumbnails are rendered once and cached next to the chunks.
+    reads = reads if reads is not None else db
+    thumb = await reads[image_store.THUMBNAILS].find_one(
+        {"image_id": image_id, "max_px": THUMBNAIL_MAX_PX}, {"_id": 0}
+    )
+    if thumb:
+        return thumb
+    if data is None:
+        data = await image_store.read_image(reads, image_id)
+    with profiling.span("thumbnail.render"):
+        thumb_data, content_type = await asyncio.to_thread(image_store.make_thumbnail, data, THUMBNAIL_MAX_PX)
+    thumb = {
+        "image_id": image_id,
+        "max_px": THUMBNAIL_MAX_PX,
+        "data": thumb_data,
+        "content_type": content_type,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    await db[image_store.THUMBNAILS].update_one(
+        {"image_id": image_id, "max_px": THUMBNAIL_MAX_PX}, {"$setOnInsert": thumb}, upsert=True
+    )
+    return thumb
+
+
 @api_router.get("/leads", response_model=List[Lead])
 async def list_leads(limit: int = Query(default=25, ge=1, le=100)):
-    leads = await db.leads.find({}, {"_id": 0}).sort("created_at", -1).to_list(limit)
+    with read_router.reading("leads") as reads:
+        leads = await reads.leads.find({}, {"_id": 0}).sort("created_at", -1).to_list(limit)
 
     for lead in leads:
         if isinstance(lead.get("created_at"), str):
@@ -432,18 +1180,44 @@ async def list_leads(limit: int = Query(default=25, ge=1, le=100)):
     return leads
 
 
+def _get_lead_feed():
+    global lead_feed
+    if lead_feed is None:
+        from lead_feed import LeadFeed
+
+        lead_feed = LeadFeed(db.leads, db.lead_tombstones, poll_interval=float(os.environ.get("LEAD_FEED_POLL_SECONDS", "2")))
+    return lead_feed
+
+
+@api_router.get("/leads/stream")
+async def stream_leads(request: Request):
+    # Server-Sent Events; reconnecting clients send Last-Event-ID to catch up.
+    return StreamingResponse(
+        _get_lead_feed().events(request.headers.get("last-event-id"), request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @api_router.patch("/leads/{lead_id}", response_model=Lead)
 async def update_lead(lead_id: str, input: LeadUpdate):
+    # Fetch the pre-image so the status rollups can move the lead between buckets.
     res = await db.leads.find_one_and_update(
         {"id": lead_id},
-        {"$set": {"status": input.status}},
+        {"$set": {"status": input.status, "updated_at": datetime.now(timezone.utc).isoformat()}},
         projection={"_id": 0},
-        return_document=ReturnDocument.AFTER,
+        return_document=ReturnDocument.BEFORE,
     )
 
     if not res:
         raise HTTPException(status_code=404, detail="Lead not found")
 
+    try:
+        await analytics_rollups.record_lead_status_change(db, res.get("status") or "new", input.status)
+    except Exception as e:
+        logger.exception("Failed updating lead rollups: %s", str(e))
+    res["status"] = input.status
+
     if isinstance(res.get("created_at"), str):
         res["created_at"] = datetime.fromisoformat(res["created_at"])
 
@@ -452,12 +1226,99 @@ async def update_lead(lead_id: str, input: LeadUpdate):
 
 @api_router.delete("/leads/{lead_id}")
 async def delete_lead(lead_id: str):
-    res = await db.leads.delete_one({"id": lead_id})
-    if res.deleted_count == 0:
+    res = await db.leads.find_one_and_delete({"id": lead_id}, projection={"_id": 0})
+    if not res:
         raise HTTPException(status_code=404, detail="Lead not found")
+
+    search_backend.remove("leads", lead_id)
+    try:
+        # Polling lead feeds (no change streams) in any worker pick this up.
+        from lead_feed import record_delete
+
+        await record_delete(db.lead_tombstones, lead_id)
+    except Exception as e:
+        logger.exception("Failed recording lead deletion: %s", str(e))
+    try:
+        await analytics_rollups.record_lead_deleted(db, res)
+    except Exception as e:
+        logger.exception("Failed updating lead rollups: %s", str(e))
     return {"ok": True}
 
+
+@api_router.get("/leads/{lead_id}", response_model=Lead)
+async def get_lead(lead_id: str):
+    with read_routing.tagged("leads"):
+        for reads in _by_id_handles("leads"):
+            lead = await reads.leads.find_one({"id": lead_id}, {"_id": 0})
+            if lead is None:
+                lead = await archive.find_archived(reads, "leads", lead_id)
+            if lead is not None:
+                return lead
+    raise HTTPException(status_code=404, detail="Lead not found")
+
+
+@api_router.get("/search", response_model=SearchPage)
+async def search_records(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Literal["leads", "consultations"] = "leads",
+    page: int = Query(default=1, ge=1, le=100),
+    limit: int = Query(default=25, ge=1, le=100),
+):
+    # Fetch one extra hit to know whether another page exists.
+    with read_routing.tagged("search"):  # the backend holds the "search" handle
+        docs = await search_backend.search(kind, q, (page - 1) * limit, limit + 1)
+    for doc in docs:
+        if isinstance(doc.get("created_at"), str):
+            doc["created_at"] = datetime.fromisoformat(doc["created_at"])
+    return {"kind": kind, "items": docs[:limit], "page": page, "has_more": len(docs) > limit}
+
+
+@api_router.get("/stats")
+async def get_stats():
+    with read_router.reading("stats") as reads:
+        return await analytics_rollups.read_stats(reads)
+
+
 # Add your routes to the router instead of directly to app
+def _require_profiling_access(request: Request) -> None:
+    if not PROFILING:
+        raise HTTPException(status_code=404, detail="Profiling disabled")
+    if PROFILING_TOKEN and request.headers.get("x-profile-token") != PROFILING_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+
+def _require_admin_token(request: Request) -> None:
+    # Unlike profiling, which is opt-in, these endpoints are always mounted,
+    # so without a token configured they refuse everyone.
+    if not PROFILING_TOKEN or request.headers.get("x-profile-token") != PROFILING_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@api_router.get("/admin/profiles")
+async def list_profiles(request: Request):
+    _require_profiling_access(request)
+    return {"items": profile_store.list()}
+
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, request: Request, limit: int = Query(default=40, ge=1, le=500)):
+    _require_profiling_access(request)
+    entry = profile_store.get(profile_id, limit)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return entry
+
+
+@api_router.get("/admin/read-routing")
+async def read_routing_metrics(request: Request):
+    _require_admin_token(request)
+    # Read commands per route, split by the role of the server that answered.
+    return {
+        "routes": read_router.describe(),
+        **(read_metrics.snapshot() if read_metrics is not None else {}),
+    }
+
+
 @api_router.get("/")
 async def root():
     return {"message": "Hello World"}
@@ -471,13 +1332,20 @@ async def create_status_check(input: StatusCheckCreate):
     doc = status_obj.model_dump()
     doc['timestamp'] = doc['timestamp'].isoformat()
     
-    _ = await db.status_checks.insert_one(doc)
+    if status_writer is None:
+        _ = await db.status_checks.insert_one(doc)
+    else:
+        try:
+            await status_writer.submit(doc)
+        except WriterOverloaded:
+            raise HTTPException(status_code=503, detail="Status writer overloaded", headers={"Retry-After": "1"})
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
 async def get_status_checks():
     # Exclude MongoDB's _id field from the query results
-    status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
+    with read_router.reading("status") as reads:
+        status_checks = await reads.status_checks.find({}, {"_id": 0}).to_list(1000)
     
     # Convert ISO string timestamps back to datetime objects
     for check in status_checks:
@@ -489,6 +1357,40 @@ async def get_status_checks():
 # Include the router in the main app
 app.include_router(api_router)
 
+# Per-worker budget for the image endpoints so upload bursts can't starve
+# lead submissions; over-budget requests get 503/429 with Retry-After.
+upload_admission = UploadAdmission(
+    max_requests=int(os.environ.get("UPLOAD_MAX_INFLIGHT_REQUESTS", "32")),
+    max_bytes=int(os.environ.get("UPLOAD_MAX_INFLIGHT_BYTES", str(32 * 1024 * 1024))),
+    per_consultation=int(os.environ.get("UPLOAD_MAX_PER_CONSULTATION", "4")),
+)
+if os.environ.get("UPLOAD_ADMISSION", "1") == "1":
+    app.add_middleware(
+        UploadAdmissionMiddleware,
+        admission=upload_admission,
+        retry_after=int(os.environ.get("UPLOAD_RETRY_AFTER_SECONDS", "1")),
+    )
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.environ.get("COMPRESSION_MIN_SIZE", "500")),
+    gzip_level=int(os.environ.get("GZIP_LEVEL", "6")),
+    brotli_quality=int(os.environ.get("BROTLI_QUALITY", "4")),
+    zstd_level=int(os.environ.get("ZSTD_LEVEL", "3")),
+)
+
+# Per-request deadlines, propagated to Motor (maxTimeMS/socket timeouts via
+# pymongo.timeout) and the email transport; overruns get a 504. 0 disables.
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get("REQUEST_TIMEOUT_SECONDS", "10"))
+UPLOAD_REQUEST_TIMEOUT_SECONDS = float(os.environ.get("UPLOAD_REQUEST_TIMEOUT_SECONDS", "120"))
+ROUTE_TIMEOUTS = [
+    ("GET", r"^/api/leads/stream$", None),  # long-lived SSE
+    ("*", r"^/api/consultations/[^/]+/images(/|$)", UPLOAD_REQUEST_TIMEOUT_SECONDS),
+    ("POST", r"^/api/consultations/submit$", UPLOAD_REQUEST_TIMEOUT_SECONDS),
+]
+if REQUEST_TIMEOUT_SECONDS > 0:
+    app.add_middleware(DeadlineMiddleware, default=REQUEST_TIMEOUT_SECONDS, routes=ROUTE_TIMEOUTS)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -497,13 +1399,120 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+if PROFILING:
+    app.add_middleware(
+        profiling.ProfilingMiddleware,
+        store=profile_store,
+        token=PROFILING_TOKEN,
+        sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", "0")),
+        slow_ms=float(os.environ["PROFILE_SLOW_MS"]) if os.environ.get("PROFILE_SLOW_MS") else None,
+    )
+
+# Outermost, so every log line written while handling a request (including
+# from the middlewares above) carries its X-Request-ID.
+app.add_middleware(CorrelationIdMiddleware)
+
+# Configure logging: records are queued and written by a background thread
+# (see structured_logging.py), so logging never blocks the event loop.
+configure_logging(
+    level=getattr(logging, os.environ.get("LOG_LEVEL", "info").upper(), logging.INFO),
+    fmt=os.environ.get("LOG_FORMAT", "json"),  # "json" | "text"
+    burst=int(os.environ.get("LOG_SAMPLE_BURST", "10")),
+    window=float(os.environ.get("LOG_SAMPLE_WINDOW_SECONDS", "60")),
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def connect_worker_clients():
+    global client, db, read_router, search_backend, status_writer, sheets_sync
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    # Command monitoring feeds Mongo spans to profiled requests and the read
+    # routing metrics; with both off no listener is registered at all.
+    listeners = [profiling.MongoSpanListener()] if PROFILING else []
+    if read_metrics is not None:
+        listeners.append(read_metrics)
+    client = AsyncIOMotorClient(mongo_url, event_listeners=listeners)
+    db = client[os.environ['DB_NAME']]
+    read_router = read_routing.ReadRouter(client, os.environ['DB_NAME'], READ_ROUTES)
+    search_backend = search.build_search_backend(
+        os.environ.get("SEARCH_BACKEND", "mongo"),
+        read_router.handle("search"),
+        refresh_interval=float(os.environ.get("SEARCH_MEMORY_REFRESH_SECONDS", "5")),
+    )
+    if STATUS_WRITE_MODE in ("buffered", "group_commit"):
+        status_writer = BufferedWriter(
+            db.status_checks,
+            max_batch=int(os.environ.get("STATUS_WRITE_MAX_BATCH", "500")),
+            flush_interval=float(os.environ.get("STATUS_WRITE_FLUSH_MS", "50")) / 1000,
+            max_queue=int(os.environ.get("STATUS_WRITE_MAX_QUEUE", "10000")),
+            wait_for_commit=STATUS_WRITE_MODE == "group_commit",
+        )
+        status_writer.start()
+    if os.environ.get("SHEETS_SYNC", "0") == "1" and os.environ.get("SHEETS_SYNC_URL"):
+        from sheets_sync import SheetsSync
+
+        sheets_sync = SheetsSync(
+            db,
+            os.environ["SHEETS_SYNC_URL"],
+            interval=float(os.environ.get("SHEETS_SYNC_INTERVAL_SECONDS", "30")),
+            batch_size=int(os.environ.get("SHEETS_SYNC_BATCH_SIZE", "200")),
+        )
+        sheets_sync.start()
+
+
+_index_task: Optional[asyncio.Task] = None
+
+
+async def ensure_indexes():
+    await asyncio.gather(
+        db.leads.create_index("id"),
+        db.leads.create_index("created_at"),
+        db.leads.create_index("updated_at", sparse=True),
+        db.consultations.create_index("id"),
+        db.consultations.create_index([("created_at", -1), ("id", -1)]),
+        db.consultations.create_index([("sports.sport", 1), ("created_at", -1)]),
+        db.consultation_images.create_index("id"),
+        db.consultation_images.create_index("consultation_id"),
+        db.consultation_image_chunks.create_index([("image_id", 1), ("index", 1)]),
+        db[image_store.THUMBNAILS].create_index([("image_id", 1), ("max_px", 1)]),
+        db.status_checks.create_index("timestamp"),
+        db.lead_tombstones.create_index("deleted_at"),
+        db.lead_tombstones.create_index("expire_at", expireAfterSeconds=0),
+        archive.ensure_archive_indexes(db),
+        search_backend.load(),
+    )
+
+
+async def _ensure_indexes_logged():
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        logger.exception("Failed ensuring indexes: %s", str(e))
+
+
+@app.on_event("startup")
+async def schedule_index_build():
+    # Index builds are idempotent round-trips to Mongo; run them in the
+    # background so they don't hold up the first response.
+    global _index_task
+    _index_task = asyncio.get_running_loop().create_task(_ensure_indexes_logged())
+
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    global email_transport, lead_feed
+    if _index_task is not None and not _index_task.done():
+        _index_task.cancel()
+    if lead_feed is not None:
+        await lead_feed.stop()
+        lead_feed = None
+    await notification_batcher.aclose()
+    if status_writer is not None:
+        await status_writer.stop()
+    if sheets_sync is not None:
+        await sheets_sync.stop()
+    client.close()
+    if email_transport is not None:
+        await email_transport.aclose()
+        email_transport = None
\ No newline at end of file
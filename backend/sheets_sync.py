@@ -0,0 +1,318 @@
+"""Batched Google Sheets sync for leads and consultations.
+
+Instead of the browser calling the Apps Script once per form submission,
+this worker appends new rows in one request per sheet per interval:
+
+    POST <script url>  {"sheet": "leads", "batch_id": "...", "rows": [[...], ...]}
+
+(see GOOGLE_SHEETS_SETUP.md for the matching Apps Script). A document is
+new until it carries `sheets_synced`, which is set only after the script
+confirms the append. Unlike tailing `created_at`, this also picks up a
+document that commits after newer ones were already synced. A batch is
+recorded as pending in `sync_checkpoints` before it is sent, so a failed or
+throttled write is retried with exactly the same rows, with exponential
+backoff. `batch_id` lets the script drop a batch it already appended when
+only the response was lost.
+
+Only one process writes at a time: the worker takes or renews a lease in
+`sync_checkpoints` before each append and each checkpoint write, and stops
+the round if another process holds it. The worker can therefore be enabled
+in every API worker (SHEETS_SYNC=1) or run on its own:
+
+    cd backend && python -m sheets_sync [--backfill]
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINTS = "sync_checkpoints"
+LEASE_ID = "sheets:lease"
+# Set on a document (to the sync time) once its row is in the sheet.
+SYNCED_FIELD = "sheets_synced"
+
+
+def _lead_row(doc: dict) -> list:
+    return [
+        doc.get("created_at", ""),
+        doc.get("name", ""),
+        doc.get("email", ""),
+        doc.get("company", ""),
+        doc.get("phone") or "",
+        doc.get("need", ""),
+        doc.get("source", ""),
+    ]
+
+
+def _consultation_row(doc: dict) -> list:
+    # The facility_type column holds the form's mode ("single" or "multi"),
+    # as the frontend's per-row submissions do.
+    sports = ", ".join(f"{s.get('sport')}: {s.get('courts')} courts" for s in doc.get("sports") or [])
+    return [
+        doc.get("created_at", ""),
+        doc.get("name", ""),
+        doc.get("email", ""),
+        doc.get("company", ""),
+        doc.get("details", ""),
+        doc.get("area_sqft") or "",
+        doc.get("mode", ""),
+        sports,
+        doc.get("facility_name", ""),
+        doc.get("google_maps_url", ""),
+        doc.get("source", ""),
+    ]
+
+
+# collection -> (sheet tab, row builder); columns match GOOGLE_SHEETS_SETUP.md
+SHEETS = {
+    "leads": ("leads", _lead_row),
+    "consultations": ("consultations", _consultation_row),
+}
+
+
+class SheetsSyncError(Exception):
+    """The script did not confirm the append; the batch will be retried."""
+
+
+class LeaseLost(Exception):
+    """Another process took the lease; this one stops writing."""
+
+
+class SheetsSync:
+    def __init__(
+        self,
+        db,
+        url: str,
+        *,
+        interval: float = 30.0,
+        batch_size: int = 200,
+        timeout: float = 30.0,
+        max_backoff: float = 600.0,
+        lease_seconds: Optional[float] = None,
+        backfill: bool = False,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.db = db
+        self.url = url
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.lease_seconds = lease_seconds or max(3 * interval, 60.0)
+        self.backfill = backfill
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._timeout = timeout
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self.failures = 0
+        self.appended = {name: 0 for name in SHEETS}
+        self.requests = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # Apps Script web apps answer with a redirect to the result.
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout, follow_redirects=True, transport=self._transport
+            )
+        return self._client
+
+    # -- lease and checkpoints ------------------------------------------
+
+    async def acquire_lease(self) -> bool:
+        now = time.time()
+        try:
+            await self.db[CHECKPOINTS].find_one_and_update(
+                {"_id": LEASE_ID, "$or": [{"expires_at": {"$lt": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "expires_at": now + self.lease_seconds}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # Someone else holds an unexpired lease.
+            return False
+        return True
+
+    async def _hold_lease(self) -> None:
+        if not await self.acquire_lease():
+            raise LeaseLost(f"Sheets sync lease is held by another process (not {self.owner})")
+
+    async def _checkpoint(self, collection: str) -> dict:
+        cp = await self.db[CHECKPOINTS].find_one({"_id": f"sheets:{collection}"})
+        if cp is None:
+            # First run: only documents created from now on, unless asked to
+            # push history.
+            cp = {"since": "" if self.backfill else datetime.now(timezone.utc).isoformat()}
+            await self.db[CHECKPOINTS].update_one(
+                {"_id": f"sheets:{collection}"}, {"$setOnInsert": cp}, upsert=True
+            )
+        return cp
+
+    async def ensure_indexes(self) -> None:
+        await asyncio.gather(*[
+            self.db[collection].create_index([(SYNCED_FIELD, 1), ("created_at", 1), ("id", 1)])
+            for collection in SHEETS
+        ])
+
+    # -- syncing --------------------------------------------------------
+
+    async def _append(self, sheet: str, batch_id: str, rows: List[list]) -> None:
+        self.requests += 1
+        try:
+            res = await self._get_client().post(self.url, json={"sheet": sheet, "batch_id": batch_id, "rows": rows})
+        except httpx.HTTPError as e:
+            raise SheetsSyncError(f"Sheets append failed: {e!r}") from e
+        if res.status_code >= 400:
+            raise SheetsSyncError(f"Sheets script returned {res.status_code}")
+        try:
+            body = res.json()
+        except ValueError:
+            raise SheetsSyncError("Sheets script returned a non-JSON response")
+        if not body.get("success"):
+            raise SheetsSyncError(f"Sheets script rejected batch: {body.get('error')}")
+
+    async def _next_batch(self, collection: str, cp: dict) -> tuple:
+        """(batch_id, ids, docs): the pending batch if any, else the next unsynced documents."""
+        projection = {"_id": 0, "search_prefixes": 0}
+        pending = cp.get("pending")
+        if pending:
+            by_id = {
+                doc["id"]: doc
+                async for doc in self.db[collection].find({"id": {"$in": pending["ids"]}}, projection)
+            }
+            return pending["batch_id"], pending["ids"], [by_id[i] for i in pending["ids"] if i in by_id]
+
+        query = {SYNCED_FIELD: {"$exists": False}}
+        if cp.get("since"):
+            query["created_at"] = {"$gte": cp["since"]}
+        docs = (
+            await self.db[collection]
+            .find(query, projection)
+            .sort([("created_at", 1), ("id", 1)])
+            .limit(self.batch_size)
+            .to_list(self.batch_size)
+        )
+        ids = [doc["id"] for doc in docs]
+        batch_id = hashlib.sha1("\n".join([collection, *ids]).encode()).hexdigest()
+        if docs:
+            await self._hold_lease()
+            await self.db[CHECKPOINTS].update_one(
+                {"_id": f"sheets:{collection}"}, {"$set": {"pending": {"batch_id": batch_id, "ids": ids}}}
+            )
+        return batch_id, ids, docs
+
+    async def sync_collection(self, collection: str) -> int:
+        """Append one batch of new documents; returns the number of rows."""
+        sheet, to_row = SHEETS[collection]
+        cp = await self._checkpoint(collection)
+        batch_id, ids, docs = await self._next_batch(collection, cp)
+        if not ids:
+            return 0
+        if docs:
+            await self._hold_lease()
+            await self._append(sheet, batch_id, [to_row(doc) for doc in docs])
+
+        await self._hold_lease()
+        now = datetime.now(timezone.utc).isoformat()
+        await self.db[collection].update_many({"id": {"$in": ids}}, {"$set": {SYNCED_FIELD: now}})
+        await self.db[CHECKPOINTS].update_one(
+            {"_id": f"sheets:{collection}"},
+            {"$unset": {"pending": ""}, "$set": {"last_batch_id": batch_id, "synced_at": now}},
+        )
+        self.appended[collection] += len(docs)
+        return len(docs)
+
+    async def sync_once(self) -> Dict[str, int]:
+        if not await self.acquire_lease():
+            return {}
+        results: Dict[str, int] = {}
+        try:
+            for collection in SHEETS:
+                results[collection] = await self.sync_collection(collection)
+        except LeaseLost as e:
+            # The lease expired mid-round (e.g. a slow append) and another
+            # process took it; a pending batch is left for it to resend.
+            logger.warning("Stopping sheets sync round: %s", str(e))
+        return results
+
+    async def run(self) -> None:
+        try:
+            await self.ensure_indexes()
+        except Exception as e:
+            logger.exception("Failed ensuring sheets sync indexes: %s", str(e))
+        while True:
+            try:
+                await self.sync_once()
+                self.failures = 0
+                delay = self.interval
+            except Exception as e:
+                self.failures += 1
+                delay = min(self.max_backoff, self.interval * 2 ** self.failures) * random.uniform(0.5, 1.0)
+                logger.warning("Sheets sync failed (attempt %d), retrying in %.0fs: %s", self.failures, delay, str(e))
+            await asyncio.sleep(delay)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pathlib import Path
+
+    load_dotenv(Path(__file__).parent / ".env")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Sync leads and consultations to Google Sheets")
+    parser.add_argument("--url", default=os.environ.get("SHEETS_SYNC_URL"))
+    parser.add_argument("--interval", type=float, default=float(os.environ.get("SHEETS_SYNC_INTERVAL_SECONDS", "30")))
+    parser.add_argument("--batch-size", type=int, default=int(os.environ.get("SHEETS_SYNC_BATCH_SIZE", "200")))
+    parser.add_argument("--backfill", action="store_true", help="on first run, push existing documents too")
+    parser.add_argument("--once", action="store_true", help="append one batch per sheet and exit")
+    args = parser.parse_args()
+    if not args.url:
+        parser.error("--url or SHEETS_SYNC_URL is required")
+
+    async def _main():
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        sync = SheetsSync(
+            client[os.environ["DB_NAME"]], args.url,
+            interval=args.interval, batch_size=args.batch_size, backfill=args.backfill,
+        )
+        try:
+            await sync.ensure_indexes()
+            if args.once:
+                print(await sync.sync_once())
+            else:
+                await sync.run()
+        finally:
+            await sync.stop()
+            client.close()
+
+    asyncio.run(_main())
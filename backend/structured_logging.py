@@ -0,0 +1,179 @@
+"""Logging that stays off the event loop.
+
+`configure_logging` routes every record through a `QueueHandler` to a
+`QueueListener` thread that formats and writes it. On the calling side a
+log call only merges the message arguments, stamps the current request id
+and enqueues the record; tracebacks are rendered and JSON is encoded on the
+listener thread.
+
+Repeated warnings and errors (same logger, message template and exception
+type) are sampled: the first `burst` per `window` seconds go through, the
+rest are counted and the count is reported on the next record that passes.
+
+`CorrelationIdMiddleware` gives each request an id (the incoming
+`X-Request-ID` if it looks sane, otherwise a fresh one), exposes it to log
+records through a context variable and echoes it in the response.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# LogRecord attributes that are not `extra=` fields.
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id", "suppressed"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            out["request_id"] = record.request_id
+        if getattr(record, "suppressed", 0):
+            out["suppressed"] = record.suppressed
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                out[key] = value
+        if record.exc_info:
+            out["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            out["exc_info"] = record.exc_text
+        if record.stack_info:
+            out["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(out, default=str)
+
+
+class ErrorSampler(logging.Filter):
+    """Let through the first `burst` repeats of a warning/error per window."""
+
+    def __init__(self, burst: int = 10, window: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._lock = threading.Lock()
+        # key -> (window start, seen in window, suppressed since last emitted)
+        self._seen: Dict[Tuple, Tuple[float, int, int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        exc_type = record.exc_info[0].__name__ if record.exc_info and record.exc_info[0] else None
+        key = (record.name, record.msg, exc_type)
+        now = time.monotonic()
+        with self._lock:
+            start, seen, suppressed = self._seen.get(key, (now, 0, 0))
+            if now - start >= self.window:
+                start, seen = now, 0
+            if seen >= self.burst:
+                self._seen[key] = (start, seen + 1, suppressed + 1)
+                return False
+            self._seen[key] = (start, seen + 1, 0)
+            if len(self._seen) > 10000:
+                self._seen.clear()
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class _LoopSafeQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike the stdlib version, keep exc_info and don't format here:
+        # the listener thread renders tracebacks and JSON. Only the message
+        # is merged now, since its arguments may change after we return.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        record.request_id = request_id_var.get()
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: int = logging.INFO, fmt: str = "json", burst: int = 10, window: float = 60.0) -> None:
+    """Route the root logger (and uvicorn's) through a background writer."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    q: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _LoopSafeQueueHandler(q)
+    handler.addFilter(ErrorSampler(burst=burst, window=window))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        lg = logging.getLogger(name)
+        lg.handlers = []
+        lg.propagate = True
+
+    _listener = logging.handlers.QueueListener(q, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._\-]{1,128}$")
+
+
+class CorrelationIdMiddleware:
+    def __init__(self, app: ASGIApp, header: str = "X-Request-ID"):
+        self.app = app
+        self.header = header
+        self._header_key = header.lower().encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for key, value in scope["headers"]:
+            if key == self._header_key:
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not _REQUEST_ID_RE.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[self.header] = request_id
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,96 @@
+import asyncio
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from admission import UploadAdmission, UploadAdmissionMiddleware
+
+
+pytestmark = pytest.mark.anyio
+
+
+def test_budgets():
+    admission = UploadAdmission(max_requests=3, max_bytes=100, per_consultation=2)
+    assert admission.try_acquire("a", 10) is None
+    assert admission.try_acquire("a", 10) is None
+    assert admission.try_acquire("a", 10) == 429
+    assert admission.try_acquire("b", 90) == 503  # over the byte budget
+    assert admission.try_acquire(None, 10) is None
+    assert admission.try_acquire("b", 10) == 503  # over the request budget
+    admission.release("a", 10)
+    assert admission.try_acquire("a", 10) is None
+    assert admission.rejected == {429: 1, 503: 2}
+
+
+def test_one_oversized_request_is_admitted_when_idle():
+    admission = UploadAdmission(max_bytes=100)
+    assert admission.try_acquire("a", 500) is None
+    admission.release("a", 500)
+    assert (admission.requests, admission.bytes, dict(admission.by_consultation)) == (0, 0, {})
+
+
+@pytest.fixture
+def gated():
+    """An app whose handlers block until `gate` is set, behind admission."""
+    gate = asyncio.Event()
+
+    async def handler(request):
+        await request.body()
+        await gate.wait()
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[
+        Route("/api/consultations/{cid}/images/{rest:path}", handler, methods=["GET", "PUT", "POST"]),
+        Route("/api/consultations/submit", handler, methods=["POST"]),
+        Route("/api/leads", handler, methods=["POST"]),
+    ])
+    admission = UploadAdmission(max_requests=4, per_consultation=2)
+    app = UploadAdmissionMiddleware(app, admission, retry_after=3)
+    return app, admission, gate
+
+
+async def test_middleware_rejects_over_budget_uploads_only(gated):
+    app, admission, gate = gated
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        held = [
+            asyncio.create_task(c.put("/api/consultations/a/images/1", content=b"x")),
+            asyncio.create_task(c.post("/api/consultations/a/images/2/chunk", content=b"x")),
+        ]
+        while admission.requests < 2:
+            await asyncio.sleep(0)
+
+        r = await c.put("/api/consultations/a/images/3", content=b"x")
+        assert r.status_code == 429
+        assert r.headers["retry-after"] == "3"
+
+        # Downloads, thumbnails and other endpoints bypass admission.
+        gate.set()
+        for path in ("/api/consultations/a/images/1", "/api/consultations/a/images/1/thumbnail"):
+            assert (await c.get(path)).status_code == 200
+        assert (await c.post("/api/leads", content=b"x")).status_code == 200
+        assert [t.status_code for t in await asyncio.gather(*held)] == [200, 200]
+    assert admission.requests == 0 and admission.bytes == 0
+
+
+async def test_downloads_are_not_counted(gated):
+    app, admission, gate = gated
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        downloads = [asyncio.create_task(c.get(f"/api/consultations/a/images/{n}")) for n in range(6)]
+        await asyncio.sleep(0.01)
+        assert admission.requests == 0
+        gate.set()
+        assert {r.status_code for r in await asyncio.gather(*downloads)} == {200}
+
+
+async def test_submissions_count_against_the_global_budget(gated):
+    app, admission, gate = gated
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        held = [asyncio.create_task(c.post("/api/consultations/submit", content=b"x")) for _ in range(4)]
+        while admission.requests < 4:
+            await asyncio.sleep(0)
+        assert (await c.put("/api/consultations/b/images/1", content=b"x")).status_code == 503
+        gate.set()
+        await asyncio.gather(*held)
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import analytics_rollups as rollups
+import archive
+
+
+pytestmark = pytest.mark.anyio
+
+OLD = "2024-01-05T10:00:00+00:00"
+NEW = "2026-06-01T10:00:00+00:00"
+
+
+def lead(i, created_at=NEW, **fields):
+    return {"id": f"lead-{i}", "created_at": created_at, "source": "landing_form", "status": "new", **fields}
+
+
+def consultation(i, created_at=NEW, sports=("padel",)):
+    return {
+        "id": f"c-{i}",
+        "created_at": created_at,
+        "mode": "single",
+        "sports": [{"sport": s, "courts": 1} for s in sports],
+    }
+
+
+async def seed(db, leads=(), consultations=()):
+    for doc in leads:
+        await db.leads.insert_one(dict(doc))
+        await rollups.record_lead_created(db, doc)
+    for doc in consultations:
+        await db.consultations.insert_one(dict(doc))
+        await rollups.record_consultation_created(db, doc)
+
+
+async def test_incremental_counts(db):
+    await seed(db, [lead(1), lead(2, source="referral")], [consultation(1, sports=("padel", "tennis"))])
+    await rollups.record_lead_status_change(db, "new", "contacted")
+    await rollups.record_lead_deleted(db, lead(2, source="referral"))
+
+    stats = await rollups.read_stats(db)
+    assert stats["leads"]["source"] == {"landing_form": 1}
+    assert stats["leads"]["status"] == {"contacted": 1}
+    assert stats["leads"]["day"] == {"2026-06-01": 1}
+    assert stats["consultations"]["sport"] == {"padel": 1, "tennis": 1}
+
+
+async def test_rebuild_matches_incremental_and_drops_drifted_buckets(db):
+    await seed(db, [lead(1), lead(2, status="closed")], [consultation(1)])
+    before = await rollups.read_stats(db)
+    await db[rollups.ROLLUPS].insert_one({"_id": "leads:source:ghost", "kind": "leads", "dim": "source", "key": "ghost", "count": 3})
+
+    await rollups.rebuild_rollups(db)
+
+    assert await rollups.read_stats(db) == before
+
+
+async def test_rebuild_keeps_archived_records(db):
+    await seed(
+        db,
+        [lead(1, OLD, status="closed"), lead(2, OLD, status="closed"), lead(3)],
+        [consultation(1, OLD), consultation(2)],
+    )
+    before = await rollups.read_stats(db)
+    cutoff = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    assert await archive.archive_collection(db, "leads", cutoff) == 2
+    assert await archive.archive_collection(db, "consultations", cutoff) == 1
+
+    await rollups.rebuild_rollups(db)
+
+    assert await rollups.read_stats(db) == before
+
+
+async def test_record_both_hot_and_archived_is_counted_once(db):
+    await seed(db, [lead(1, OLD, status="closed")])
+    await archive.archive_collection(db, "leads", datetime.now(timezone.utc) + timedelta(days=1))
+    # Archival interrupted before its delete: the hot copy is still there.
+    await db.leads.insert_one(lead(1, OLD, status="closed"))
+
+    await rollups.rebuild_rollups(db)
+
+    assert (await rollups.read_stats(db))["leads"]["status"] == {"closed": 1}
+
+
+async def test_rebuilds_are_not_exposed_over_http(api):
+    # Full rebuilds scan every source collection; they run from the CLI only.
+    assert (await api.post("/api/stats/rebuild")).status_code in (404, 405)
@@ -0,0 +1,106 @@
+import pytest
+
+import archive
+from tests.conftest import IMAGE_DATA, create, signed, upload
+
+
+pytestmark = pytest.mark.anyio
+
+OLD = "2024-01-05T10:00:00+00:00"
+NEW = "2099-01-01T10:00:00+00:00"
+
+
+def lead(i, created_at=OLD, status="closed"):
+    return {
+        "id": f"lead-{i}",
+        "name": f"Lead {i}",
+        "company": "Arena",
+        "email": "a@example.com",
+        "need": "courts",
+        "source": "landing_form",
+        "status": status,
+        "created_at": created_at,
+        "search_prefixes": ["le", "lea"],
+    }
+
+
+async def run(db, collection="leads", batch_size=archive.BATCH_SIZE, expire_images=False):
+    return (await archive.run_archival(db, {collection: 90}, batch_size, expire_images))[collection]
+
+
+async def test_moves_only_old_finished_records_in_batches(db):
+    await db.leads.insert_many(
+        [lead(i) for i in range(5)] + [lead("open", status="new"), lead("recent", created_at=NEW)]
+    )
+    assert await run(db, batch_size=2) == 5
+    assert sorted(d["id"] for d in await db.leads.find().to_list(None)) == ["lead-open", "lead-recent"]
+
+    batches = await db.leads_archive.find().to_list(None)
+    assert [b["count"] for b in batches] == [2, 2, 1]
+    assert [i for b in batches for i in b["ids"]] == [f"lead-{i}" for i in range(5)]
+    assert all(b["codec"] in ("zstd", "zlib") and b["raw_bytes"] > len(b["data"]) for b in batches)
+
+
+async def test_archived_records_can_be_found_without_derived_fields(db):
+    await db.leads.insert_many([lead(1), lead(2)])
+    await run(db)
+    doc = await archive.find_archived(db, "leads", "lead-2")
+    assert doc["name"] == "Lead 2"
+    assert "_id" not in doc and "search_prefixes" not in doc
+    assert await archive.find_archived(db, "leads", "lead-3") is None
+    assert [[d["id"] for d in docs] async for docs in archive.iter_archived(db, "leads")] == [["lead-1", "lead-2"]]
+
+
+async def test_rerun_after_an_interrupted_delete_is_idempotent(db):
+    await db.leads.insert_many([lead(1), lead(2)])
+    await run(db)
+    # As if the previous run died after writing the batch but before deleting.
+    await db.leads.insert_many([lead(1), lead(2)])
+    assert await run(db) == 2
+    assert await db.leads_archive.count_documents({}) == 1
+    assert await db.leads.count_documents({}) == 0
+
+
+async def test_zlib_fallback(db, monkeypatch):
+    monkeypatch.setattr(archive, "zstandard", None)
+    await db.status_checks.insert_one({"id": "s1", "client_name": "a", "timestamp": OLD})
+    assert await run(db, "status_checks") == 1
+    assert (await db.status_checks_archive.find_one())["codec"] == "zlib"
+    assert (await archive.find_archived(db, "status_checks", "s1"))["client_name"] == "a"
+
+
+async def test_api_reads_fall_back_to_the_archive(api, db):
+    r = await api.post("/api/leads", json={k: lead(1)[k] for k in ("name", "company", "email", "need")})
+    lead_id = r.json()["id"]
+    await api.patch(f"/api/leads/{lead_id}", json={"status": "closed"})
+    cid = await create(api)
+    await db.leads.update_many({}, {"$set": {"created_at": OLD}})
+    await db.consultations.update_many({}, {"$set": {"created_at": OLD}})
+
+    assert await run(db) == 1
+    assert await run(db, "consultations") == 1
+
+    assert (await api.get(f"/api/leads/{lead_id}")).json()["status"] == "closed"
+    consultation = (await api.get(f"/api/consultations/{cid}")).json()
+    assert (consultation["id"], consultation["upload_status"]) == (cid, "none")
+    assert (await api.get("/api/leads/missing")).status_code == 404
+
+
+async def test_images_stay_hot_unless_expired(api, db):
+    kept, expired = await create(api), await create(api)
+    kept_image = await upload(api, kept, IMAGE_DATA)
+    expired_image = await upload(api, expired, IMAGE_DATA)
+    await db.consultation_image_thumbnails.insert_one({"image_id": expired_image, "max_px": 1})
+
+    await db.consultations.update_one({"id": kept}, {"$set": {"created_at": OLD}})
+    assert await run(db, "consultations") == 1
+    r = await api.get(signed(f"/api/consultations/{kept}/images/{kept_image}"))
+    assert r.content == IMAGE_DATA
+    assert (await api.get(f"/api/consultations/{kept}")).json()["image_count"] == 1
+
+    await db.consultations.update_one({"id": expired}, {"$set": {"created_at": OLD}})
+    assert await run(db, "consultations", expire_images=True) == 1
+    assert await db.consultation_images.distinct("id") == [kept_image]
+    assert await db.consultation_image_chunks.distinct("image_id") == [kept_image]
+    assert await db.consultation_image_thumbnails.count_documents({}) == 0
+    assert (await api.get(f"/api/consultations/{expired}")).json()["image_count"] == 0
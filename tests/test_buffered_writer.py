@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from buffered_writer import BufferedWriter, WriterOverloaded
+
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeCollection:
+    def __init__(self, fail_index=None):
+        self.batches = []
+        self.fail_index = fail_index
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def insert_many(self, docs, ordered=True):
+        assert ordered is False
+        await self.release.wait()
+        self.batches.append(docs)
+        if self.fail_index is not None:
+            raise BulkWriteError({"writeErrors": [{"index": self.fail_index, "code": 11000}]})
+
+
+async def test_max_batch_flushes_without_waiting_for_the_interval():
+    coll = FakeCollection()
+    writer = BufferedWriter(coll, max_batch=3, flush_interval=60, wait_for_commit=True)
+    writer.start()
+    await asyncio.wait_for(asyncio.gather(*[writer.submit({"n": i}) for i in range(3)]), 1)
+    assert coll.batches == [[{"n": 0}, {"n": 1}, {"n": 2}]]
+    await writer.stop()
+
+
+async def test_interval_flushes_a_partial_batch():
+    coll = FakeCollection()
+    writer = BufferedWriter(coll, max_batch=100, flush_interval=0.01, wait_for_commit=True)
+    writer.start()
+    await asyncio.wait_for(writer.submit({"n": 1}), 1)
+    assert coll.batches == [[{"n": 1}]]
+    assert (writer.batches, writer.written) == (1, 1)
+    await writer.stop()
+
+
+async def test_without_wait_for_commit_submit_returns_once_queued():
+    coll = FakeCollection()
+    coll.release.clear()
+    writer = BufferedWriter(coll, flush_interval=0.01)
+    writer.start()
+    await asyncio.wait_for(writer.submit({"n": 1}), 1)
+    assert coll.batches == []
+    coll.release.set()
+    await writer.stop()
+    assert coll.batches == [[{"n": 1}]]
+
+
+async def test_write_errors_fail_only_their_documents():
+    writer = BufferedWriter(FakeCollection(fail_index=1), max_batch=3, flush_interval=60, wait_for_commit=True)
+    writer.start()
+    results = await asyncio.gather(*[writer.submit({"n": i}) for i in range(3)], return_exceptions=True)
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], BulkWriteError)
+    assert writer.written == 2
+    await writer.stop()
+
+
+async def test_full_queue_raises_overloaded():
+    coll = FakeCollection()
+    coll.release.clear()
+    writer = BufferedWriter(coll, max_batch=1, max_queue=1, flush_interval=0, enqueue_timeout=0.01)
+    writer.start()
+    await writer.submit({"n": 0})  # taken by the flusher, blocked in insert_many
+    await asyncio.sleep(0.01)
+    await writer.submit({"n": 1})  # fills the queue
+    with pytest.raises(WriterOverloaded):
+        await writer.submit({"n": 2})
+    coll.release.set()
+    await writer.stop()
+    assert coll.batches == [[{"n": 0}], [{"n": 1}]]
+
+
+async def test_stop_writes_everything_queued(db):
+    writer = BufferedWriter(db.status_checks, max_batch=2, flush_interval=60)
+    for i in range(5):
+        await writer.submit({"n": i})
+    await writer.stop()
+    assert sorted(d["n"] for d in await db.status_checks.find().to_list(None)) == list(range(5))
+
+
+async def test_status_endpoint_sheds_load_with_503(api, monkeypatch):
+    import server
+
+    # Never started, so the first status fills the queue until shutdown.
+    writer = BufferedWriter(FakeCollection(), max_queue=1, enqueue_timeout=0.01)
+    monkeypatch.setattr(server, "status_writer", writer)
+    assert (await api.post("/api/status", json={"client_name": "a"})).status_code == 200
+    r = await api.post("/api/status", json={"client_name": "b"})
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "1"
@@ -0,0 +1,93 @@
+import gzip
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import compression
+from compression import CompressionMiddleware, negotiate
+
+
+pytestmark = pytest.mark.anyio
+
+BIG = "lead,company,need\n" * 200
+
+
+def test_negotiate_prefers_zstd_then_br_then_gzip():
+    available = ["zstd", "br", "gzip"]
+    assert negotiate("gzip, br, zstd", available) == "zstd"
+    assert negotiate("gzip, br", available) == "br"
+    assert negotiate("gzip;q=0.5", available) == "gzip"
+    assert negotiate("zstd;q=0, gzip", available) == "gzip"
+    assert negotiate("*", available) == "zstd"
+    assert negotiate("identity", available) is None
+    assert negotiate("", available) is None
+
+
+async def stream():
+    for _ in range(3):
+        yield BIG
+
+
+def make_app(**kwargs):
+    app = Starlette(routes=[
+        Route("/big", lambda r: PlainTextResponse(BIG)),
+        Route("/small", lambda r: PlainTextResponse("ok")),
+        Route("/image", lambda r: Response(b"\xff" * 4000, media_type="image/jpeg")),
+        Route("/stream", lambda r: StreamingResponse(stream(), media_type="text/csv")),
+        Route("/partial", lambda r: PlainTextResponse(BIG, status_code=206, headers={"Content-Range": f"bytes 0-{len(BIG) - 1}/9999"})),
+        Route("/events", lambda r: StreamingResponse(stream(), media_type="text/event-stream")),
+    ])
+    return CompressionMiddleware(app, **kwargs)
+
+
+async def get(path, accept_encoding, **kwargs):
+    """The response with `raw` set to the body as sent, before httpx decodes it."""
+    transport = httpx.ASGITransport(app=make_app(**kwargs))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as r:
+            r.raw = b"".join([chunk async for chunk in r.aiter_raw()])
+        return r
+
+
+def decode(encoding, data):
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "br":
+        return compression.brotli.decompress(data)
+    return compression.zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+@pytest.mark.parametrize("encoding", compression.available_encodings())
+@pytest.mark.parametrize("path, expected", [("/big", BIG), ("/stream", BIG * 3)], ids=["buffered", "streamed"])
+async def test_round_trip(encoding, path, expected):
+    r = await get(path, encoding)
+    assert r.headers["content-encoding"] == encoding
+    assert "Accept-Encoding" in r.headers["vary"]
+    assert len(r.raw) < len(expected)
+    assert decode(encoding, r.raw).decode() == expected
+    if path == "/big":
+        assert int(r.headers["content-length"]) == len(r.raw)
+    else:
+        assert "content-length" not in r.headers
+
+
+async def test_small_bodies_are_sent_as_is():
+    r = await get("/small", "gzip")
+    assert "content-encoding" not in r.headers
+    assert "Accept-Encoding" in r.headers["vary"]
+    assert r.raw == b"ok"
+
+
+@pytest.mark.parametrize("path", ["/image", "/events", "/partial"])
+async def test_images_event_streams_and_ranges_pass_through(path):
+    r = await get(path, "gzip")
+    assert "content-encoding" not in r.headers
+
+
+async def test_no_accepted_encoding_passes_through():
+    r = await get("/big", "identity")
+    assert "content-encoding" not in r.headers
+    assert r.raw == BIG.encode()
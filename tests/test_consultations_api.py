@@ -0,0 +1,65 @@
+import pytest
+
+from tests.conftest import create
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_list_pages_newest_first_with_keyset_cursor(api):
+    ids = [await create(api, name=f"c{i}") for i in range(5)]
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = (await api.get("/api/consultations", params=params)).json()
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == list(reversed(ids))
+
+
+async def test_list_filters_by_mode_and_sport(api):
+    await create(api)
+    multi = await create(api, mode="multi", sports=[{"sport": "tennis", "courts": 4}])
+    items = (await api.get("/api/consultations", params={"mode": "multi"})).json()["items"]
+    assert [i["id"] for i in items] == [multi]
+    items = (await api.get("/api/consultations", params={"sport": "tennis"})).json()["items"]
+    assert [i["id"] for i in items] == [multi]
+
+
+async def test_invalid_cursor_is_rejected(api):
+    r = await api.get("/api/consultations", params={"cursor": "%%%"})
+    assert r.status_code == 400
+
+
+async def test_get_summarizes_images(api):
+    cid = await create(api)
+    assert (await api.get(f"/api/consultations/{cid}")).json()["upload_status"] == "none"
+
+    image_ids = []
+    for size in (10, 20):
+        r = await api.post(
+            f"/api/consultations/{cid}/images/init",
+            json={"filename": "a.jpg", "size": size, "content_type": "image/jpeg"},
+        )
+        image_ids.append(r.json()["image_id"])
+    r = await api.post(
+        f"/api/consultations/{cid}/images/{image_ids[0]}/chunk",
+        files={"chunk": ("a.jpg", b"0123456789")},
+        data={"index": "0", "total": "1"},
+    )
+    assert r.status_code == 200
+    assert (await api.post(f"/api/consultations/{cid}/images/{image_ids[0]}/complete")).status_code == 200
+
+    summary = (await api.get(f"/api/consultations/{cid}")).json()
+    assert summary["image_count"] == 2
+    assert summary["images_complete"] == 1
+    # image_bytes is not checked: mongomock evaluates $sum over an array
+    # expression to 0.
+    assert summary["upload_status"] == "uploading"
+
+
+async def test_get_unknown_consultation_is_404(api):
+    assert (await api.get("/api/consultations/nope")).status_code == 404
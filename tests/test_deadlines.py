@@ -0,0 +1,107 @@
+import asyncio
+
+import httpx
+import pytest
+from pymongo.errors import AutoReconnect, NetworkTimeout
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+import deadlines
+from deadlines import DeadlineMiddleware
+
+
+pytestmark = pytest.mark.anyio
+
+
+def test_timeout_for_uses_the_first_matching_route():
+    middleware = DeadlineMiddleware(None, default=10.0, routes=[
+        ("POST", r"^/api/uploads/", 60.0),
+        ("*", r"^/api/uploads/slow", 1.0),
+        ("GET", r"^/api/stream", None),
+    ])
+    assert middleware.timeout_for("POST", "/api/uploads/slow") == 60.0
+    assert middleware.timeout_for("PUT", "/api/uploads/slow") == 1.0
+    assert middleware.timeout_for("GET", "/api/stream") is None
+    assert middleware.timeout_for("POST", "/api/stream") == 10.0
+    assert DeadlineMiddleware(None, default=None).timeout_for("GET", "/") is None
+
+
+def client(*routes, timeout=0.05):
+    # Installed like server.py does: inside Starlette's error handling.
+    app = Starlette(routes=list(routes), middleware=[
+        Middleware(DeadlineMiddleware, default=timeout, routes=[("*", r"^/free$", None)], grace=0.05),
+    ])
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def test_remaining_inside_and_outside_a_request():
+    seen = {}
+
+    async def handler(request):
+        seen[request.url.path] = deadlines.remaining()
+        return JSONResponse({})
+
+    async with client(Route("/timed", handler), Route("/free", handler), timeout=5.0) as c:
+        await c.get("/timed")
+        await c.get("/free")
+    assert 4.0 < seen["/timed"] <= 5.0
+    assert seen["/free"] is None
+    assert deadlines.remaining() is None
+
+
+async def test_slow_handler_gets_504():
+    cancelled = asyncio.Event()
+
+    async def handler(request):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return JSONResponse({})
+
+    async with client(Route("/slow", handler)) as c:
+        r = await c.get("/slow")
+    assert r.status_code == 504
+    assert r.json() == {"detail": "Request deadline exceeded"}
+    assert cancelled.is_set()
+
+
+async def test_mongo_timeout_becomes_504():
+    async def handler(request):
+        raise NetworkTimeout("operation exceeded time limit")
+
+    async with client(Route("/mongo", handler)) as c:
+        r = await c.get("/mongo")
+    assert r.status_code == 504
+
+
+async def test_other_mongo_errors_propagate():
+    async def handler(request):
+        raise AutoReconnect("primary stepped down")
+
+    async with client(Route("/mongo", handler)) as c:
+        with pytest.raises(AutoReconnect):
+            await c.get("/mongo")
+
+
+async def test_started_response_is_not_replaced():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"first", "more_body": True})
+        await asyncio.sleep(10)
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = DeadlineMiddleware(app, default=0.05, grace=0.05)
+    await middleware({"type": "http", "method": "GET", "path": "/stream"}, receive, send)
+    assert [m.get("status") for m in sent if m["type"] == "http.response.start"] == [200]
+    assert [m["body"] for m in sent if m["type"] == "http.response.body"] == [b"first"]
@@ -0,0 +1,227 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import deadlines
+from email_transport import CircuitBreaker, CircuitOpenError, EmailTransportError, ResendTransport
+
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(threshold=3, reset=30.0):
+    clock = Clock()
+    return CircuitBreaker(failure_threshold=threshold, reset_timeout=reset, clock=clock), clock
+
+
+# -- CircuitBreaker --------------------------------------------------------
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker, _ = make_breaker(threshold=3)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_success_resets_failure_count():
+    breaker, _ = make_breaker(threshold=3)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_breaker_half_open_lets_one_trial_through():
+    breaker, clock = make_breaker(threshold=1, reset=30.0)
+    breaker.record_failure()
+    clock.now = 29.9
+    assert not breaker.allow()
+    clock.now = 30.0
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_breaker_successful_trial_closes():
+    breaker, clock = make_breaker(threshold=1)
+    breaker.record_failure()
+    clock.now = 30.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_breaker_failed_trial_reopens_for_a_full_timeout():
+    breaker, clock = make_breaker(threshold=5, reset=30.0)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now = 30.0
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now = 59.9
+    assert not breaker.allow()
+    clock.now = 60.0
+    assert breaker.allow()
+
+
+# -- ResendTransport -------------------------------------------------------
+
+def resend(handler, **kwargs):
+    return ResendTransport("re_test", transport=httpx.MockTransport(handler), **kwargs)
+
+
+async def test_send_posts_to_resend_with_api_key():
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json={"id": "email-1"})
+
+    transport = resend(handler)
+    try:
+        assert await transport.send({"to": ["a@example.com"], "subject": "s"}) == {"id": "email-1"}
+        await transport.send({"to": ["b@example.com"], "subject": "s"})
+    finally:
+        await transport.aclose()
+    assert seen[0].url == "https://api.resend.com/emails"
+    assert seen[0].headers["authorization"] == "Bearer re_test"
+    assert b'"a@example.com"' in seen[0].content
+    assert len(seen) == 2
+
+
+async def test_server_errors_open_the_breaker_without_further_calls():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503, text="unavailable")
+
+    transport = resend(handler, breaker=CircuitBreaker(failure_threshold=2))
+    try:
+        for _ in range(2):
+            with pytest.raises(EmailTransportError):
+                await transport.send({})
+        with pytest.raises(CircuitOpenError):
+            await transport.send({})
+    finally:
+        await transport.aclose()
+    assert len(calls) == 2
+
+
+async def test_rejected_message_does_not_count_as_provider_failure():
+    transport = resend(lambda request: httpx.Response(422, text="bad"), breaker=CircuitBreaker(failure_threshold=1))
+    try:
+        for _ in range(3):
+            with pytest.raises(EmailTransportError, match="rejected"):
+                await transport.send({})
+    finally:
+        await transport.aclose()
+    assert transport.breaker.state == "closed"
+
+
+async def test_network_error_counts_as_failure():
+    def handler(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    transport = resend(handler, breaker=CircuitBreaker(failure_threshold=1))
+    try:
+        with pytest.raises(EmailTransportError):
+            await transport.send({})
+    finally:
+        await transport.aclose()
+    assert transport.breaker.state == "open"
+
+
+def half_open_breaker():
+    breaker, clock = make_breaker(threshold=1)
+    breaker.record_failure()
+    clock.now = 30.0
+    return breaker
+
+
+async def test_expired_deadline_does_not_take_the_trial():
+    calls = []
+    transport = resend(lambda request: calls.append(request) or httpx.Response(200, json={}), breaker=half_open_breaker())
+    token = deadlines._deadline_var.set(time.monotonic() - 1)
+    try:
+        with pytest.raises(EmailTransportError, match="deadline"):
+            await transport.send({})
+    finally:
+        deadlines._deadline_var.reset(token)
+        await transport.aclose()
+    assert calls == []
+    assert transport.breaker.state == "half_open"
+    assert transport.breaker.allow()
+
+
+async def test_deadline_timeout_releases_the_trial_without_a_verdict():
+    def handler(request):
+        raise httpx.ReadTimeout("slow", request=request)
+
+    transport = resend(handler, breaker=half_open_breaker())
+    token = deadlines._deadline_var.set(time.monotonic() + 1.0)
+    try:
+        with pytest.raises(EmailTransportError, match="timed out"):
+            await transport.send({})
+    finally:
+        deadlines._deadline_var.reset(token)
+        await transport.aclose()
+    assert transport.breaker.state == "half_open"
+    assert transport.breaker.allow()
+
+
+async def test_provider_timeout_fails_the_trial():
+    def handler(request):
+        raise httpx.ReadTimeout("slow", request=request)
+
+    transport = resend(handler, breaker=half_open_breaker())
+    try:
+        with pytest.raises(EmailTransportError, match="timed out"):
+            await transport.send({})
+    finally:
+        await transport.aclose()
+    assert transport.breaker.state == "open"
+
+
+async def test_cancelled_trial_is_released():
+    started = asyncio.Event()
+
+    async def handler(request):
+        started.set()
+        await asyncio.Event().wait()
+
+    transport = resend(handler, breaker=half_open_breaker())
+    try:
+        task = asyncio.create_task(transport.send({}))
+        await started.wait()
+        assert not transport.breaker.allow()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    finally:
+        await transport.aclose()
+    assert transport.breaker.state == "half_open"
+    assert transport.breaker.allow()
+
+
+def test_http2_is_enabled_with_h2_installed():
+    pytest.importorskip("h2")
+    assert resend(lambda request: httpx.Response(200))._http2
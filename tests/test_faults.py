@@ -0,0 +1,75 @@
+import random
+
+import pytest
+from pymongo.errors import AutoReconnect, NetworkTimeout
+
+from benchmarks.faults import Fault, FaultyDatabase, resend_stand_in
+from email_transport import CircuitBreaker, EmailTransportError
+
+
+pytestmark = pytest.mark.anyio
+
+
+def test_fault_draw():
+    rng = random.Random(1)
+    assert Fault(median=0.01).draw(rng) == (0.01, False)
+    assert Fault(median=0.01, stall_rate=1.0, stall=2.0).draw(rng) == (2.01, False)
+    assert Fault(median=0.01, stall_rate=1.0, stall=2.0, timeout=0.5).draw(rng) == (0.5, True)
+    delays = [Fault(median=0.01, sigma=1.0).draw(rng)[0] for _ in range(200)]
+    assert min(delays) < 0.01 < max(delays)
+    assert not Fault().fails(rng)
+    assert Fault(error_rate=1.0).fails(rng)
+
+
+async def test_healthy_database_passes_operations_through(db):
+    faulty = FaultyDatabase(db, Fault())
+    await faulty.leads.insert_many([{"n": 2}, {"n": 1}, {"n": 3}])
+    assert await faulty["leads"].count_documents({}) == 3
+    docs = await faulty.leads.find({}, {"_id": 0}).sort("n", 1).limit(2).to_list(None)
+    assert docs == [{"n": 1}, {"n": 2}]
+    assert [d["n"] async for d in faulty.leads.find().sort("n", -1)] == [3, 2, 1]
+    assert faulty.calls == 4
+    assert (faulty.injected_errors, faulty.injected_timeouts) == (0, 0)
+
+
+async def test_errors_and_timeouts_are_injected_before_the_operation(db):
+    faulty = FaultyDatabase(db, Fault(error_rate=1.0))
+    with pytest.raises(AutoReconnect):
+        await faulty.leads.insert_one({"n": 1})
+    with pytest.raises(AutoReconnect):
+        await faulty.leads.find().to_list(None)
+    assert faulty.injected_errors == 2
+    assert await db.leads.count_documents({}) == 0
+
+    faulty = FaultyDatabase(db, Fault(median=0.05, timeout=0.01))
+    with pytest.raises(NetworkTimeout):
+        await faulty.leads.find_one({})
+    assert faulty.injected_timeouts == 1
+
+
+async def test_wrapped_handles_share_faults_and_counters(mongo, db):
+    faulty = FaultyDatabase(db, Fault(error_rate=1.0))
+    secondary = faulty.wrap(mongo.get_database("test_database"))
+    with pytest.raises(AutoReconnect):
+        await secondary.leads.find_one({})
+    with pytest.raises(AutoReconnect):
+        await secondary["leads"].aggregate([]).to_list(None)
+    assert (faulty.calls, faulty.injected_errors) == (2, 2)
+
+
+async def test_resend_stand_in():
+    ok = resend_stand_in(Fault())
+    assert (await ok.send({"to": ["a@example.com"]}))["id"] == "stand-in"
+    await ok.aclose()
+
+    failing = resend_stand_in(Fault(error_rate=1.0))
+    with pytest.raises(EmailTransportError):
+        await failing.send({"to": ["a@example.com"]})
+    await failing.aclose()
+
+    # The stand-in enforces the client's read timeout like a socket would.
+    stalling = resend_stand_in(Fault(median=1.0, timeout=0.05), breaker=CircuitBreaker(failure_threshold=1))
+    with pytest.raises(EmailTransportError):
+        await stalling.send({"to": ["a@example.com"]})
+    assert stalling.breaker.state == "open"
+    await stalling.aclose()
@@ -0,0 +1,96 @@
+import io
+
+import pytest
+
+import image_store
+from tests.conftest import IMAGE_DATA, create, signed, upload
+
+
+pytestmark = pytest.mark.anyio
+
+
+def test_parse_range():
+    assert image_store.parse_range(None, 100) is None
+    assert image_store.parse_range("bytes=0-9", 100) == (0, 9)
+    assert image_store.parse_range("bytes=90-", 100) == (90, 99)
+    assert image_store.parse_range("bytes=-10", 100) == (90, 99)
+    assert image_store.parse_range("bytes=50-500", 100) == (50, 99)
+    assert image_store.parse_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(ValueError):
+        image_store.parse_range("bytes=100-", 100)
+
+
+async def test_full_download_has_validators(api, image):
+    r = await api.get(signed(image))
+    assert r.status_code == 200
+    assert r.content == IMAGE_DATA
+    assert r.headers["content-length"] == str(len(IMAGE_DATA))
+    assert r.headers["accept-ranges"] == "bytes"
+    assert r.headers["cache-control"].startswith("private, max-age=")
+    assert r.headers["etag"].startswith('"')
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=0-9", 0, 9),
+    ("bytes=290-610", 290, 610),  # spans three chunks
+    ("bytes=-24", 1000, 1023),
+    ("bytes=900-", 900, 1023),
+])
+async def test_range_requests(api, image, header, start, end):
+    r = await api.get(signed(image), headers={"Range": header})
+    assert r.status_code == 206
+    assert r.content == IMAGE_DATA[start:end + 1]
+    assert r.headers["content-range"] == f"bytes {start}-{end}/{len(IMAGE_DATA)}"
+    assert r.headers["content-length"] == str(end - start + 1)
+
+
+async def test_unsatisfiable_range(api, image):
+    r = await api.get(signed(image), headers={"Range": "bytes=5000-"})
+    assert r.status_code == 416
+    assert r.headers["content-range"] == f"bytes */{len(IMAGE_DATA)}"
+
+
+async def test_if_none_match_and_if_range(api, image):
+    etag = (await api.get(signed(image))).headers["etag"]
+    r = await api.get(signed(image), headers={"If-None-Match": f"W/{etag}"})
+    assert r.status_code == 304
+    assert r.content == b""
+
+    r = await api.get(signed(image), headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert r.status_code == 206
+    # A stale If-Range validator gets the whole image.
+    r = await api.get(signed(image), headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+    assert r.status_code == 200
+    assert r.content == IMAGE_DATA
+
+
+async def test_incomplete_image_is_not_served(api):
+    cid = await create(api)
+    r = await api.post(
+        f"/api/consultations/{cid}/images/init",
+        json={"filename": "a.jpg", "size": 10, "content_type": "image/jpeg"},
+    )
+    assert (await api.get(signed(f"/api/consultations/{cid}/images/{r.json()['image_id']}"))).status_code == 404
+
+
+async def test_thumbnail_is_rendered_once_and_cached(api, db):
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (1200, 800), "red").save(buf, "JPEG")
+    cid = await create(api)
+    path = f"/api/consultations/{cid}/images/{await upload(api, cid, buf.getvalue(), chunk=4096)}/thumbnail"
+
+    r = await api.get(signed(path))
+    assert r.status_code == 200
+    with Image.open(io.BytesIO(r.content)) as thumb:
+        assert max(thumb.size) <= 320
+    assert await db[image_store.THUMBNAILS].count_documents({}) == 1
+
+    assert (await api.get(signed(path), headers={"If-None-Match": r.headers["etag"]})).status_code == 304
+    assert (await api.get(signed(path))).content == r.content
+    assert await db[image_store.THUMBNAILS].count_documents({}) == 1
+
+
+async def test_thumbnail_of_non_image_is_415(api, image):
+    assert (await api.get(signed(f"{image}/thumbnail"))).status_code == 415
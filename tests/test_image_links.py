@@ -0,0 +1,111 @@
+import io
+import re
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from image_links import LinkSigner
+from tests.conftest import create, signed, upload
+
+
+pytestmark = pytest.mark.anyio
+
+
+def test_sign_and_verify():
+    signer = LinkSigner(b"secret", ttl=60)
+    query = parse_qs(urlsplit(signer.sign("/a", now=1000)).query)
+    expires, signature = query["expires"][0], query["signature"][0]
+    assert expires == "1060"
+    assert signer.verify("/a", expires, signature, now=1060)
+    assert not signer.verify("/a", expires, signature, now=1061)
+    assert not signer.verify("/b", expires, signature, now=1000)
+    assert not signer.verify("/a", "1061", signature, now=1000)
+    assert not LinkSigner(b"other", ttl=60).verify("/a", expires, signature, now=1000)
+    assert not signer.verify("/a", None, None)
+
+
+def test_max_age_never_outlives_the_link():
+    signer = LinkSigner(b"secret", ttl=60)
+    assert signer.max_age("1060", now=1000) == 60
+    assert signer.max_age("1010", now=1000) == 10
+    assert signer.max_age("999", now=1000) == 0
+    assert signer.max_age("9999", now=1000) == 60
+    assert signer.max_age(None) == 60
+
+
+async def test_downloads_require_a_valid_signature(api, image):
+    assert (await api.get(signed(image))).status_code == 200
+    assert (await api.get(image)).status_code == 403
+    assert (await api.get(f"{image}/thumbnail")).status_code == 403
+    other = signed(image.rsplit("/", 1)[0] + "/other")
+    assert (await api.get(image + "?" + other.split("?")[1])).status_code == 403
+    assert (await api.get(signed(image).replace("signature=", "signature=0"))).status_code == 403
+
+
+async def test_downloads_are_cached_privately_until_the_link_expires(api, image):
+    import server
+
+    link = server.image_link_signer.sign(image, now=time.time() - server.image_link_signer.ttl + 30)
+    max_age = int(re.fullmatch(r"private, max-age=(\d+)", (await api.get(link)).headers["cache-control"])[1])
+    assert 0 < max_age <= 30
+
+
+async def test_unsigned_downloads_can_be_allowed(api, image, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "IMAGE_DOWNLOADS_REQUIRE_SIGNATURE", False)
+    assert (await api.get(image)).status_code == 200
+    # A link that carries a signature still has to be valid.
+    assert (await api.get(image + "?expires=1&signature=x")).status_code == 403
+
+
+async def test_without_a_secret_nothing_verifies(api, image, monkeypatch):
+    import server
+
+    link = signed(image)
+    monkeypatch.setattr(server, "image_link_signer", None)
+    assert (await api.get(link)).status_code == 403
+
+
+def jpeg() -> bytes:
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (640, 480), "blue").save(buf, "JPEG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def link_delivery(monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "EMAIL_IMAGE_DELIVERY", "link")
+    monkeypatch.setattr(server, "PUBLIC_BASE_URL", "https://api.example.com")
+
+
+async def test_email_links_download_and_thumbnails_are_inline(api, link_delivery):
+    import server
+
+    cid = await create(api)
+    await upload(api, cid, jpeg(), chunk=4096)
+    email = server._get_email_transport().sent[-1]
+
+    [url] = set(re.findall(r"href='([^']+)'", email["html"]))
+    assert url.startswith("https://api.example.com/api/consultations/")
+    r = await api.get(url.removeprefix("https://api.example.com").replace("&amp;", "&"))
+    assert r.status_code == 200
+    assert r.content == jpeg()
+    [thumb] = email["attachments"]
+    assert thumb["content_id"] in email["html"]
+
+
+async def test_email_attaches_images_without_a_secret(api, link_delivery, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "image_link_signer", None)
+    cid = await create(api)
+    await upload(api, cid, jpeg(), chunk=4096)
+    email = server._get_email_transport().sent[-1]
+    assert "href=" not in email["html"]
+    assert [a["filename"] for a in email["attachments"]] == ["a.jpg"]
@@ -0,0 +1,232 @@
+import asyncio
+import json
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+import lead_feed
+from lead_feed import LeadFeed, record_delete
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def never_disconnected():
+    return False
+
+
+async def next_frame(frames, timeout=2.0) -> tuple:
+    """(event id or None, decoded data) of the next event."""
+    while True:
+        frame = await asyncio.wait_for(frames.__anext__(), timeout)
+        if frame.startswith("event: ") or "\nevent: " in frame:
+            event_id = frame[len("id: "):frame.index("\n")] if frame.startswith("id: ") else None
+            data = frame.split("data: ", 1)[1].strip()
+            return event_id, json.loads(data)
+
+
+async def next_event(frames, timeout=2.0) -> dict:
+    return (await next_frame(frames, timeout))[1]
+
+
+class FakeStream:
+    def __init__(self, changes):
+        self.changes = changes
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for change in self.changes:
+            yield change
+        await asyncio.Event().wait()
+
+
+class FakeLeads:
+    """Just enough of a collection for the change stream path."""
+
+    def __init__(self, legacy, changes):
+        self.legacy = legacy
+        self.changes = changes
+        self.watch_kwargs = None
+
+    def watch(self, pipeline, **kwargs):
+        self.watch_kwargs = kwargs
+        return FakeStream(self.changes)
+
+    def find(self, query, projection):
+        async def docs():
+            for doc in self.legacy:
+                yield doc
+        return docs()
+
+
+def change(n, op, key, doc=None):
+    return {"_id": {"_data": f"tok-{n}"}, "operationType": op, "documentKey": {"_id": key}, "fullDocument": doc}
+
+
+async def test_change_stream_deletes_carry_the_lead_id():
+    legacy_key = ObjectId()
+    leads = FakeLeads(
+        legacy=[{"_id": legacy_key, "id": "old-lead"}],
+        changes=[
+            change(1, "insert", "new-lead", {"_id": "new-lead", "id": "new-lead", "name": "A"}),
+            change(2, "delete", "new-lead"),
+            change(3, "delete", legacy_key),
+        ],
+    )
+    feed = LeadFeed(leads, heartbeat=5)
+    frames = feed.events(None, never_disconnected)
+    try:
+        events = [await next_event(frames) for _ in range(3)]
+    finally:
+        await frames.aclose()
+        await feed.stop()
+
+    assert events[0] == {"op": "insert", "id": "new-lead", "lead": {"id": "new-lead", "name": "A"}}
+    assert events[1] == {"op": "delete", "id": "new-lead", "lead": None}
+    assert events[2] == {"op": "delete", "id": "old-lead", "lead": None}
+    # Pre-images need MongoDB 6.0 and a collection option; not used.
+    assert "full_document_before_change" not in leads.watch_kwargs
+
+
+def polling_feed(db, **kwargs):
+    feed = LeadFeed(db.leads, db[lead_feed.TOMBSTONES], poll_interval=0.01, heartbeat=5, **kwargs)
+
+    async def no_change_streams():
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+
+    feed._watch_change_stream = no_change_streams
+    return feed
+
+
+async def test_polling_feeds_in_every_worker_see_inserts_updates_and_deletes(db):
+    workers = [polling_feed(db), polling_feed(db)]
+    streams = [feed.events(None, never_disconnected) for feed in workers]
+    try:
+        for frames in streams:
+            assert (await frames.__anext__()).startswith("retry:")
+        await asyncio.sleep(0.05)
+
+        await db.leads.insert_one({"_id": "l1", "id": "l1", "name": "A", "created_at": "2999-01-01T00:00:00+00:00"})
+        for frames in streams:
+            assert (await next_event(frames))["op"] == "insert"
+
+        await db.leads.update_one({"id": "l1"}, {"$set": {"status": "contacted", "updated_at": "2999-01-02T00:00:00+00:00"}})
+        for frames in streams:
+            event = await next_event(frames)
+            assert event["op"] == "update" and event["lead"]["status"] == "contacted"
+
+        await db.leads.delete_one({"id": "l1"})
+        await record_delete(db[lead_feed.TOMBSTONES], "l1")
+        for frames in streams:
+            assert await next_event(frames) == {"op": "delete", "id": "l1", "lead": None}
+    finally:
+        for frames in streams:
+            await frames.aclose()
+        for feed in workers:
+            await feed.stop()
+    assert all(feed.mode == "polling" for feed in workers)
+
+
+async def started(feed):
+    frames = feed.events(None, never_disconnected)
+    assert (await frames.__anext__()).startswith("retry:")
+    while feed.mode != "polling":
+        await asyncio.sleep(0.01)
+    return frames
+
+
+async def test_polling_event_ids_are_the_same_in_every_worker(db):
+    workers = [polling_feed(db), polling_feed(db)]
+    streams = [await started(feed) for feed in workers]
+    try:
+        for n in range(3):
+            await db.leads.insert_one({"id": f"l{n}", "created_at": f"2999-01-01T00:00:0{n}+00:00"})
+        ids = [[(await next_frame(frames))[0] for _ in range(3)] for frames in streams]
+        # Built from the change, not from a per-process counter.
+        assert ids[0] == ids[1]
+        assert all(event_id.endswith(f"-l{n}") for n, event_id in enumerate(ids[0]))
+
+        # A client that saw the first event on one worker catches up on the other.
+        frames = workers[1].events(ids[0][0], never_disconnected)
+        try:
+            assert [(await next_event(frames))["id"] for _ in range(2)] == ["l1", "l2"]
+        finally:
+            await frames.aclose()
+    finally:
+        for frames in streams:
+            await frames.aclose()
+        for feed in workers:
+            await feed.stop()
+
+
+async def test_polling_rereads_late_commits_once(db):
+    feed = polling_feed(db)
+    frames = await started(feed)
+    try:
+        await db.leads.insert_one({"id": "new", "created_at": "2999-01-01T00:00:10+00:00"})
+        assert (await next_event(frames))["id"] == "new"
+        # Timestamped before "new" but committed after it was polled.
+        await db.leads.insert_one({"id": "late", "created_at": "2999-01-01T00:00:05+00:00"})
+        assert (await next_event(frames))["id"] == "late"
+        await asyncio.sleep(0.05)
+        assert [json.loads(data)["id"] for _, data in feed._replay] == ["new", "late"]
+    finally:
+        await frames.aclose()
+        await feed.stop()
+
+
+async def test_polling_reads_bursts_larger_than_a_batch_without_internal_fields(db):
+    feed = polling_feed(db, batch_size=2)
+    await db.leads.insert_many([
+        {"id": f"l{n}", "created_at": "2000-01-01T00:00:00+00:00", "search_prefixes": ["a"], "sheets_synced": "x"}
+        for n in range(5)
+    ])
+    frames = await started(feed)
+    try:
+        await db.leads.update_many({}, {"$set": {"status": "contacted", "updated_at": "2999-01-01T00:00:00+00:00"}})
+        events = [await next_event(frames) for _ in range(5)]
+    finally:
+        await frames.aclose()
+        await feed.stop()
+    assert sorted(e["id"] for e in events) == [f"l{n}" for n in range(5)]
+    assert all(e["op"] == "update" for e in events)
+    assert events[0]["lead"] == {
+        "id": "l0", "created_at": "2000-01-01T00:00:00+00:00", "status": "contacted", "updated_at": "2999-01-01T00:00:00+00:00",
+    }
+
+
+async def test_reconnect_replays_missed_events_or_resets():
+    feed = LeadFeed(FakeLeads([], []), heartbeat=5)
+    for n in range(3):
+        feed._publish(f"e{n}", {"op": "insert", "id": str(n), "lead": {}})
+
+    frames = feed.events("e0", never_disconnected)
+    try:
+        assert [(await next_event(frames))["id"] for _ in range(2)] == ["1", "2"]
+    finally:
+        await frames.aclose()
+
+    frames = feed.events("gone", never_disconnected)
+    try:
+        assert await next_event(frames) == {"op": "reset"}
+    finally:
+        await frames.aclose()
+        await feed.stop()
+
+
+async def test_lead_delete_endpoint_writes_a_tombstone(api, db):
+    r = await api.post("/api/leads", json={"name": "A", "company": "C", "email": "a@example.com", "need": "n"})
+    lead_id = r.json()["id"]
+    assert (await db.leads.find_one({"id": lead_id}))["_id"] == lead_id
+
+    assert (await api.delete(f"/api/leads/{lead_id}")).status_code == 200
+    assert await db[lead_feed.TOMBSTONES].find_one({"id": lead_id}) is not None
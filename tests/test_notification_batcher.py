@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import pytest
+
+import deadlines
+from notification_batcher import DigestBatcher, Notification
+
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def note(i: int) -> Notification:
+    return Notification(subject=f"s{i}", heading="h", rows=[("Name", str(i))])
+
+
+def make_batcher(**kwargs):
+    sent = {"one": [], "digest": []}
+
+    async def send_one(n):
+        sent["one"].append(n)
+        return {"id": n.subject}
+
+    async def send_digest(items):
+        sent["digest"].append(items)
+
+    clock = Clock()
+    return DigestBatcher(send_one, send_digest, clock=clock, **kwargs), sent, clock
+
+
+async def test_sends_immediately_below_the_rate_threshold():
+    batcher, sent, _ = make_batcher(rate_threshold=3)
+    for i in range(3):
+        assert await batcher.submit(note(i)) == {"id": f"s{i}"}
+    assert [n.subject for n in sent["one"]] == ["s0", "s1", "s2"]
+    assert sent["digest"] == []
+
+
+async def test_queues_above_threshold_and_sends_one_digest_after_window():
+    batcher, sent, _ = make_batcher(rate_threshold=1, window=0.05)
+    await batcher.submit(note(0))
+    assert await batcher.submit(note(1)) == {"queued": True, "pending": 1}
+    assert await batcher.submit(note(2)) == {"queued": True, "pending": 2}
+    assert sent["digest"] == []
+    await asyncio.sleep(0.1)
+    await batcher.aclose()
+    assert [[n.subject for n in batch] for batch in sent["digest"]] == [["s1", "s2"]]
+
+
+async def test_full_batch_flushes_without_waiting_for_the_window():
+    batcher, sent, _ = make_batcher(rate_threshold=0, window=60.0, max_batch=3)
+    for i in range(3):
+        await batcher.submit(note(i))
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert len(sent["digest"]) == 1 and len(sent["digest"][0]) == 3
+    await batcher.aclose()
+
+
+async def test_rate_window_expires_old_arrivals():
+    batcher, sent, clock = make_batcher(rate_threshold=1, rate_window=60.0)
+    await batcher.submit(note(0))
+    clock.now = 61.0
+    assert await batcher.submit(note(1)) == {"id": "s1"}
+
+
+async def test_single_pending_item_is_sent_as_a_normal_email():
+    batcher, sent, _ = make_batcher(rate_threshold=0)
+    await batcher.submit(note(0))
+    await batcher.flush()
+    assert [n.subject for n in sent["one"]] == ["s0"]
+    assert sent["digest"] == []
+
+
+async def test_aclose_sends_what_is_pending():
+    batcher, sent, _ = make_batcher(rate_threshold=0, window=60.0)
+    await batcher.submit(note(0))
+    await batcher.submit(note(1))
+    await batcher.aclose()
+    assert len(sent["digest"]) == 1
+
+
+async def test_flush_runs_outside_the_request_deadline():
+    seen = []
+
+    async def send_one(n):
+        pass
+
+    async def send_digest(items):
+        seen.append(deadlines.remaining())
+
+    batcher = DigestBatcher(send_one, send_digest, rate_threshold=0, max_batch=2)
+    token = deadlines._deadline_var.set(time.monotonic() + 0.01)
+    try:
+        await batcher.submit(note(0))
+        await batcher.submit(note(1))
+    finally:
+        deadlines._deadline_var.reset(token)
+    await batcher.aclose()
+    assert seen == [None]
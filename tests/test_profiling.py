@@ -0,0 +1,122 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+import profiling
+from profiling import MongoSpanListener, ProfileStore, ProfilingMiddleware
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def handler(request):
+    with profiling.span("email.send", "resend"):
+        await asyncio.sleep(float(request.query_params.get("sleep", "0")))
+    return PlainTextResponse("ok", status_code=201)
+
+
+async def call(path, store=None, headers=None, **kwargs):
+    store = store if store is not None else ProfileStore()
+    app = Starlette(routes=[Route("/api/work", handler), Route("/api/admin/x", handler)])
+    app = ProfilingMiddleware(app, store, **kwargs)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        assert (await c.get(path, headers=headers)).status_code == 201
+    return store
+
+
+def test_span_outside_a_trace_is_a_noop():
+    with profiling.span("anything"):
+        pass
+    assert profiling._trace_var.get() is None
+
+
+async def test_untriggered_requests_are_not_traced():
+    assert (await call("/api/work", token="t")).list() == []
+    assert (await call("/api/work", headers={"X-Profile-Token": "wrong"}, token="t")).list() == []
+
+
+async def test_token_request_gets_spans_and_a_profile():
+    store = await call("/api/work", headers={"X-Profile-Token": "t"}, token="t")
+    [entry] = store.list()
+    assert (entry["method"], entry["path"], entry["status"], entry["trigger"]) == ("GET", "/api/work", 201, "header")
+    assert entry["span_summary"][0]["name"] == "email.send"
+    full = store.get(entry["id"])
+    assert full["spans"][0]["detail"] == "resend"
+    assert "function calls" in full["profile"]
+    assert store.get("missing") is None
+
+
+async def test_sampled_requests_are_profiled():
+    [entry] = (await call("/api/work", sample_rate=1.0)).list()
+    assert entry["trigger"] == "sample"
+
+
+async def test_slow_capture_keeps_only_slow_requests_without_cprofile():
+    store = ProfileStore()
+    await call("/api/work", store, slow_ms=30)
+    assert store.list() == []
+    await call("/api/work?sleep=0.05", store, slow_ms=30)
+    [entry] = store.list()
+    assert entry["trigger"] == "slow" and entry["duration_ms"] >= 30
+    assert store.get(entry["id"])["profile"] is None
+
+
+async def test_admin_paths_are_never_traced():
+    assert (await call("/api/admin/x", sample_rate=1.0)).list() == []
+
+
+def test_store_is_a_bounded_newest_first_ring():
+    store = ProfileStore(size=2)
+    for n in range(3):
+        store.add({"id": str(n), "spans": [], "_profiler": None})
+    assert [e["id"] for e in store.list()] == ["2", "1"]
+    assert "spans" not in store.list()[0]
+
+
+def test_trace_caps_spans():
+    trace = profiling.Trace()
+    for _ in range(profiling.MAX_SPANS + 3):
+        trace.add("mongo.find", trace.start, 0.001)
+    assert len(trace.spans) == profiling.MAX_SPANS
+    assert trace.dropped == 3
+    assert trace.summary() == [{"name": "mongo.find", "count": profiling.MAX_SPANS, "total_ms": pytest.approx(profiling.MAX_SPANS)}]
+
+
+def test_mongo_listener_records_commands_of_traced_requests():
+    listener = MongoSpanListener()
+    started = SimpleNamespace(request_id=1, command_name="find", command={"find": "leads"})
+    done = SimpleNamespace(request_id=1, duration_micros=2500)
+
+    listener.started(started)  # not traced: ignored
+    listener.succeeded(done)
+
+    trace = profiling.Trace()
+    token = profiling._trace_var.set(trace)
+    try:
+        listener.started(started)
+        listener.succeeded(done)
+    finally:
+        profiling._trace_var.reset(token)
+    [(name, _, duration_ms, detail)] = trace.spans
+    assert (name, duration_ms, detail) == ("mongo.find", 2.5, "leads")
+
+
+async def test_admin_endpoints(api, monkeypatch):
+    import server
+
+    assert (await api.get("/api/admin/profiles")).status_code == 404
+    monkeypatch.setattr(server, "PROFILING", True)
+    monkeypatch.setattr(server, "PROFILING_TOKEN", "t")
+    monkeypatch.setattr(server, "profile_store", ProfileStore())
+    server.profile_store.add({"id": "p1", "path": "/api/leads", "spans": [], "_profiler": None})
+
+    assert (await api.get("/api/admin/profiles")).status_code == 403
+    headers = {"X-Profile-Token": "t"}
+    assert (await api.get("/api/admin/profiles", headers=headers)).json()["items"] == [{"id": "p1", "path": "/api/leads"}]
+    assert (await api.get("/api/admin/profiles/p1", headers=headers)).json()["profile"] is None
+    assert (await api.get("/api/admin/profiles/p2", headers=headers)).status_code == 404
@@ -0,0 +1,159 @@
+from types import SimpleNamespace
+
+import pytest
+from pymongo.server_type import SERVER_TYPE
+
+import read_routing
+from read_routing import DEFAULT_ROUTES, ReadMetrics, ReadRouter, parse_routes
+from tests.conftest import create
+
+
+LEAD = {"name": "A", "company": "C", "email": "a@example.com", "need": "n"}
+
+
+# -- parse_routes ----------------------------------------------------------
+
+def test_defaults_get_the_minimum_staleness_and_primary_none():
+    routes = parse_routes(None)
+    assert set(routes) == set(DEFAULT_ROUTES)
+    assert routes["leads"] == ("secondaryPreferred", 90)
+    assert routes["upload_state"] == ("primary", -1)
+
+
+def test_overrides_replace_and_add_routes():
+    routes = parse_routes("leads=nearest:120, stats=primary,reports=secondary", max_staleness=300)
+    assert routes["leads"] == ("nearest", 120)
+    assert routes["stats"] == ("primary", -1)
+    assert routes["reports"] == ("secondary", 300)
+    assert routes["consultations"] == ("secondaryPreferred", 300)
+
+
+@pytest.mark.parametrize("spec", ["leads=fastest", "leads=nearest:30", "upload_state="])
+def test_invalid_routes_are_rejected(spec):
+    with pytest.raises(ValueError):
+        parse_routes(spec)
+
+
+# -- ReadRouter ------------------------------------------------------------
+
+class FakeClient:
+    def __init__(self):
+        self.opened = []
+
+    def __getitem__(self, name):
+        return ("primary", name)
+
+    def get_database(self, name, read_preference):
+        handle = (read_preference.mongos_mode, read_preference.max_staleness, name)
+        self.opened.append(handle)
+        return handle
+
+
+def test_routes_with_the_same_preference_share_a_handle():
+    client = FakeClient()
+    router = ReadRouter(client, "db", parse_routes("stats=nearest"))
+    assert client.opened == [("secondaryPreferred", 90, "db"), ("nearest", 90, "db")]
+    assert router.handle("leads") is router.handle("consultations")
+    assert router.handle("stats") == ("nearest", 90, "db")
+    assert router.handle("upload_state") is router.primary
+    assert router.handle("unknown") is router.primary
+    assert router.describe()["upload_state"] == {"mode": "primary", "max_staleness_seconds": None}
+
+
+def test_reading_tags_the_route_for_the_block_only():
+    router = ReadRouter(FakeClient(), "db", parse_routes(None))
+    with router.reading("stats") as reads:
+        assert reads is router.handle("stats")
+        assert read_routing._route_var.get() == "stats"
+        with read_routing.tagged("leads"):
+            assert read_routing._route_var.get() == "leads"
+        assert read_routing._route_var.get() == "stats"
+    assert read_routing._route_var.get() == "other"
+
+
+@pytest.mark.anyio
+async def test_tagged_iter_tags_each_step_but_not_the_consumer():
+    async def parts():
+        for n in range(2):
+            yield n, read_routing._route_var.get()
+
+    seen = []
+    async for part in read_routing.tagged_iter("images", parts()):
+        seen.append((part, read_routing._route_var.get()))
+    assert seen == [((0, "images"), "other"), ((1, "images"), "other")]
+
+
+# -- ReadMetrics -----------------------------------------------------------
+
+def server_event(address, server_type):
+    return SimpleNamespace(server_address=address, new_description=SimpleNamespace(server_type=server_type))
+
+
+def command_event(name, address):
+    return SimpleNamespace(command_name=name, connection_id=address)
+
+
+def test_metrics_count_reads_by_route_and_server_role():
+    metrics = ReadMetrics()
+    metrics.description_changed(server_event(("a", 1), SERVER_TYPE.RSPrimary))
+    metrics.description_changed(server_event(("b", 1), SERVER_TYPE.RSSecondary))
+
+    with read_routing.tagged("leads"):
+        metrics.succeeded(command_event("find", ("b", 1)))
+        metrics.succeeded(command_event("getMore", ("b", 1)))
+        metrics.succeeded(command_event("insert", ("a", 1)))
+        metrics.failed(command_event("aggregate", ("b", 1)))
+    metrics.succeeded(command_event("find", ("a", 1)))
+    metrics.closed(SimpleNamespace(server_address=("b", 1)))
+
+    assert metrics.snapshot() == {
+        "servers": {"primary": 1},
+        "reads": {"leads": {"secondary": 2}, "other": {"primary": 1}},
+        "totals": {"secondary": 2, "primary": 1},
+        "errors": {"leads": 1},
+    }
+
+
+# -- by-id reads -----------------------------------------------------------
+
+@pytest.fixture
+def lagging(api, mongo, monkeypatch):
+    """Every routed (non-primary) handle reads an empty database: a secondary
+    that hasn't caught up with anything yet."""
+    import server
+
+    stale = mongo["lagging_secondary"]
+    handles = {key: h if key == ("primary", -1) else stale for key, h in server.read_router._handles.items()}
+    monkeypatch.setattr(server.read_router, "_handles", handles)
+    return api
+
+
+@pytest.mark.anyio
+async def test_lead_missing_on_a_lagging_secondary_is_read_from_the_primary(lagging):
+    lead_id = (await lagging.post("/api/leads", json=LEAD)).json()["id"]
+    r = await lagging.get(f"/api/leads/{lead_id}")
+    assert r.status_code == 200
+    assert r.json()["email"] == "a@example.com"
+    assert (await lagging.get("/api/leads/missing")).status_code == 404
+
+
+@pytest.mark.anyio
+async def test_consultation_missing_on_a_lagging_secondary_is_read_from_the_primary(lagging):
+    cid = await create(lagging)
+    r = await lagging.get(f"/api/consultations/{cid}")
+    assert r.status_code == 200
+    assert r.json()["id"] == cid
+    assert (await lagging.get("/api/consultations/missing")).status_code == 404
+
+
+@pytest.mark.anyio
+async def test_admin_endpoint_needs_the_admin_token(api, monkeypatch):
+    import server
+
+    assert (await api.get("/api/admin/read-routing")).status_code == 403
+    monkeypatch.setattr(server, "PROFILING_TOKEN", "t")
+    assert (await api.get("/api/admin/read-routing", headers={"X-Profile-Token": "wrong"})).status_code == 403
+
+    body = (await api.get("/api/admin/read-routing", headers={"X-Profile-Token": "t"})).json()
+    assert body["routes"]["upload_state"] == {"mode": "primary", "max_staleness_seconds": None}
+    assert body["routes"]["leads"]["mode"] == "secondaryPreferred"
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import search
+
+
+pytestmark = pytest.mark.anyio
+
+
+def lead(i, company, name="Ana", need="padel courts", created_at=None):
+    doc = {
+        "id": f"lead-{i}",
+        "company": company,
+        "name": name,
+        "need": need,
+        "created_at": created_at or datetime.now(timezone.utc).isoformat(),
+    }
+    doc.update(search.search_fields("leads", doc))
+    return doc
+
+
+def test_edge_ngrams():
+    assert search.edge_ngrams("Rewind V") == "re rew rewi rewin rewind"
+
+
+def test_index_ranks_by_field_weight():
+    index = search.InvertedIndex(search.FIELDS["leads"])
+    index.add("a", {"company": "Padel Club", "name": "x", "need": "y"})
+    index.add("b", {"company": "x", "name": "y", "need": "padel"})
+    assert [doc_id for doc_id, _ in index.search("padel", 0, 10)] == ["a", "b"]
+    index.remove("a")
+    assert [doc_id for doc_id, _ in index.search("padel", 0, 10)] == ["b"]
+
+
+async def test_memory_search_finds_prefixes_and_skips_deleted(db):
+    backend = search.MemorySearch(db, refresh_interval=None)
+    for doc in (lead(1, "Rewind Ventures"), lead(2, "Court Co")):
+        await db.leads.insert_one(dict(doc))
+        backend.add("leads", doc)
+
+    hits = await backend.search("leads", "rewi", 0, 10)
+    assert [h["id"] for h in hits] == ["lead-1"]
+    assert "_id" not in hits[0]
+
+    await db.leads.delete_one({"id": "lead-1"})
+    assert await backend.search("leads", "rewi", 0, 10) == []
+
+
+async def test_memory_search_pages_skip_removed_documents(db):
+    backend = search.MemorySearch(db, refresh_interval=None)
+    for i in range(6):
+        doc = lead(i, "Rewind Ventures")
+        await db.leads.insert_one(dict(doc))
+        backend.add("leads", doc)
+    # Ranked by id on equal scores: lead-0 .. lead-5. Remove two from page one.
+    await db.leads.delete_many({"id": {"$in": ["lead-0", "lead-2"]}})
+
+    pages = [[h["id"] for h in await backend.search("leads", "rewind", skip, 2)] for skip in (0, 2, 4)]
+    assert pages == [["lead-1", "lead-3"], ["lead-4", "lead-5"], []]
+
+
+async def test_memory_search_picks_up_documents_from_other_workers(db):
+    clock = [0.0]
+    this_worker = search.MemorySearch(db, refresh_interval=5.0, clock=lambda: clock[0])
+    await this_worker.load()
+
+    # Another worker inserts (and indexes) in its own process.
+    await db.leads.insert_one(lead(1, "Rewind Ventures"))
+    assert await this_worker.search("leads", "rewind", 0, 10) == []
+
+    clock[0] = 5.0
+    assert [h["id"] for h in await this_worker.search("leads", "rewind", 0, 10)] == ["lead-1"]
+
+
+async def test_refresh_rereads_documents_that_committed_late(db):
+    backend = search.MemorySearch(db, refresh_interval=0, overlap=60)
+    now = datetime.now(timezone.utc)
+    await db.leads.insert_one(lead(1, "Newer", created_at=now.isoformat()))
+    await backend.load()
+    # Timestamped before the newest indexed document but committed after it.
+    await db.leads.insert_one(lead(2, "Straggler", created_at=(now - timedelta(seconds=2)).isoformat()))
+
+    assert [h["id"] for h in await backend.search("leads", "straggler", 0, 10)] == ["lead-2"]
+
+
+async def test_search_endpoint_pages(api):
+    for i in range(3):
+        r = await api.post(
+            "/api/leads",
+            json={"name": f"N{i}", "company": f"Padel {i}", "email": f"n{i}@example.com", "need": "courts"},
+        )
+        assert r.status_code == 200
+    page = (await api.get("/api/search", params={"q": "padel", "limit": 2})).json()
+    assert page["kind"] == "leads" and len(page["items"]) == 2 and page["has_more"]
+    page = (await api.get("/api/search", params={"q": "padel", "limit": 2, "page": 2})).json()
+    assert len(page["items"]) == 1 and not page["has_more"]
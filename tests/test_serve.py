@@ -0,0 +1,34 @@
+import httpx
+import pytest
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+import serve
+
+
+def test_forwarded_headers_trusted_only_from_localhost_by_default(monkeypatch):
+    monkeypatch.delenv("FORWARDED_ALLOW_IPS", raising=False)
+    options = serve.uvicorn_options(serve.parse_args([]))
+    assert options["proxy_headers"] is True
+    assert options["forwarded_allow_ips"] == "127.0.0.1"
+
+
+def test_forwarded_allow_ips_from_env_and_flag(monkeypatch):
+    monkeypatch.setenv("FORWARDED_ALLOW_IPS", "10.0.0.5")
+    assert serve.parse_args([]).forwarded_allow_ips == "10.0.0.5"
+    assert serve.parse_args(["--forwarded-allow-ips", "10.0.0.6"]).forwarded_allow_ips == "10.0.0.6"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("peer, expected", [("203.0.113.9", "203.0.113.9"), ("127.0.0.1", "198.51.100.1")])
+async def test_spoofed_forwarded_for_is_ignored_from_untrusted_peers(monkeypatch, peer, expected):
+    monkeypatch.delenv("FORWARDED_ALLOW_IPS", raising=False)
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": scope["client"][0].encode()})
+
+    trusted = serve.uvicorn_options(serve.parse_args([]))["forwarded_allow_ips"]
+    transport = httpx.ASGITransport(app=ProxyHeadersMiddleware(app, trusted_hosts=trusted), client=(peer, 5000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/", headers={"X-Forwarded-For": "198.51.100.1"})
+    assert r.text == expected
@@ -0,0 +1,168 @@
+import httpx
+import pytest
+from mongomock.filtering import filter_applies
+
+import lead_feed
+import sheets_sync
+from benchmarks.sheets_stand_in import create_app
+from sheets_sync import SheetsSync, SheetsSyncError
+
+
+pytestmark = pytest.mark.anyio
+
+URL = "http://sheets/exec"
+
+
+def lead(n, created_at=None):
+    return {
+        "id": f"lead-{n}",
+        "name": f"Lead {n}",
+        "email": "a@example.com",
+        "company": "Arena",
+        "need": "Two padel courts",
+        "source": "landing_form",
+        "created_at": created_at or f"2026-06-01T10:00:{n:02d}+00:00",
+    }
+
+
+class Script(httpx.AsyncBaseTransport):
+    """The Apps Script stand-in, optionally failing or losing responses."""
+
+    def __init__(self):
+        self.app = create_app()
+        self.inner = httpx.ASGITransport(app=self.app)
+        self.fail = False
+        self.lose_response = False
+        self.batches = []
+
+    async def handle_async_request(self, request):
+        if self.fail:
+            return httpx.Response(200, json={"success": False, "error": "Service invoked too many times"})
+        self.batches.append(request.content)
+        response = await self.inner.handle_async_request(request)
+        if self.lose_response:
+            raise httpx.ReadTimeout("response lost", request=request)
+        return response
+
+    @property
+    def rows(self):
+        return self.app.state.sheets
+
+
+@pytest.fixture
+def script():
+    return Script()
+
+
+def make_sync(db, script, **kwargs):
+    kwargs.setdefault("backfill", True)
+    return SheetsSync(db, URL, interval=0, transport=script, **kwargs)
+
+
+async def test_rows_match_the_documented_columns(db, script):
+    await db.leads.insert_one(lead(1))
+    await db.consultations.insert_one({
+        "id": "c-1", "created_at": "2026-06-01T10:00:00+00:00", "name": "Ana", "email": "ana@example.com",
+        "company": "Arena", "details": "d", "area_sqft": 5000, "mode": "multi",
+        "sports": [{"sport": "padel", "courts": 2}, {"sport": "tennis", "courts": 1}],
+        "facility_name": "Arena Club", "google_maps_url": "https://maps", "source": "consultation_form",
+    })
+    sync = make_sync(db, script)
+    assert await sync.sync_once() == {"leads": 1, "consultations": 1}
+    assert script.rows["leads"] == [[
+        "2026-06-01T10:00:01+00:00", "Lead 1", "a@example.com", "Arena", "", "Two padel courts", "landing_form",
+    ]]
+    # timestamp, name, email, company, details, area_sqft, facility_type, sports, ...
+    assert script.rows["consultations"][0][4:9] == ["d", 5000, "multi", "padel: 2 courts, tennis: 1 courts", "Arena Club"]
+    await sync.stop()
+
+
+async def test_late_committing_documents_are_not_skipped(db, script):
+    await db.leads.insert_many([lead(1), lead(3)])
+    sync = make_sync(db, script)
+    await sync.sync_once()
+    # Created before lead-3 but committed after it was synced.
+    await db.leads.insert_one(lead(2))
+    assert (await sync.sync_once())["leads"] == 1
+    assert [row[1] for row in script.rows["leads"]] == ["Lead 1", "Lead 3", "Lead 2"]
+    assert await sync.sync_once() == {"leads": 0, "consultations": 0}
+    await sync.stop()
+
+
+async def test_first_run_without_backfill_skips_history(db, script):
+    await db.leads.insert_one(lead(1))
+    sync = make_sync(db, script, backfill=False)
+    assert (await sync.sync_once())["leads"] == 0
+    await db.leads.insert_one(lead(2, created_at="2099-01-01T00:00:00+00:00"))
+    assert (await sync.sync_once())["leads"] == 1
+    assert [row[1] for row in script.rows["leads"]] == ["Lead 2"]
+    await sync.stop()
+
+
+async def test_failed_batch_is_resent_unchanged(db, script):
+    await db.leads.insert_many([lead(2), lead(3)])
+    sync = make_sync(db, script, batch_size=2)
+    script.fail = True
+    with pytest.raises(SheetsSyncError):
+        await sync.sync_once()
+    assert await db.leads.count_documents({"sheets_synced": {"$exists": True}}) == 0
+
+    # A newer-looking but earlier-sorting document does not change the retried batch.
+    await db.leads.insert_one(lead(1))
+    script.fail = False
+    assert (await sync.sync_once())["leads"] == 2
+    assert [row[1] for row in script.rows["leads"]] == ["Lead 2", "Lead 3"]
+    assert (await sync.sync_once())["leads"] == 1
+    await sync.stop()
+
+
+async def test_lost_response_does_not_duplicate_rows(db, script):
+    await db.leads.insert_many([lead(1), lead(2)])
+    sync = make_sync(db, script)
+    script.lose_response = True
+    with pytest.raises(SheetsSyncError):
+        await sync.sync_once()
+    script.lose_response = False
+    await sync.sync_once()
+    assert len(script.batches) == 2
+    assert [row[1] for row in script.rows["leads"]] == ["Lead 1", "Lead 2"]
+    assert script.app.state.stats["duplicates"] == 1
+    await sync.stop()
+
+
+async def test_only_the_lease_holder_writes(db, script):
+    await db.leads.insert_one(lead(1))
+    holder, other = make_sync(db, script), make_sync(db, script)
+    assert (await holder.sync_once())["leads"] == 1
+    await db.leads.insert_one(lead(2))
+    assert await other.sync_once() == {}
+    assert len(script.rows["leads"]) == 1
+    await holder.stop()
+    await other.stop()
+
+
+async def test_lease_lost_mid_round_stops_before_writing(db, script, monkeypatch):
+    await db.leads.insert_one(lead(1))
+    sync = make_sync(db, script)
+    checks = []
+
+    async def acquire_lease():
+        checks.append(1)
+        return len(checks) < 3  # round start, pending batch, then lost before the append
+
+    monkeypatch.setattr(sync, "acquire_lease", acquire_lease)
+    assert await sync.sync_once() == {}
+    assert script.batches == []
+    cp = await db[sheets_sync.CHECKPOINTS].find_one({"_id": "sheets:leads"})
+    assert cp["pending"]["ids"] == ["lead-1"]
+    await sync.stop()
+
+
+def test_lead_feed_ignores_sync_marks():
+    [stage] = lead_feed.CHANGE_PIPELINE
+    match = stage["$match"]
+    mark = {"operationType": "update", "updateDescription": {"updatedFields": {"sheets_synced": "now"}}}
+    edit = {"operationType": "update", "updateDescription": {"updatedFields": {"status": "contacted"}}}
+    assert not filter_applies(match, mark)
+    assert filter_applies(match, edit)
+    assert filter_applies(match, {"operationType": "insert"})
@@ -0,0 +1,25 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+# Imported on first use (startup hook or first request), not by `import server`.
+# pymongo and bson are not deferred; see benchmarks/bench_startup.py.
+DEFERRED = ["motor", "httpx", "resend", "lead_feed", "email_transport", "PIL", "sheets_sync"]
+
+
+def test_importing_server_defers_optional_integrations():
+    code = f"import json, sys, server; print(json.dumps([m for m in {DEFERRED!r} if m in sys.modules]))"
+    res = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "MONGO_URL": "mongodb://localhost:27017", "DB_NAME": "test_database"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert json.loads(res.stdout.strip().splitlines()[-1]) == []
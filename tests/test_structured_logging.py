@@ -0,0 +1,100 @@
+import json
+import logging
+import queue
+import sys
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+import structured_logging
+from structured_logging import CorrelationIdMiddleware, ErrorSampler, JsonFormatter, request_id_var
+
+
+def record(msg="failed %s", args=("x",), level=logging.ERROR, exc_info=None, name="app", **extra):
+    rec = logging.LogRecord(name, level, __file__, 1, msg, args, exc_info)
+    rec.__dict__.update(extra)
+    return rec
+
+
+def exc_info():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        return sys.exc_info()
+
+
+def test_json_formatter_fields_extras_and_traceback():
+    out = json.loads(JsonFormatter().format(record(exc_info=exc_info(), request_id="r1", lead_id="L1")))
+    assert out["level"] == "ERROR"
+    assert out["logger"] == "app"
+    assert out["message"] == "failed x"
+    assert out["request_id"] == "r1"
+    assert out["lead_id"] == "L1"
+    assert "ValueError: boom" in out["exc_info"]
+    assert out["ts"].endswith("+00:00")
+
+
+def test_error_sampler_lets_a_burst_through_per_window(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(structured_logging.time, "monotonic", lambda: now[0])
+    sampler = ErrorSampler(burst=2, window=10)
+
+    assert [sampler.filter(record(args=(n,))) for n in range(5)] == [True, True, False, False, False]
+    # Other messages, exception types and lower levels are counted separately.
+    assert sampler.filter(record("other"))
+    assert sampler.filter(record(exc_info=exc_info()))
+    assert all(sampler.filter(record(level=logging.INFO)) for _ in range(5))
+
+    now[0] = 10.0
+    passed = record()
+    assert sampler.filter(passed)
+    assert passed.suppressed == 3
+    assert not hasattr(record(), "suppressed")
+
+
+def test_queue_handler_defers_formatting_and_stamps_the_request_id():
+    q = queue.SimpleQueue()
+    handler = structured_logging._LoopSafeQueueHandler(q)
+    args = ["mutable"]
+    token = request_id_var.set("req-1")
+    try:
+        handler.emit(record("value %s", (args,), exc_info=exc_info()))
+    finally:
+        request_id_var.reset(token)
+    args.append("changed")
+
+    queued = q.get_nowait()
+    assert queued.getMessage() == "value ['mutable']"
+    assert queued.request_id == "req-1"
+    assert queued.exc_info[0] is ValueError
+    assert queued.exc_text is None  # rendered on the listener thread
+
+
+@pytest.fixture
+def app():
+    async def echo(request):
+        return PlainTextResponse(request_id_var.get() or "")
+
+    return CorrelationIdMiddleware(Starlette(routes=[Route("/", echo)]))
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("incoming, kept", [
+    ("abc-123.DEF_4", True),
+    ("has spaces", False),
+    ("x" * 129, False),
+    (None, False),
+])
+async def test_correlation_id(app, incoming, kept):
+    headers = {"X-Request-ID": incoming} if incoming else {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        r = await c.get("/", headers=headers)
+    request_id = r.headers["x-request-id"]
+    assert r.text == request_id
+    assert (request_id == incoming) is kept
+    if not kept:
+        assert len(request_id) == 32
+    assert request_id_var.get() is None
@@ -0,0 +1,95 @@
+import base64
+import json
+
+import pytest
+
+import image_store
+from tests.conftest import CONSULTATION, signed
+
+
+pytestmark = pytest.mark.anyio
+
+IMAGES = [("a.jpg", b"a" * 300), ("b.png", b"b" * 50)]
+
+
+async def submit(api, images=IMAGES, consultation=CONSULTATION):
+    files = [("images", (name, data, "image/jpeg")) for name, data in images]
+    data = {"consultation": json.dumps(consultation)} if consultation is not None else {}
+    return await api.post("/api/consultations/submit", data=data, files=files or None)
+
+
+def sent():
+    import server
+
+    return server._get_email_transport().sent
+
+
+async def test_submit_stores_consultation_and_images(api, db, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "RAW_UPLOAD_CHUNK_BYTES", 128)
+    r = await submit(api)
+    assert r.status_code == 200
+    cid = r.json()["id"]
+
+    summary = (await api.get(f"/api/consultations/{cid}")).json()
+    assert (summary["image_count"], summary["upload_status"]) == (2, "complete")
+    assert await db[image_store.CHUNKS].count_documents({"consultation_id": cid}) == 4
+    for meta in await db.consultation_images.find({"consultation_id": cid}).to_list(None):
+        body = (await api.get(signed(f"/api/consultations/{cid}/images/{meta['id']}"))).content
+        assert body == dict(IMAGES)[meta["filename"]]
+
+    [email] = sent()
+    assert "2 site images attached." in email["html"]
+    attached = {a["filename"]: base64.b64decode(a["content"]) for a in email["attachments"]}
+    assert attached == dict(IMAGES)
+
+
+async def test_submit_without_images(api, db):
+    r = await submit(api, images=[])
+    assert r.status_code == 200
+    assert await db.consultation_images.count_documents({}) == 0
+    [email] = sent()
+    assert "attachments" not in email
+
+
+async def test_submit_requires_content_length(api):
+    async def body():
+        yield b"--x--\r\n"
+
+    r = await api.post(
+        "/api/consultations/submit",
+        content=body(),
+        headers={"Content-Type": "multipart/form-data; boundary=x"},
+    )
+    assert r.status_code == 411
+
+
+async def test_submit_over_the_inline_limit_is_413(api, db, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "INLINE_SUBMIT_MAX_BYTES", 200)
+    assert (await submit(api)).status_code == 413
+    assert await db.consultations.count_documents({}) == 0
+
+
+async def test_submit_rejects_oversized_image_and_stores_nothing(api, db, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "MAX_IMAGE_BYTES", 100)
+    assert (await submit(api)).status_code == 400
+    assert await db.consultations.count_documents({}) == 0
+    assert await db[image_store.CHUNKS].count_documents({}) == 0
+
+
+async def test_submit_rejects_too_many_images(api, db, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "INLINE_SUBMIT_MAX_IMAGES", 1)
+    assert (await submit(api)).status_code == 400
+    assert await db.consultations.count_documents({}) == 0
+
+
+@pytest.mark.parametrize("consultation", [None, {"name": "missing fields"}])
+async def test_submit_validates_the_consultation_field(api, consultation):
+    assert (await submit(api, consultation=consultation)).status_code == 422
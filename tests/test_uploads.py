@@ -0,0 +1,120 @@
+import pytest
+
+import image_store
+from tests.conftest import create, signed
+
+
+pytestmark = pytest.mark.anyio
+
+DATA = b"0123456789abcdefghij"  # two 10-byte chunks
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "RAW_UPLOAD_CHUNK_BYTES", 10)
+
+
+async def init(api, size: int = len(DATA)) -> str:
+    cid = await create(api)
+    r = await api.post(
+        f"/api/consultations/{cid}/images/init",
+        json={"filename": "a.jpg", "size": size, "content_type": "image/jpeg"},
+    )
+    return f"/api/consultations/{cid}/images/{r.json()['image_id']}"
+
+
+async def put(api, path, body, content_range=None):
+    headers = {"Content-Range": content_range} if content_range else {}
+    return await api.put(path, content=body, headers=headers)
+
+
+async def complete_and_download(api, path) -> bytes:
+    assert (await api.post(f"{path}/complete")).status_code == 200
+    r = await api.get(signed(path))
+    assert r.status_code == 200
+    assert r.headers["content-length"] == str(len(r.content))
+    return r.content
+
+
+async def test_multipart_chunks_are_idempotent(api, db):
+    path = await init(api)
+    for index, piece in [(0, DATA[:10]), (1, DATA[10:]), (1, DATA[10:])]:
+        r = await api.post(
+            f"{path}/chunk", files={"chunk": ("blob", piece)}, data={"index": str(index), "total": "2"}
+        )
+        assert r.status_code == 200
+    meta = await db.consultation_images.find_one({}, {"_id": 0})
+    assert (sorted(meta["chunks"]), meta["total"], meta["received_bytes"]) == ([0, 1], 2, 20)
+    assert await complete_and_download(api, path) == DATA
+
+
+async def test_multipart_incomplete_upload_cannot_complete(api):
+    path = await init(api)
+    await api.post(f"{path}/chunk", files={"chunk": ("blob", DATA[:10])}, data={"index": "0", "total": "2"})
+    assert (await api.post(f"{path}/complete")).status_code == 400
+
+
+async def test_raw_whole_body(api, small_chunks):
+    path = await init(api)
+    r = await put(api, path, DATA + b"!")
+    assert r.json() == {"ok": True, "received": 21, "chunks": 3, "total": 3}
+    assert await complete_and_download(api, path) == DATA + b"!"
+
+
+async def test_raw_ranges_in_any_order(api, db, small_chunks):
+    path = await init(api, 25)
+    body = DATA + b"KLMNO"
+    assert (await put(api, path, body[10:], "bytes 10-24/25")).json()["chunks"] == 2
+    assert (await put(api, path, body[:10], "bytes 0-9/25")).json()["total"] == 3
+    meta = await db.consultation_images.find_one({}, {"_id": 0})
+    assert meta["received_bytes"] == 25
+    assert await complete_and_download(api, path) == body
+
+
+@pytest.mark.parametrize("body, content_range", [
+    (DATA[:5], "bytes 5-9/20"),  # does not start on a chunk boundary
+    (DATA[:15], "bytes 0-14/20"),  # ends mid-chunk before the end of the image
+    (DATA[:10], "bytes 0-9/30"),  # size differs from init
+    (DATA[:15], "bytes 0-9/20"),  # body longer than the range
+    (DATA[:5], "bytes 0-9/20"),  # body shorter than the range
+    (b"", None),
+])
+async def test_raw_rejected_ranges_store_nothing(api, db, small_chunks, body, content_range):
+    path = await init(api)
+    assert (await put(api, path, body, content_range)).status_code == 400
+    assert await db[image_store.CHUNKS].count_documents({}) == 0
+    meta = await db.consultation_images.find_one({}, {"_id": 0})
+    assert meta["chunks"] == [] and "received_bytes" not in meta
+
+
+async def test_raw_resent_range_replaces_the_stored_chunk(api, db, small_chunks):
+    path = await init(api)
+    await put(api, path, b"X" * 10, "bytes 10-19/20")
+    await put(api, path, DATA[10:], "bytes 10-19/20")
+    await put(api, path, DATA[:10], "bytes 0-9/20")
+    meta = await db.consultation_images.find_one({}, {"_id": 0})
+    assert meta["received_bytes"] == 20
+    assert await complete_and_download(api, path) == DATA
+
+
+async def test_raw_over_the_limit_is_413(api, db, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "MAX_IMAGE_BYTES", 15)
+    path = await init(api)
+    assert (await put(api, path, DATA)).status_code == 413
+    assert (await put(api, path, DATA, "bytes 0-19/20")).status_code == 413
+    assert await db[image_store.CHUNKS].count_documents({}) == 0
+
+
+async def test_raw_after_complete_is_409(api, small_chunks):
+    path = await init(api)
+    await put(api, path, DATA)
+    await api.post(f"{path}/complete")
+    assert (await put(api, path, DATA)).status_code == 409
+
+
+async def test_raw_unknown_image_is_404(api):
+    assert (await put(api, "/api/consultations/x/images/y", DATA)).status_code == 404